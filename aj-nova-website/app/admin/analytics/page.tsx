@@ -126,7 +126,7 @@ export default function AnalyticsPage() {
       const days = parseInt(timeRange)
       const [analyticsData, counsellorPerfData] = await Promise.all([
         admin.getAnalytics(days),
-        admin.getCounsellorPerformance()
+        admin.getCounsellorPerformance(days)
       ])
       setAnalytics(analyticsData)
       setCounsellorData(counsellorPerfData)
@@ -2,7 +2,8 @@
 
 import { useEffect, useState } from 'react'
 import { createClient } from '@/lib/supabase/client'
-import { RealtimeChannel } from '@supabase/supabase-js'
+import { notifications as notificationsApi } from '@/lib/api-client'
+import { subscribeToNotifications } from '@/lib/notification-stream'
 
 export interface Notification {
   id: string
@@ -15,6 +16,11 @@ export interface Notification {
   created_at: string
 }
 
+// Rows and stream events carry is_read; the UI works with read
+function toNotification(row: any): Notification {
+  return { ...row, read: row.is_read ?? row.read ?? false }
+}
+
 export function useRealtimeNotifications(userId: string | undefined) {
   const [notifications, setNotifications] = useState<Notification[]>([])
   const [unreadCount, setUnreadCount] = useState(0)
@@ -27,10 +33,10 @@ export function useRealtimeNotifications(userId: string | undefined) {
     }
 
     const supabase = createClient()
-    let channel: RealtimeChannel
+    let unsubscribe: (() => void) | undefined
+    let cancelled = false
 
-    const setupRealtimeSubscription = async () => {
-      // Fetch initial notifications
+    const fetchNotifications = async () => {
       const { data: initialNotifications, error } = await supabase
         .from('notifications')
         .select('*')
@@ -38,122 +44,62 @@ export function useRealtimeNotifications(userId: string | undefined) {
         .order('created_at', { ascending: false })
         .limit(50)
 
-      if (!error && initialNotifications) {
-        setNotifications(initialNotifications)
-        setUnreadCount(initialNotifications.filter(n => !n.read).length)
+      if (!error && initialNotifications && !cancelled) {
+        setNotifications(initialNotifications.map(toNotification))
       }
+    }
 
+    const setupSubscription = async () => {
+      await fetchNotifications()
       setLoading(false)
-
-      // Subscribe to real-time changes
-      channel = supabase
-        .channel(`notifications:${userId}`)
-        .on(
-          'postgres_changes',
-          {
-            event: 'INSERT',
-            schema: 'public',
-            table: 'notifications',
-            filter: `user_id=eq.${userId}`,
-          },
-          (payload) => {
-            const newNotification = payload.new as Notification
-            setNotifications((prev) => [newNotification, ...prev])
-            if (!newNotification.read) {
-              setUnreadCount((prev) => prev + 1)
-            }
-          }
-        )
-        .on(
-          'postgres_changes',
-          {
-            event: 'UPDATE',
-            schema: 'public',
-            table: 'notifications',
-            filter: `user_id=eq.${userId}`,
-          },
-          (payload) => {
-            const updatedNotification = payload.new as Notification
-            setNotifications((prev) =>
-              prev.map((n) => (n.id === updatedNotification.id ? updatedNotification : n))
-            )
-            setUnreadCount(
-              notifications.filter((n) => n.id !== updatedNotification.id && !n.read).length +
-                (updatedNotification.read ? 0 : 1)
-            )
-          }
-        )
-        .on(
-          'postgres_changes',
-          {
-            event: 'DELETE',
-            schema: 'public',
-            table: 'notifications',
-            filter: `user_id=eq.${userId}`,
-          },
-          (payload) => {
-            const deletedNotification = payload.old as Notification
-            setNotifications((prev) => prev.filter((n) => n.id !== deletedNotification.id))
-            if (!deletedNotification.read) {
-              setUnreadCount((prev) => Math.max(0, prev - 1))
-            }
-          }
-        )
-        .subscribe()
+      if (cancelled) return
+
+      // New notifications and unread counts are pushed by the backend over SSE
+      unsubscribe = subscribeToNotifications({
+        onUnread: setUnreadCount,
+        onNotification: (notification) => {
+          setNotifications((prev) => [toNotification(notification), ...prev])
+        },
+        onResync: fetchNotifications,
+      })
     }
 
-    setupRealtimeSubscription()
+    setupSubscription()
 
     return () => {
-      if (channel) {
-        supabase.removeChannel(channel)
-      }
+      cancelled = true
+      unsubscribe?.()
     }
   }, [userId])
 
+  // Changes go through the backend, which pushes the new unread count to every open stream
   const markAsRead = async (notificationId: string) => {
-    const supabase = createClient()
-    const { error } = await supabase
-      .from('notifications')
-      .update({ read: true })
-      .eq('id', notificationId)
-
-    if (!error) {
-      setNotifications((prev) =>
-        prev.map((n) => (n.id === notificationId ? { ...n, read: true } : n))
-      )
-      setUnreadCount((prev) => Math.max(0, prev - 1))
+    try {
+      await notificationsApi.markAsRead(notificationId)
+    } catch {
+      return
     }
+    setNotifications((prev) =>
+      prev.map((n) => (n.id === notificationId ? { ...n, read: true } : n))
+    )
   }
 
   const markAllAsRead = async () => {
-    const supabase = createClient()
-    const { error } = await supabase
-      .from('notifications')
-      .update({ read: true })
-      .eq('user_id', userId)
-      .eq('read', false)
-
-    if (!error) {
-      setNotifications((prev) => prev.map((n) => ({ ...n, read: true })))
-      setUnreadCount(0)
+    try {
+      await notificationsApi.markAllAsRead()
+    } catch {
+      return
     }
+    setNotifications((prev) => prev.map((n) => ({ ...n, read: true })))
   }
 
   const deleteNotification = async (notificationId: string) => {
-    const supabase = createClient()
-    const { error } = await supabase
-      .from('notifications')
-      .delete()
-      .eq('id', notificationId)
-
-    if (!error) {
-      const notification = notifications.find((n) => n.id === notificationId)
-      setNotifications((prev) => prev.filter((n) => n.id !== notificationId))
-      if (notification && !notification.read) {
-        setUnreadCount((prev) => Math.max(0, prev - 1))
-      }
+    try {
+      await notificationsApi.delete(notificationId)
+    } catch {
+      return
     }
+    setNotifications((prev) => prev.filter((n) => n.id !== notificationId))
   }
 
   return {
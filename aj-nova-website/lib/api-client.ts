@@ -299,33 +299,53 @@ export const notifications = {
   delete: async (id: string) => {
     await apiClient.delete(`/api/v1/notifications/${id}`);
   },
+
+  // Short-lived token for /notifications/stream (EventSource cannot send headers)
+  getStreamToken: async (): Promise<{ token: string; expires_in: number }> => {
+    const response = await apiClient.post('/api/v1/notifications/stream-token');
+    return response.data;
+  },
 };
 
 // =======================
 // Admin APIs
 // =======================
 
+// Admin listings are paged (50 rows by default); follow next_cursor, 500 rows per
+// request, and return every row under key. Callers that need every row (dashboard
+// totals, client-side filtering) use this rather than counting the first page.
+async function fetchAllPages(url: string, key: string, params: Record<string, any> = {}) {
+  const rows: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const response: { data: any } = await apiClient.get(url, {
+      params: { ...params, limit: 500, ...(cursor ? { cursor } : {}) },
+    });
+    rows.push(...(response.data[key] || []));
+    cursor = response.data.next_cursor || null;
+  } while (cursor);
+  return rows;
+}
+
 export const admin = {
   getUsers: async (role?: string) => {
-    const response = await apiClient.get('/api/v1/admin/users', {
-      params: role ? { role } : undefined,
-    });
-    return response.data;
+    const users = await fetchAllPages('/api/v1/admin/users', 'users', role ? { role } : {});
+    return { users };
   },
 
-  getStudents: async () => {
-    const response = await apiClient.get('/api/v1/admin/students');
-    return response.data;
+  getStudents: async (search?: string) => {
+    const students = await fetchAllPages('/api/v1/admin/students', 'students', search ? { search } : {});
+    return { students };
   },
 
   getReviewQueue: async () => {
-    const response = await apiClient.get('/api/v1/admin/reviews');
-    return response.data;
+    const documents = await fetchAllPages('/api/v1/admin/reviews', 'documents');
+    return { documents };
   },
 
   getLeads: async () => {
-    const response = await apiClient.get('/api/v1/admin/leads');
-    return response.data;
+    const leads = await fetchAllPages('/api/v1/admin/leads', 'leads');
+    return { leads };
   },
 
   createLead: async (leadData: any) => {
@@ -355,29 +375,31 @@ export const admin = {
     return response.data;
   },
 
-  getCounsellorPerformance: async () => {
-    const response = await apiClient.get('/api/v1/admin/counsellor-performance');
+  getCounsellorPerformance: async (days: number = 30) => {
+    const response = await apiClient.get('/api/v1/admin/counsellor-performance', {
+      params: { days }
+    });
     return response.data;
   },
 
   getAPSSubmissions: async () => {
-    const response = await apiClient.get('/api/v1/admin/aps-submissions');
-    return response.data;
+    const submissions = await fetchAllPages('/api/v1/admin/aps-submissions', 'submissions');
+    return { submissions };
   },
 
   getAllDocuments: async () => {
-    const response = await apiClient.get('/api/v1/admin/documents');
-    return response.data;
+    const documents = await fetchAllPages('/api/v1/admin/documents', 'documents');
+    return { documents };
   },
 
   getAllConsultations: async () => {
-    const response = await apiClient.get('/api/v1/admin/consultations');
-    return response.data;
+    const consultations = await fetchAllPages('/api/v1/admin/consultations', 'consultations');
+    return { consultations };
   },
 
   getAllApplications: async () => {
-    const response = await apiClient.get('/api/v1/admin/applications');
-    return response.data;
+    const applications = await fetchAllPages('/api/v1/admin/applications', 'applications');
+    return { applications };
   },
 };
 
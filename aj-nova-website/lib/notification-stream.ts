@@ -0,0 +1,75 @@
+/**
+ * Live notifications over Server-Sent Events
+ * Subscribes to the backend's /notifications/stream with EventSource
+ */
+
+import apiClient, { notifications } from '@/lib/api-client';
+
+export interface NotificationStreamHandlers {
+  // Unread count, sent on connect and after every change
+  onUnread?: (count: number) => void;
+  // A newly created notification
+  onNotification?: (notification: any) => void;
+  // The client fell behind and should refetch its list
+  onResync?: () => void;
+}
+
+const MAX_RETRY_DELAY_MS = 30000;
+
+/**
+ * Open the notification stream and keep it open until the returned function is called.
+ *
+ * EventSource cannot send an Authorization header, so every connection uses a
+ * short-lived stream token. EventSource's own reconnect would reuse the expired
+ * token, so on any error the source is closed and reopened with a fresh one.
+ */
+export function subscribeToNotifications(handlers: NotificationStreamHandlers): () => void {
+  let source: EventSource | null = null;
+  let retryTimer: ReturnType<typeof setTimeout> | null = null;
+  let failures = 0;
+  let closed = false;
+
+  const reconnect = () => {
+    source?.close();
+    source = null;
+    if (closed || retryTimer) return;
+    const delay = Math.min(MAX_RETRY_DELAY_MS, 1000 * 2 ** failures);
+    failures += 1;
+    retryTimer = setTimeout(() => {
+      retryTimer = null;
+      connect();
+    }, delay);
+  };
+
+  const connect = async () => {
+    if (closed) return;
+    try {
+      const { token } = await notifications.getStreamToken();
+      if (closed) return;
+      const url = `${apiClient.defaults.baseURL}/api/v1/notifications/stream?token=${encodeURIComponent(token)}`;
+      source = new EventSource(url);
+      source.onopen = () => {
+        failures = 0;
+      };
+      source.addEventListener('unread', (event) => {
+        handlers.onUnread?.(JSON.parse((event as MessageEvent).data).count);
+      });
+      source.addEventListener('notification', (event) => {
+        handlers.onNotification?.(JSON.parse((event as MessageEvent).data));
+      });
+      source.addEventListener('resync', () => handlers.onResync?.());
+      // Also fires when the server ends the stream (max age, resync)
+      source.onerror = reconnect;
+    } catch {
+      reconnect();
+    }
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    source?.close();
+    if (retryTimer) clearTimeout(retryTimer);
+  };
+}
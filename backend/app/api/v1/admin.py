@@ -2,435 +2,297 @@
 Admin dashboard endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
-from typing import List, Dict, Any
-
-from app.dependencies import get_supabase, get_supabase_admin, require_admin, require_counsellor
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Dict, Any, Literal, Optional, Sequence
+
+from app.dependencies import get_db_admin, require_admin, require_counsellor, invalidate_cached_user
+from app.repositories.applications import APPLICATION_COLUMNS
+from app.repositories.aps import APS_SUBMISSION_COLUMNS, APS_SUBMISSION_LIST_COLUMNS
+from app.repositories.base import BaseRepository
+from app.repositories.consultations import CONSULTATION_COLUMNS
+from app.repositories.database import Database
+from app.repositories.documents import DOCUMENT_COLUMNS, DOCUMENT_LIST_COLUMNS
+from app.repositories.leads import LEAD_COLUMNS
+from app.repositories.pagination import select_columns
+from app.repositories.profiles import STUDENT_LIST_COLUMNS
+from app.repositories.users import USER_COLUMNS
+from app.models.notification import NotificationBroadcastRequest, NotificationBulkResult
+from app.services.analytics_service import AnalyticsService
+from app.services.email_service import EmailService
+from app.services.notification_service import NotificationService
 
 router = APIRouter()
 
+UserRole = Literal["student", "counsellor", "admin"]
+UserStatus = Literal["active", "inactive", "suspended"]
+
+
+async def _list_page(
+    repository: BaseRepository,
+    key: str,
+    fields: Optional[str],
+    allowed: Sequence[str],
+    default: Sequence[str],
+    limit: int,
+    cursor: Optional[str],
+    order_by: str = "created_at",
+    desc: bool = True,
+    **filters
+) -> Dict[str, Any]:
+    """
+    One keyset page of an admin listing
+
+    fields is a comma-separated projection over allowed (default columns
+    otherwise). total is PostgREST's estimated count of matching rows and is
+    only returned with the first page; next_cursor is null on the last page.
+    """
+    filters = {column: value for column, value in filters.items() if value is not None}
+    try:
+        columns = select_columns(fields, allowed, default, required=("id", order_by))
+        rows, next_cursor, total = await repository.find_page(
+            columns,
+            limit=limit,
+            cursor=cursor,
+            order_by=order_by,
+            desc=desc,
+            count="estimated",
+            **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {key: rows, "total": total, "next_cursor": next_cursor}
+
 
 @router.get("/users")
 async def get_all_users(
-    role: str = None,
+    role: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all users (admin only)"""
-    query = supabase.table("users").select("*")
+    """Get users newest first, one page at a time (admin only)"""
+    # Return raw data - frontend will handle formatting
+    return await _list_page(
+        db.users, "users", fields, USER_COLUMNS, USER_COLUMNS, limit, cursor,
+        role=role, status=status
+    )
 
-    if role:
-        query = query.eq("role", role)
 
-    response = query.order("created_at", desc=True).execute()
+@router.patch("/users/{user_id}/role")
+async def update_user_role(
+    user_id: str,
+    role: UserRole,
+    current_user = Depends(require_admin),
+    db: Database = Depends(get_db_admin)
+):
+    """Change a user's role (admin only)"""
+    updated = await db.users.update({"role": role}, id=user_id)
+    invalidate_cached_user(user_id)
 
-    # Return raw data - frontend will handle formatting
-    return {"users": response.data, "total": len(response.data)}
+    if not updated:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return {"user": updated[0]}
+
+
+@router.patch("/users/{user_id}/status")
+async def update_user_status(
+    user_id: str,
+    status: UserStatus,
+    current_user = Depends(require_admin),
+    db: Database = Depends(get_db_admin)
+):
+    """Activate, deactivate or suspend a user (admin only)"""
+    updated = await db.users.update({"status": status}, id=user_id)
+    # Only clears this worker's cache; other workers keep serving the old
+    # row for at most USER_CACHE_TTL seconds before get_current_active_user
+    # sees the new status.
+    invalidate_cached_user(user_id)
+
+    if not updated:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return {"user": updated[0]}
 
 
 @router.get("/students")
 async def get_all_students(
+    search: Optional[str] = Query(None, min_length=1, max_length=100),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all students with profiles (counsellor/admin)"""
-    # Get students using admin client to bypass RLS
-    users_response = supabase.table("users").select("*").eq("role", "student").execute()
-    print(f"[DEBUG] Found {len(users_response.data)} students in database")
-    
-    students = []
-    for user in users_response.data:
-        # Get profile for each student
-        profile_response = supabase.table("profiles").select("*").eq("user_id", user["id"]).execute()
-        
-        student_data = {
-            **user,
-            "profile": profile_response.data[0] if profile_response.data else None
-        }
-        students.append(student_data)
-    
-    print(f"[DEBUG] Returning {len(students)} students with profiles")
-    return {"students": students}
+    """
+    Get students with their profiles (counsellor/admin)
+
+    Search matches name, email or nationality (the 200 most recent
+    nationality matches). Results come newest first, limit at a time;
+    next_cursor is null on the last page.
+    """
+    search = search.strip() if search else None
+    nationality_ids = await db.profiles.user_ids_by_nationality(search) if search else []
+
+    try:
+        users, next_cursor, _ = await db.users.search_page(
+            "student",
+            search=search,
+            extra_ids=nationality_ids,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One batched profile lookup for the whole page
+    profiles = await db.profiles.get_by_user_ids(
+        [user["id"] for user in users], STUDENT_LIST_COLUMNS
+    )
+    students = [{**user, "profile": profiles.get(str(user["id"]))} for user in users]
+
+    return {"students": students, "next_cursor": next_cursor}
 
 
 @router.get("/reviews")
 async def get_review_queue(
+    type: Optional[str] = None,
+    counsellor_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get documents awaiting review (counsellor/admin)"""
-    response = supabase.table("documents").select("*").eq(
-        "status", "submitted"
-    ).order("submitted_at", desc=False).execute()
-
-    return {"documents": response.data, "total": len(response.data)}
+    """Get documents awaiting review, oldest submission first (counsellor/admin)"""
+    return await _list_page(
+        db.documents, "documents", fields, DOCUMENT_COLUMNS, DOCUMENT_LIST_COLUMNS, limit, cursor,
+        order_by="submitted_at", desc=False,
+        status="submitted", type=type, counsellor_id=counsellor_id
+    )
 
 
 @router.get("/leads")
 async def get_leads(
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get leads/contacts"""
-    response = supabase.table("leads").select("*").order("created_at", desc=True).execute()
-    
-    return {"leads": response.data, "total": len(response.data)}
+    """Get leads/contacts, newest first"""
+    return await _list_page(
+        db.leads, "leads", fields, LEAD_COLUMNS, LEAD_COLUMNS, limit, cursor,
+        status=status, source=source, assigned_to=assigned_to
+    )
 
 
 @router.get("/aps-submissions")
 async def get_aps_submissions(
+    status: Optional[str] = None,
+    counsellor_id: Optional[str] = None,
+    student_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all APS submissions (admin only)"""
-    response = supabase.table("aps_submissions").select("*").order("created_at", desc=True).execute()
-    
-    return {"submissions": response.data, "total": len(response.data)}
+    """Get APS submissions, latest first (admin only); form_data only via fields="""
+    # aps_submissions has no created_at; submitted_at is set on insert
+    return await _list_page(
+        db.aps_submissions, "submissions", fields, APS_SUBMISSION_COLUMNS, APS_SUBMISSION_LIST_COLUMNS,
+        limit, cursor, order_by="submitted_at",
+        status=status, counsellor_id=counsellor_id, student_id=student_id
+    )
 
 
 @router.get("/documents")
 async def get_all_documents(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    student_id: Optional[str] = None,
+    counsellor_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all documents (admin only)"""
-    response = supabase.table("documents").select("*").order("created_at", desc=True).execute()
-    
-    return {"documents": response.data, "total": len(response.data)}
+    """Get documents newest first (admin only); content only via fields="""
+    return await _list_page(
+        db.documents, "documents", fields, DOCUMENT_COLUMNS, DOCUMENT_LIST_COLUMNS, limit, cursor,
+        status=status, type=type, student_id=student_id, counsellor_id=counsellor_id
+    )
 
 
 @router.get("/consultations")
 async def get_all_consultations(
+    status: Optional[str] = None,
+    consultation_type: Optional[str] = None,
+    student_id: Optional[str] = None,
+    counsellor_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all consultations (admin only)"""
-    response = supabase.table("consultations").select("*").order("scheduled_at", desc=True).execute()
-    
-    return {"consultations": response.data, "total": len(response.data)}
+    """Get consultations, latest scheduled first (admin only)"""
+    return await _list_page(
+        db.consultations, "consultations", fields, CONSULTATION_COLUMNS, CONSULTATION_COLUMNS,
+        limit, cursor, order_by="scheduled_at",
+        status=status, consultation_type=consultation_type, student_id=student_id, counsellor_id=counsellor_id
+    )
 
 
 @router.get("/applications")
 async def get_all_applications(
+    status: Optional[str] = None,
+    student_id: Optional[str] = None,
+    counsellor_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get all applications (admin only)"""
-    response = supabase.table("applications").select("*").order("created_at", desc=True).execute()
-    
-    return {"applications": response.data, "total": len(response.data)}
+    """Get applications newest first (admin only)"""
+    return await _list_page(
+        db.applications, "applications", fields, APPLICATION_COLUMNS, APPLICATION_COLUMNS, limit, cursor,
+        status=status, student_id=student_id, counsellor_id=counsellor_id
+    )
 
 
 @router.get("/analytics")
 async def get_analytics(
-    days: int = 30,
+    days: int = Query(30, ge=1, le=3650),
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get comprehensive platform analytics with real data"""
-    from datetime import datetime, timedelta, timezone
-    from collections import defaultdict
-
-    # Calculate date range (use UTC timezone)
-    now = datetime.now(timezone.utc)
-    start_date = now - timedelta(days=days)
-    start_date_str = start_date.isoformat()
-
-    # Helper function to check if date is in range
-    def in_date_range(date_str):
-        if not date_str:
-            return False
-        try:
-            date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            return date >= start_date
-        except:
-            return False
-
-    # ============================================
-    # 1. BASIC COUNTS (with date filtering)
-    # ============================================
-    # Get all users and filter by date
-    all_users_response = supabase.table("users").select("*").execute()
-    users_in_range = [u for u in all_users_response.data if in_date_range(u.get("created_at"))]
-
-    users_count_total = len(all_users_response.data)
-    students_count_total = len([u for u in all_users_response.data if u.get("role") == "student"])
-
-    # For time-filtered counts
-    users_count = len(users_in_range) if days < 365 else users_count_total
-    students_count = len([u for u in users_in_range if u.get("role") == "student"]) if days < 365 else students_count_total
-
-    # Consultations in date range
-    all_consultations_response = supabase.table("consultations").select("*").execute()
-    consultations_in_range = [c for c in all_consultations_response.data if in_date_range(c.get("created_at"))]
-    consultations_count = len(consultations_in_range)
-
-    # ============================================
-    # 2. DOCUMENT STATISTICS (with date filtering)
-    # ============================================
-    all_documents = supabase.table("documents").select("*").execute()
-    documents_in_range = [d for d in all_documents.data if in_date_range(d.get("created_at"))]
-
-    doc_stats = {}
-    doc_by_type = defaultdict(int)
-    total_revisions = 0
-
-    for doc in documents_in_range:
-        status = doc.get("status", "unknown")
-        doc_stats[status] = doc_stats.get(status, 0) + 1
-
-        doc_type = doc.get("type", "unknown")
-        doc_by_type[doc_type] += 1
-
-        # Count revisions if field exists
-        if "revision_count" in doc and doc["revision_count"]:
-            total_revisions += doc["revision_count"]
-
-    avg_revisions = total_revisions / len(documents_in_range) if len(documents_in_range) > 0 else 0
-
-    # ============================================
-    # 3. APPLICATION STATISTICS (with date filtering)
-    # ============================================
-    all_applications = supabase.table("applications").select("*").execute()
-    applications_in_range = [a for a in all_applications.data if in_date_range(a.get("created_at"))]
-
-    app_stats = {}
-    for app in applications_in_range:
-        status = app.get("status", "unknown")
-        app_stats[status] = app_stats.get(status, 0) + 1
-
-    # ============================================
-    # 4. APS SUBMISSIONS STATISTICS
-    # ============================================
-    aps_submissions = supabase.table("aps_submissions").select("*").execute()
-    aps_stats = {
-        "total": len(aps_submissions.data),
-        "verified": 0,
-        "pending": 0,
-        "draft": 0
-    }
-
-    for aps in aps_submissions.data:
-        status = aps.get("status", "draft")
-        if status == "verified":
-            aps_stats["verified"] += 1
-        elif status == "submitted" or status == "in_review":
-            aps_stats["pending"] += 1
-        else:
-            aps_stats["draft"] += 1
-
-    # ============================================
-    # 5. TIME-SERIES DATA (Dynamic based on time range)
-    # ============================================
-    # Determine number of periods based on time range
-    if days <= 7:
-        num_periods = 7  # Daily
-        period_type = "day"
-    elif days <= 30:
-        num_periods = int(days / 7)  # Weekly
-        period_type = "week"
-    elif days <= 90:
-        num_periods = 3  # Monthly
-        period_type = "month"
-    else:
-        num_periods = 6  # 6 months
-        period_type = "month"
-
-    # Generate time periods
-    monthly_data = []
-
-    for i in range(num_periods - 1, -1, -1):
-        if period_type == "day":
-            period_date = now - timedelta(days=i)
-            period_start = period_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            period_end = period_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-            label = period_date.strftime("%m/%d")
-        elif period_type == "week":
-            period_date = now - timedelta(weeks=i)
-            # Keep timezone-aware by using replace() carefully
-            period_start = (period_date - timedelta(days=period_date.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-            period_end = period_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
-            label = period_start.strftime("W%W")
-        else:  # month
-            period_date = now - timedelta(days=30*i)
-            period_start = period_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if i == 0:
-                period_end = now
-            else:
-                next_month = period_start + timedelta(days=32)
-                period_end = next_month.replace(day=1) - timedelta(seconds=1)
-            label = period_date.strftime("%b")
-
-        # Count students registered in this period
-        students_in_period = sum(1 for u in all_users_response.data
-                               if u.get("role") == "student" and
-                               u.get("created_at") and
-                               period_start <= datetime.fromisoformat(u["created_at"].replace('Z', '+00:00')) <= period_end)
-
-        # Count applications
-        applications_in_period = sum(1 for app in all_applications.data
-                                   if app.get("created_at") and
-                                   period_start <= datetime.fromisoformat(app["created_at"].replace('Z', '+00:00')) <= period_end)
-
-        # Count consultations
-        consultations_in_period = sum(1 for c in all_consultations_response.data
-                                    if c.get("created_at") and
-                                    period_start <= datetime.fromisoformat(c["created_at"].replace('Z', '+00:00')) <= period_end)
-
-        monthly_data.append({
-            "month": label,
-            "students": students_in_period,
-            "applications": applications_in_period,
-            "consultations": consultations_in_period
-        })
-
-    # ============================================
-    # 6. CONVERSION FUNNEL (Real Data)
-    # ============================================
-    profiles = supabase.table("profiles").select("*").execute()
-
-    # Try to get eligibility results, handle if table doesn't exist
-    try:
-        eligibility_checks = supabase.table("eligibility_results").select("user_id").execute()
-        eligibility_data = eligibility_checks.data
-    except:
-        eligibility_data = []
-
-    # Calculate funnel stages (use total counts for funnel)
-    total_students = students_count_total or 0
-    profiles_completed = sum(1 for p in profiles.data if p.get("first_name") and p.get("last_name") and p.get("email"))
-    eligibility_checked = len(set(e.get("user_id") for e in eligibility_data if e.get("user_id")))
-    aps_verified = aps_stats["verified"]
-    docs_approved = doc_stats.get("approved", 0)
-    apps_submitted = app_stats.get("submitted", 0) + app_stats.get("in_review", 0) + app_stats.get("approved", 0)
-    enrolled = app_stats.get("enrolled", 0)
-
-    conversion_funnel = [
-        {"stage": "Total Students", "count": total_students},
-        {"stage": "Profile Completed", "count": profiles_completed},
-        {"stage": "Eligibility Checked", "count": eligibility_checked},
-        {"stage": "APS Verified", "count": aps_verified},
-        {"stage": "Docs Approved", "count": docs_approved},
-        {"stage": "Application Submitted", "count": apps_submitted},
-        {"stage": "Enrolled", "count": enrolled}
-    ]
-
-    # ============================================
-    # 7. CONVERSION METRICS
-    # ============================================
-    conversion_rate = (enrolled / total_students * 100) if total_students > 0 else 0
-    profile_completion_rate = (profiles_completed / total_students * 100) if total_students > 0 else 0
-
-    # ============================================
-    # 8. MESSAGES & ENGAGEMENT (with date filtering)
-    # ============================================
-    all_messages = supabase.table("messages").select("*").execute()
-    messages_in_range = [m for m in all_messages.data if in_date_range(m.get("created_at"))]
-
-    total_messages = len(messages_in_range)
-    student_messages = sum(1 for m in messages_in_range if m.get("sender_role") == "student")
-    counsellor_messages = sum(1 for m in messages_in_range if m.get("sender_role") in ["counsellor", "admin"])
-
-    # Calculate average response time (simplified - in real system would be more complex)
-    avg_response_time_hours = 0
-    if len(messages_in_range) > 1:
-        response_times = []
-        sorted_messages = sorted(messages_in_range, key=lambda m: m.get("created_at", ""))
-
-        for i in range(1, min(len(sorted_messages), 50)):  # Sample first 50 for performance
-            prev_msg = sorted_messages[i-1]
-            curr_msg = sorted_messages[i]
-
-            if (prev_msg.get("sender_role") == "student" and
-                curr_msg.get("sender_role") in ["counsellor", "admin"]):
-                try:
-                    prev_time = datetime.fromisoformat(prev_msg["created_at"].replace('Z', '+00:00'))
-                    curr_time = datetime.fromisoformat(curr_msg["created_at"].replace('Z', '+00:00'))
-                    diff_hours = (curr_time - prev_time).total_seconds() / 3600
-                    if diff_hours < 72:  # Only count responses within 72 hours
-                        response_times.append(diff_hours)
-                except:
-                    pass
-
-        avg_response_time_hours = sum(response_times) / len(response_times) if response_times else 0
-
-    # ============================================
-    # 9. STUDENT DEMOGRAPHICS
-    # ============================================
-    countries = defaultdict(int)
-    for profile in profiles.data:
-        country = profile.get("country") or profile.get("nationality") or "Unknown"
-        countries[country] += 1
-
-    # Top 5 countries
-    top_countries = sorted(countries.items(), key=lambda x: x[1], reverse=True)[:5]
-
-    # ============================================
-    # 10. GROWTH METRICS
-    # ============================================
-    # Calculate month-over-month growth
-    current_month_students = monthly_data[-1]["students"] if monthly_data else 0
-    prev_month_students = monthly_data[-2]["students"] if len(monthly_data) > 1 else 0
-    student_growth_rate = ((current_month_students - prev_month_students) / prev_month_students * 100) if prev_month_students > 0 else 0
-
-    current_month_apps = monthly_data[-1]["applications"] if monthly_data else 0
-    prev_month_apps = monthly_data[-2]["applications"] if len(monthly_data) > 1 else 0
-    app_growth_rate = ((current_month_apps - prev_month_apps) / prev_month_apps * 100) if prev_month_apps > 0 else 0
-
-    current_month_consults = monthly_data[-1]["consultations"] if monthly_data else 0
-    prev_month_consults = monthly_data[-2]["consultations"] if len(monthly_data) > 1 else 0
-    consult_growth_rate = ((current_month_consults - prev_month_consults) / prev_month_consults * 100) if prev_month_consults > 0 else 0
-
-    # ============================================
-    # RETURN COMPREHENSIVE ANALYTICS
-    # ============================================
-    return {
-        # Basic counts (filtered by time range)
-        "total_users": users_count or 0,
-        "total_students": students_count or 0,
-        "total_consultations": consultations_count or 0,
-
-        # Document statistics (filtered)
-        "document_stats": doc_stats,
-        "document_by_type": dict(doc_by_type),
-        "total_documents": len(documents_in_range),
-        "average_revisions_per_document": round(avg_revisions, 2),
-
-        # Application statistics (filtered)
-        "application_stats": app_stats,
-        "total_applications": len(applications_in_range),
-
-        # APS statistics
-        "aps_stats": aps_stats,
-
-        # Time-series data
-        "monthly_trends": monthly_data,
-
-        # Conversion funnel
-        "conversion_funnel": conversion_funnel,
-
-        # Conversion metrics
-        "conversion_rate": round(conversion_rate, 2),
-        "profile_completion_rate": round(profile_completion_rate, 2),
-
-        # Engagement metrics
-        "total_messages": total_messages,
-        "student_messages": student_messages,
-        "counsellor_messages": counsellor_messages,
-        "avg_response_time_hours": round(avg_response_time_hours, 2),
-
-        # Demographics
-        "top_countries": [{"country": c[0], "count": c[1]} for c in top_countries],
-
-        # Growth rates (month-over-month)
-        "growth_rates": {
-            "students": round(student_growth_rate, 1),
-            "applications": round(app_growth_rate, 1),
-            "documents": round(app_growth_rate, 1),  # Using app growth as proxy
-            "consultations": round(consult_growth_rate, 1)
-        }
-    }
+    """Get comprehensive platform analytics from the pre-aggregated rollups"""
+    analytics_service = AnalyticsService(db)
+    return await analytics_service.get_analytics(days)
+
+
+@router.post("/analytics/refresh")
+async def refresh_analytics(
+    full: bool = False,
+    current_user = Depends(require_admin),
+    db: Database = Depends(get_db_admin)
+):
+    """Bring the analytics rollups up to date now (full=true rebuilds them)"""
+    analytics_service = AnalyticsService(db)
+    refreshed = await analytics_service.refresh(full=full)
+    if refreshed is None:
+        raise HTTPException(status_code=409, detail="Another worker is refreshing the analytics, try again shortly")
+    return {"message": "Analytics refreshed", "days_refreshed": refreshed}
 
 
 # Lead Management Endpoints
@@ -439,11 +301,11 @@ async def get_analytics(
 async def create_lead(
     lead_data: Dict[str, Any],
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Create a new lead"""
-    response = supabase.table("leads").insert(lead_data).execute()
-    return {"lead": response.data[0]}
+    created = await db.leads.insert(lead_data)
+    return {"lead": created[0]}
 
 
 @router.put("/leads/{lead_id}")
@@ -451,11 +313,11 @@ async def update_lead(
     lead_id: str,
     lead_data: Dict[str, Any],
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Update a lead"""
-    response = supabase.table("leads").update(lead_data).eq("id", lead_id).execute()
-    return {"lead": response.data[0] if response.data else None}
+    updated = await db.leads.update(lead_data, id=lead_id)
+    return {"lead": updated[0] if updated else None}
 
 
 @router.patch("/leads/{lead_id}/status")
@@ -463,11 +325,11 @@ async def update_lead_status(
     lead_id: str,
     status: str,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Update lead status"""
-    response = supabase.table("leads").update({"status": status}).eq("id", lead_id).execute()
-    return {"lead": response.data[0] if response.data else None}
+    updated = await db.leads.update({"status": status}, id=lead_id)
+    return {"lead": updated[0] if updated else None}
 
 
 @router.patch("/leads/{lead_id}/assign")
@@ -475,130 +337,68 @@ async def assign_lead(
     lead_id: str,
     counsellor_id: str,
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Assign lead to counsellor"""
-    response = supabase.table("leads").update({"assigned_to": counsellor_id}).eq("id", lead_id).execute()
-    return {"lead": response.data[0] if response.data else None}
+    updated = await db.leads.update({"assigned_to": counsellor_id}, id=lead_id)
+    return {"lead": updated[0] if updated else None}
 
 
 @router.get("/counsellor-performance")
 async def get_counsellor_performance(
+    days: int = Query(30, ge=1, le=365),
     current_user = Depends(require_admin),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
-    """Get counsellor performance metrics"""
-    from datetime import datetime, timedelta
-    from collections import defaultdict
-
-    # Get all counsellors and admins
-    counsellors_response = supabase.table("users").select("*").in_("role", ["counsellor", "admin"]).execute()
-    counsellors = counsellors_response.data
-
-    # Get all data needed for calculations
-    profiles = supabase.table("profiles").select("*").execute()
-    aps_submissions = supabase.table("aps_submissions").select("*").execute()
-    documents = supabase.table("documents").select("*").execute()
-    messages = supabase.table("messages").select("*").execute()
-
-    counsellor_metrics = []
-
-    for counsellor in counsellors:
-        counsellor_id = counsellor["id"]
-        counsellor_name = counsellor.get("full_name") or counsellor.get("email", "Unknown")
-
-        # Students assigned (profiles with this counsellor)
-        assigned_students = [p for p in profiles.data if p.get("assigned_counsellor_id") == counsellor_id]
-        students_assigned = len(assigned_students)
-
-        # APS verified by this counsellor
-        aps_verified = sum(1 for aps in aps_submissions.data
-                          if aps.get("reviewed_by") == counsellor_id and aps.get("status") == "verified")
-
-        # Documents approved by this counsellor
-        docs_approved = sum(1 for doc in documents.data
-                           if doc.get("reviewed_by") == counsellor_id and doc.get("status") == "approved")
-
-        # Documents pending review
-        docs_pending = sum(1 for doc in documents.data
-                          if doc.get("assigned_to") == counsellor_id and doc.get("status") in ["submitted", "in_review"])
-
-        # Calculate average response time for this counsellor
-        counsellor_messages = [m for m in messages.data if m.get("sender_id") == counsellor_id]
-        student_messages_to_counsellor = []
-
-        # Get messages from students that this counsellor responded to
-        for i in range(len(messages.data) - 1):
-            msg = messages.data[i]
-            next_msg = messages.data[i + 1]
-
-            if (msg.get("sender_role") == "student" and
-                next_msg.get("sender_id") == counsellor_id and
-                msg.get("conversation_id") == next_msg.get("conversation_id")):
-                try:
-                    msg_time = datetime.fromisoformat(msg["created_at"].replace('Z', '+00:00'))
-                    resp_time = datetime.fromisoformat(next_msg["created_at"].replace('Z', '+00:00'))
-                    diff_hours = (resp_time - msg_time).total_seconds() / 3600
-                    if diff_hours < 72:  # Only count responses within 72 hours
-                        student_messages_to_counsellor.append(diff_hours)
-                except:
-                    pass
-
-        avg_response_time = sum(student_messages_to_counsellor) / len(student_messages_to_counsellor) if student_messages_to_counsellor else 0
-
-        # Message count
-        total_messages = len(counsellor_messages)
-
-        # Calculate workload score (simple metric)
-        workload_score = students_assigned + (docs_pending * 2) + (aps_verified * 1.5)
-
-        counsellor_metrics.append({
-            "counsellor_id": counsellor_id,
-            "counsellor_name": counsellor_name,
-            "counsellor_email": counsellor.get("email"),
-            "students_assigned": students_assigned,
-            "aps_verified": aps_verified,
-            "docs_approved": docs_approved,
-            "docs_pending": docs_pending,
-            "total_messages": total_messages,
-            "avg_response_time_hours": round(avg_response_time, 2),
-            "workload_score": round(workload_score, 1),
-            "student_rating": 0  # Placeholder - would come from feedback system
-        })
-
-    # Sort by workload score descending
-    counsellor_metrics.sort(key=lambda x: x["workload_score"], reverse=True)
-
-    return {
-        "counsellors": counsellor_metrics,
-        "total_counsellors": len(counsellor_metrics),
-        "summary": {
-            "total_students_assigned": sum(c["students_assigned"] for c in counsellor_metrics),
-            "total_aps_verified": sum(c["aps_verified"] for c in counsellor_metrics),
-            "total_docs_approved": sum(c["docs_approved"] for c in counsellor_metrics),
-            "avg_workload": round(sum(c["workload_score"] for c in counsellor_metrics) / len(counsellor_metrics), 1) if counsellor_metrics else 0
-        }
-    }
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    """Get counsellor performance metrics (messages and response times over the last `days` days)"""
+    analytics_service = AnalyticsService(db)
+    return await analytics_service.get_counsellor_performance(days)
 
 
+@router.post("/notifications/broadcast", response_model=NotificationBulkResult)
+async def broadcast_notification(
+    request: NotificationBroadcastRequest,
+    current_user = Depends(require_counsellor),
+    db: Database = Depends(get_db_admin)
+):
+    """
+    Send one notification to many users
+
+    Audiences: all_students (active students), counsellor_students (the
+    students assigned to counsellor_id, or to the caller) and users (the
+    given user_ids). Counsellors may only notify their own students.
+    Recipients are inserted in concurrent batches; failed batches are
+    reported with their recipients rather than failing the request. With
+    email set, the announcement is also emailed, up to 1000 recipients per
+    SendGrid request.
+    """
+    is_admin = current_user.role == "admin"
+    if request.audience == "counsellor_students":
+        counsellor_id = str(request.counsellor_id or current_user.id)
+        if not is_admin and counsellor_id != str(current_user.id):
+            raise HTTPException(status_code=403, detail="Counsellors can only notify their own students")
+        user_ids = await db.profiles.user_ids_by_counsellor(counsellor_id)
+    elif not is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can notify this audience")
+    elif request.audience == "all_students":
+        user_ids = await db.users.list_ids("student")
+    else:
+        if not request.user_ids:
+            raise HTTPException(status_code=400, detail="user_ids is required for the users audience")
+        user_ids = request.user_ids
+
+    notification_service = NotificationService(db)
+    result = await notification_service.create_bulk(
+        user_ids,
+        notification_type=request.type,
+        title=request.title,
+        message=request.message,
+        link=request.link,
+        metadata=request.metadata
+    )
+    if request.email:
+        recipients = await db.users.find_in("id", user_ids, "email, name")
+        result.emails = await EmailService().send_announcement(
+            recipients, request.title, request.message, request.link
+        )
+    return result
@@ -3,11 +3,12 @@ University application tracking endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 from uuid import UUID
 from typing import Optional
 
-from app.dependencies import get_supabase, get_current_user, require_counsellor
+from app.dependencies import get_db, get_current_user, require_counsellor
+from app.repositories.database import Database
+from app.services.outbox import outbox, notification_entry
 from app.models.application import (
     ApplicationResponse, ApplicationCreate, ApplicationUpdate, ApplicationListResponse
 )
@@ -19,14 +20,12 @@ router = APIRouter()
 async def get_applications(
     stats: bool = False,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get all applications for current user"""
-    response = supabase.table("applications").select("*").eq(
-        "student_id", str(current_user.id)
-    ).order("created_at", desc=True).execute()
+    rows = await db.applications.list_for_student(current_user.id)
     
-    applications = [ApplicationResponse(**app) for app in response.data]
+    applications = [ApplicationResponse(**app) for app in rows]
     
     # Calculate stats if requested
     stats_data = None
@@ -47,30 +46,28 @@ async def get_applications(
 async def create_application(
     application: ApplicationCreate,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Create new application (counsellor/admin only)"""
-    application_data = application.model_dump()
+    application_data = application.model_dump(mode="json")
     
-    response = supabase.table("applications").insert(application_data).execute()
+    created = await db.applications.insert(application_data)
     
-    return ApplicationResponse(**response.data[0])
+    return ApplicationResponse(**created[0])
 
 
 @router.get("/{application_id}", response_model=ApplicationResponse)
 async def get_application(
     application_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get specific application"""
-    response = supabase.table("applications").select("*").eq("id", str(application_id)).execute()
+    application = await db.applications.get(application_id)
     
-    if not response.data:
+    if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    application = response.data[0]
-    
     # Check access
     if application["student_id"] != str(current_user.id) and current_user.role not in ["counsellor", "admin"]:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -83,28 +80,28 @@ async def update_application(
     application_id: UUID,
     update: ApplicationUpdate,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Update application status (counsellor/admin only)"""
     update_data = update.dict(exclude_unset=True)
     
-    response = supabase.table("applications").update(update_data).eq("id", str(application_id)).execute()
+    updated = await db.applications.update(update_data, id=application_id)
     
-    if not response.data:
+    if not updated:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    # Send notification
-    from app.services.notification_service import NotificationService
-    
-    application = response.data[0]
-    notification_service = NotificationService(supabase)
-    
-    await notification_service.notify_application_update(
-        user_id=UUID(application["student_id"]),
-        university=application["university_name"],
-        status=application["status"],
-        application_id=application_id
-    )
+    # Queue the notification, once per status the application reaches
+    application = updated[0]
+    await outbox.enqueue([
+        notification_entry(
+            "notify_application_update",
+            f"application:{application_id}:{application['status']}",
+            user_id=application["student_id"],
+            university=application["university_name"],
+            status=application["status"],
+            application_id=application_id
+        )
+    ])
     
     return ApplicationResponse(**application)
 
@@ -113,10 +110,10 @@ async def update_application(
 async def delete_application(
     application_id: UUID,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Delete application (admin only)"""
-    supabase.table("applications").delete().eq("id", str(application_id)).execute()
+    await db.applications.delete(id=application_id)
     
     return {"message": "Application deleted successfully"}
 
@@ -3,13 +3,15 @@ APS form submission endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 from uuid import UUID
 
-from app.dependencies import get_supabase, get_supabase_admin, get_current_user, require_counsellor
+from app.dependencies import get_db_admin, get_current_user, require_counsellor
+from app.repositories.database import Database
 from app.models.aps import APSSubmissionResponse, APSSubmissionCreate, APSSubmissionUpdate
+from app.tracing import get_tracer
 
 router = APIRouter()
+trace = get_tracer(__name__)
 
 
 def transform_aps_response(db_row: dict) -> dict:
@@ -42,25 +44,23 @@ def transform_aps_response(db_row: dict) -> dict:
 @router.get("/me")
 async def get_my_aps_submission(
     current_user = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Get current user's APS submission"""
-    response = supabase_admin.table("aps_submissions").select("*").eq(
-        "student_id", str(current_user.id)
-    ).order("submitted_at", desc=True).limit(1).execute()
+    submission = await db.aps_submissions.get_latest_for_student(current_user.id)
 
-    if not response.data:
+    if not submission:
         # Return null form instead of 404 when no submission exists
         return {"form": None}
 
-    return {"form": transform_aps_response(response.data[0])}
+    return {"form": transform_aps_response(submission)}
 
 
 @router.post("/me")
 async def submit_aps_form(
     submission: APSSubmissionCreate,
     current_user = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Submit APS form"""
     submission_data = {
@@ -69,50 +69,46 @@ async def submit_aps_form(
         "status": "submitted"
     }
 
-    response = supabase_admin.table("aps_submissions").insert(submission_data).execute()
+    created = await db.aps_submissions.insert(submission_data)
 
-    return {"form": transform_aps_response(response.data[0])}
+    return {"form": transform_aps_response(created[0])}
 
 
 @router.put("/me")
 async def update_aps_submission(
     update: APSSubmissionUpdate,
     current_user = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Update APS submission"""
     try:
-        print(f"[DEBUG] APS Update: user_id={current_user.id}, status={update.status}")
+        trace.debug("APS Update: user_id=%s, status=%s", current_user.id, update.status)
 
         # Get existing submission
-        existing = supabase_admin.table("aps_submissions").select("*").eq(
-            "student_id", str(current_user.id)
-        ).order("submitted_at", desc=True).limit(1).execute()
+        existing = await db.aps_submissions.get_latest_for_student(current_user.id)
 
-        if not existing.data:
+        if not existing:
             # If no submission exists, create a new one
-            print(f"[DEBUG] APS: No existing submission, creating new one")
+            trace.debug("APS: No existing submission, creating new one")
             submission_data = {
                 "student_id": str(current_user.id),
                 "form_data": update.form_data or {},
                 "status": update.status or "draft"
             }
-            response = supabase_admin.table("aps_submissions").insert(submission_data).execute()
-            print(f"[DEBUG] APS: Created submission with id={response.data[0]['id']}")
-            return {"form": transform_aps_response(response.data[0])}
+            created = await db.aps_submissions.insert(submission_data)
+            trace.debug("APS: Created submission with id=%s", created[0]["id"])
+            return {"form": transform_aps_response(created[0])}
 
-        submission_id = existing.data[0]["id"]
-        print(f"[DEBUG] APS: Updating existing submission id={submission_id}")
+        submission_id = existing["id"]
+        trace.debug("APS: Updating existing submission id=%s", submission_id)
         update_data = update.model_dump(exclude_unset=True)
 
-        response = supabase_admin.table("aps_submissions").update(update_data).eq("id", submission_id).execute()
-        print(f"[DEBUG] APS: Update successful")
+        updated = await db.aps_submissions.update(update_data, id=submission_id)
+        trace.debug("APS: Update successful")
 
-        return {"form": transform_aps_response(response.data[0])}
+        return {"form": transform_aps_response(updated[0])}
     except Exception as e:
-        print(f"[ERROR] APS Update failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        trace.error("APS Update failed: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -122,7 +118,7 @@ async def verify_aps_submission(
     verification_comments: str,
     status: str,
     current_user = Depends(require_counsellor),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Verify APS submission (counsellor only)"""
     from datetime import datetime
@@ -134,12 +130,12 @@ async def verify_aps_submission(
         "verified_at": datetime.utcnow().isoformat()
     }
     
-    response = supabase_admin.table("aps_submissions").update(update_data).eq("id", str(submission_id)).execute()
+    updated = await db.aps_submissions.update(update_data, id=submission_id)
     
-    if not response.data:
+    if not updated:
         raise HTTPException(status_code=404, detail="Submission not found")
     
-    return APSSubmissionResponse(**response.data[0])
+    return APSSubmissionResponse(**updated[0])
 
 
 
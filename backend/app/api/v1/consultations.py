@@ -2,16 +2,18 @@
 Consultation scheduling endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date
 from uuid import UUID
 from typing import Optional
 
-from app.dependencies import get_supabase, get_current_user, require_counsellor
+from app.dependencies import get_db, get_current_user, require_counsellor
+from app.repositories.database import Database
 from app.models.consultation import (
     ConsultationResponse, ConsultationCreate, ConsultationUpdate, ConsultationListResponse
 )
-from app.services.notification_service import NotificationService
+from app.services.outbox import outbox, notification_entry
+from app.services.availability_service import AvailabilityService
 
 router = APIRouter()
 
@@ -19,10 +21,10 @@ router = APIRouter()
 @router.get("/counsellors")
 async def get_counsellors(
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get list of available counsellors"""
-    response = supabase.table("users").select("id, name, email").eq("role", "counsellor").execute()
+    rows = await db.users.find("id, name, email", role="counsellor")
 
     counsellors = [{
         "id": c["id"],
@@ -30,86 +32,71 @@ async def get_counsellors(
         "email": c["email"],
         "expertise": ["General Counselling", "Germany Studies"],
         "availability": []
-    } for c in response.data]
+    } for c in rows]
 
     return {"counsellors": counsellors}
 
 
 @router.get("/slots")
 async def get_available_slots(
+    start_date: Optional[date] = None,
+    days: int = Query(30, ge=1, le=90),
+    duration_minutes: int = Query(60, ge=15, le=240),
+    counsellor_id: Optional[UUID] = None,
+    available_only: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get available time slots for consultations"""
-    from datetime import datetime, timedelta
-
-    # Get all counsellors
-    counsellors = supabase.table("users").select("id").eq("role", "counsellor").execute()
-
-    # Generate slots for next 30 days (9 AM to 5 PM, weekdays only)
-    slots = []
-    start_date = datetime.now()
-
-    for day_offset in range(30):
-        current_date = start_date + timedelta(days=day_offset)
-
-        # Skip weekends
-        if current_date.weekday() >= 5:
-            continue
-
-        # Generate time slots (9 AM to 5 PM)
-        for hour in range(9, 17):
-            for counsellor in counsellors.data:
-                slot_date = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-
-                # Check if slot is already booked
-                existing = supabase.table("consultations")\
-                    .select("id")\
-                    .eq("counsellor_id", counsellor["id"])\
-                    .gte("scheduled_at", slot_date.isoformat())\
-                    .lt("scheduled_at", (slot_date + timedelta(hours=1)).isoformat())\
-                    .execute()
-
-                slots.append({
-                    "date": slot_date.isoformat(),
-                    "time": f"{hour:02d}:00",
-                    "counsellorId": counsellor["id"],
-                    "available": len(existing.data) == 0
-                })
-
-    return {"slots": slots[:100]}  # Limit to 100 slots
+    availability_service = AvailabilityService(db)
+    return await availability_service.get_slots(
+        start_date=start_date,
+        days=days,
+        duration_minutes=duration_minutes,
+        counsellor_id=str(counsellor_id) if counsellor_id else None,
+        available_only=available_only,
+        offset=offset,
+        limit=limit
+    )
 
 
 @router.get("")
 async def get_consultations(
     type: Optional[str] = None,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get consultations for current user"""
     from datetime import datetime
 
-    query = supabase.table("consultations").select("*, counsellor:users!consultations_counsellor_id_fkey(name, email)")
-
+    student_id = None
     if current_user.role == "student":
-        query = query.eq("student_id", str(current_user.id))
-    elif current_user.role in ["counsellor", "admin"]:
-        if type == "upcoming":
-            query = query.eq("status", "scheduled")
-        # Counsellors see all consultations or their assigned ones
+        student_id = current_user.id
+    # Counsellors see all consultations or their assigned ones
 
     # Filter by type
     now = datetime.now().isoformat()
+    status = None
+    scheduled_from = None
+    scheduled_before = None
     if type == "upcoming":
-        query = query.gte("scheduled_at", now).eq("status", "scheduled")
+        status = "scheduled"
+        scheduled_from = now
     elif type == "history":
-        query = query.lt("scheduled_at", now)
+        scheduled_before = now
 
-    response = query.order("scheduled_at", desc=False).execute()
+    rows = await db.consultations.list_with_counsellor(
+        student_id=student_id,
+        status=status,
+        scheduled_from=scheduled_from,
+        scheduled_before=scheduled_before
+    )
 
     # Format consultations to match frontend expectations
     consultations = []
-    for c in response.data:
+    for c in rows:
         # Extract counsellor name from joined data
         counsellor_name = "Unassigned"
         if c.get("counsellor"):
@@ -143,7 +130,7 @@ async def get_consultations(
 async def book_consultation(
     consultation: ConsultationCreate,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Book a consultation"""
     # Transform frontend data to backend format
@@ -157,24 +144,27 @@ async def book_consultation(
         "status": "scheduled"
     }
 
-    response = supabase.table("consultations").insert(consultation_data).execute()
+    created = await db.consultations.insert(consultation_data)
 
     # Get counsellor name
-    counsellor = supabase.table("users").select("name, email").eq("id", str(consultation.counsellor_id)).execute()
+    counsellor = await db.users.get(consultation.counsellor_id, "name, email")
     counsellor_name = "Unassigned"
-    if counsellor.data:
-        counsellor_name = counsellor.data[0].get("name") or counsellor.data[0].get("email", "").split("@")[0]
-
-    # Send notification
-    notification_service = NotificationService(supabase)
-    await notification_service.notify_consultation_scheduled(
-        user_id=current_user.id,
-        scheduled_at=str(consultation.scheduled_date),
-        consultation_id=UUID(response.data[0]["id"])
-    )
+    if counsellor:
+        counsellor_name = counsellor.get("name") or counsellor.get("email", "").split("@")[0]
+
+    # Queue the notification
+    await outbox.enqueue([
+        notification_entry(
+            "notify_consultation_scheduled",
+            f"consultation:{created[0]['id']}:scheduled",
+            user_id=current_user.id,
+            scheduled_at=str(consultation.scheduled_date),
+            consultation_id=created[0]["id"]
+        )
+    ])
 
     # Add counsellor_name to response
-    result = response.data[0]
+    result = created[0]
     result["counsellor_name"] = counsellor_name
 
     return result
@@ -184,16 +174,14 @@ async def book_consultation(
 async def get_consultation(
     consultation_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get specific consultation"""
-    response = supabase.table("consultations").select("*").eq("id", str(consultation_id)).execute()
+    consultation = await db.consultations.get(consultation_id)
     
-    if not response.data:
+    if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
     
-    consultation = response.data[0]
-    
     # Check access
     if consultation["student_id"] != str(current_user.id) and current_user.role not in ["counsellor", "admin"]:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -206,40 +194,38 @@ async def update_consultation(
     consultation_id: UUID,
     update: ConsultationUpdate,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Update consultation (counsellor/admin only)"""
     update_data = update.dict(exclude_unset=True)
     
-    response = supabase.table("consultations").update(update_data).eq("id", str(consultation_id)).execute()
+    updated = await db.consultations.update(update_data, id=consultation_id)
     
-    if not response.data:
+    if not updated:
         raise HTTPException(status_code=404, detail="Consultation not found")
     
-    return ConsultationResponse(**response.data[0])
+    return ConsultationResponse(**updated[0])
 
 
 @router.delete("/{consultation_id}")
 async def cancel_consultation(
     consultation_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Cancel consultation"""
     # Get consultation
-    response = supabase.table("consultations").select("*").eq("id", str(consultation_id)).execute()
+    consultation = await db.consultations.get(consultation_id)
     
-    if not response.data:
+    if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
     
-    consultation = response.data[0]
-    
     # Check ownership
     if consultation["student_id"] != str(current_user.id) and current_user.role not in ["counsellor", "admin"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Update status to cancelled
-    supabase.table("consultations").update({"status": "cancelled"}).eq("id", str(consultation_id)).execute()
+    await db.consultations.update({"status": "cancelled"}, id=consultation_id)
     
     return {"message": "Consultation cancelled successfully"}
 
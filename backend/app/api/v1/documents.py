@@ -3,73 +3,99 @@ Document management and AI generation endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from supabase import Client
 from uuid import UUID
 from typing import List
 from datetime import datetime
+import asyncio
+import json
 
-from app.dependencies import get_supabase, get_current_user, require_counsellor
+from app.dependencies import get_supabase, get_db, get_current_user, require_counsellor
+from app.repositories.database import Database
 from app.models.document import (
     DocumentResponse, DocumentCreate, DocumentUpdate,
-    DocumentGenerateRequest, DocumentReviewRequest, DocumentListResponse
+    DocumentGenerateRequest, DocumentReviewRequest, DocumentListResponse, GenerationJobResponse,
+    DocumentBatchGenerateRequest, DocumentBatchGenerateResponse, DocumentBatchItemResult
 )
 from app.models.profile import ProfileInDB
-from app.services.ai_service import AIService
+from app.config import settings
+from app.services.ai_service import get_ai_service
+from app.services.generation_jobs import generation_queue, QueueFullError
 from app.services.storage_service import StorageService
-from app.services.notification_service import NotificationService
-from app.services.email_service import EmailService
+from app.services.outbox import outbox, notification_entry, email_entry
+from app.tracing import get_tracer
 
 router = APIRouter()
+trace = get_tracer(__name__)
 
 
 @router.get("", response_model=DocumentListResponse)
 async def get_documents(
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get all documents for current user"""
-    response = supabase.table("documents").select("*").eq("student_id", str(current_user.id)).order("created_at", desc=True).execute()
+    rows = await db.documents.list_for_student(current_user.id)
     
     return DocumentListResponse(
-        documents=[DocumentResponse(**doc) for doc in response.data],
-        total=len(response.data)
+        documents=[DocumentResponse(**doc) for doc in rows],
+        total=len(rows)
     )
 
 
-@router.post("/generate", response_model=DocumentResponse)
-async def generate_document(
-    request: DocumentGenerateRequest,
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
-):
-    """Generate AI-powered document"""
-    print(f"[DEBUG] Generate document request: {request.dict()}")
+async def _get_generation_profile(db: Database, user_id) -> ProfileInDB:
+    """Load the student's profile, checking it is complete enough for AI generation"""
+    profile_row = await db.profiles.get_by_user_id(user_id)
     
-    # Get user profile
-    profile_response = supabase.table("profiles").select("*").eq("user_id", str(current_user.id)).execute()
+    trace.debug("Profile response: %s", profile_row)
     
-    print(f"[DEBUG] Profile response: {profile_response.data}")
-    
-    if not profile_response.data:
+    if not profile_row:
         error_msg = "Please complete your profile first"
-        print(f"[ERROR] {error_msg}")
+        trace.info("%s (user %s)", error_msg, user_id)
         raise HTTPException(status_code=400, detail=error_msg)
     
-    profile = ProfileInDB(**profile_response.data[0])
+    profile = ProfileInDB(**profile_row)
     
-    print(f"[DEBUG] Profile completion: {profile.completion_percentage}%")
+    trace.debug("Profile completion: %s%%", profile.completion_percentage)
     
     # Check profile completion
     if profile.completion_percentage < 80:
         error_msg = f"Profile must be at least 80% complete to generate documents. Current: {profile.completion_percentage}%"
-        print(f"[ERROR] {error_msg}")
+        trace.info("%s (user %s)", error_msg, user_id)
         raise HTTPException(
             status_code=400,
             detail=error_msg
         )
     
+    return profile
+
+
+async def _save_generated_document(db: Database, user_id, request: DocumentGenerateRequest, content: str) -> dict:
+    """Store generated content as a new draft document"""
+    return await db.documents.create_draft(
+        user_id, request.type, f"{request.type.upper()} - {request.university}", content
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate", response_model=DocumentResponse)
+async def generate_document(
+    request: DocumentGenerateRequest,
+    current_user = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """Generate AI-powered document"""
+    trace.debug("Generate document request: %s", request)
+    
+    profile = await _get_generation_profile(db, current_user.id)
+    
     # Generate document with AI
-    ai_service = AIService()
+    ai_service = get_ai_service()
     
     try:
         content = await ai_service.generate_document(
@@ -77,40 +103,190 @@ async def generate_document(
             profile=profile,
             university=request.university,
             program=request.program,
-            additional_info=request.additional_info
+            additional_info=request.additional_info,
+            regenerate=request.regenerate
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
     
     # Save document to database
-    document_data = {
-        "student_id": str(current_user.id),
-        "type": request.type,
-        "title": f"{request.type.upper()} - {request.university}",
-        "content": content,
-        "status": "draft",
-        "version": 1
-    }
+    document = await _save_generated_document(db, current_user.id, request, content)
     
-    created = supabase.table("documents").insert(document_data).execute()
-    
-    return DocumentResponse(**created.data[0])
+    return DocumentResponse(**document)
+
+
+@router.post("/generate/stream")
+async def generate_document_stream(
+    request: DocumentGenerateRequest,
+    current_user = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """
+    Generate AI-powered document, streaming text as Server-Sent Events
+
+    Emits "chunk" events ({"text": ...}) as Gemini produces output, then a
+    "done" event carrying the saved document, or an "error" event if
+    generation or saving the document fails.
+    """
+    profile = await _get_generation_profile(db, current_user.id)
+    ai_service = get_ai_service()
+
+    async def events():
+        parts = []
+        try:
+            async for text in ai_service.stream_document(
+                document_type=request.type,
+                profile=profile,
+                university=request.university,
+                program=request.program,
+                additional_info=request.additional_info,
+                regenerate=request.regenerate
+            ):
+                parts.append(text)
+                yield _sse("chunk", {"text": text})
+        except Exception as e:
+            yield _sse("error", {"detail": f"AI generation failed: {str(e)}"})
+            return
+
+        try:
+            document = await _save_generated_document(db, current_user.id, request, "".join(parts))
+            done = DocumentResponse(**document).model_dump(mode="json")
+        except Exception as e:
+            yield _sse("error", {"detail": f"Saving the generated document failed: {str(e)}"})
+            return
+
+        yield _sse("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/generate/batch", response_model=DocumentBatchGenerateResponse)
+async def generate_documents_batch(
+    request: DocumentBatchGenerateRequest,
+    current_user = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """
+    Generate AI-powered documents for several universities in one request
+
+    The profile is loaded once and the targets are generated concurrently
+    (at most GENERATION_BATCH_CONCURRENCY at a time). Successful documents
+    are saved with a single insert. A failed target does not fail the
+    batch; results are returned per target, in request order.
+    """
+    if len(request.targets) > settings.GENERATION_BATCH_MAX_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.GENERATION_BATCH_MAX_TARGETS} documents can be generated per batch"
+        )
+
+    profile = await _get_generation_profile(db, current_user.id)
+    ai_service = get_ai_service()
+    slots = asyncio.Semaphore(settings.GENERATION_BATCH_CONCURRENCY)
+
+    async def generate(target):
+        async with slots:
+            return await ai_service.generate_document(
+                document_type=target.type,
+                profile=profile,
+                university=target.university,
+                program=target.program,
+                additional_info=request.additional_info,
+                regenerate=request.regenerate
+            )
+
+    outcomes = await asyncio.gather(
+        *(generate(target) for target in request.targets), return_exceptions=True
+    )
+
+    generated = [
+        (target, content) for target, content in zip(request.targets, outcomes)
+        if not isinstance(content, BaseException)
+    ]
+    try:
+        saved = await db.documents.create_drafts(current_user.id, [
+            (target.type, f"{target.type.upper()} - {target.university}", content)
+            for target, content in generated
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save generated documents: {str(e)}")
+    documents = iter(saved)
+
+    results = []
+    for target, outcome in zip(request.targets, outcomes):
+        item = DocumentBatchItemResult(**target.model_dump(), status="succeeded")
+        if isinstance(outcome, BaseException):
+            item.status = "failed"
+            item.error = f"AI generation failed: {str(outcome)}"
+        else:
+            item.document = DocumentResponse(**next(documents))
+        results.append(item)
+
+    succeeded = len(generated)
+    return DocumentBatchGenerateResponse(
+        results=results, succeeded=succeeded, failed=len(results) - succeeded
+    )
+
+
+@router.post("/jobs", response_model=GenerationJobResponse, status_code=202)
+async def create_generation_job(
+    request: DocumentGenerateRequest,
+    current_user = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """Queue AI document generation and return the job to poll"""
+    profile = await _get_generation_profile(db, current_user.id)
+
+    try:
+        job = await generation_queue.submit(db, current_user.id, profile, request)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Document generation is busy, please retry shortly",
+            headers={"Retry-After": str(settings.GENERATION_RETRY_AFTER)}
+        )
+
+    return GenerationJobResponse(**job)
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: UUID,
+    current_user = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """Get a generation job's status, with the document once it has succeeded"""
+    job = await generation_queue.get(str(job_id))
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["student_id"] != str(current_user.id) and current_user.role not in ["counsellor", "admin"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    response = GenerationJobResponse(**job)
+    if job.get("document_id"):
+        document = await db.documents.get(job["document_id"])
+        response.document = DocumentResponse(**document) if document else None
+    return response
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get specific document"""
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    document = await db.documents.get(document_id)
     
-    if not response.data:
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    document = response.data[0]
-    
     # Check ownership
     if document["student_id"] != str(current_user.id) and current_user.role not in ["counsellor", "admin"]:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -123,52 +299,48 @@ async def update_document(
     document_id: UUID,
     document_update: DocumentUpdate,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Update document"""
     # Check ownership
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    document = await db.documents.get(document_id)
     
-    if not response.data:
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    document = response.data[0]
-    
     if document["student_id"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Update document
     update_data = document_update.dict(exclude_unset=True)
-    updated = supabase.table("documents").update(update_data).eq("id", str(document_id)).execute()
+    updated = await db.documents.update(update_data, id=document_id)
     
-    return DocumentResponse(**updated.data[0])
+    return DocumentResponse(**updated[0])
 
 
 @router.post("/{document_id}/submit", response_model=DocumentResponse)
 async def submit_document_for_review(
     document_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Submit document for counsellor review"""
     # Check ownership
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    document = await db.documents.get(document_id)
     
-    if not response.data:
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    document = response.data[0]
-    
     if document["student_id"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Update status
-    updated = supabase.table("documents").update({
+    updated = await db.documents.update({
         "status": "submitted",
         "submitted_at": datetime.utcnow().isoformat()
-    }).eq("id", str(document_id)).execute()
+    }, id=document_id)
     
-    return DocumentResponse(**updated.data[0])
+    return DocumentResponse(**updated[0])
 
 
 @router.post("/{document_id}/review", response_model=DocumentResponse)
@@ -176,33 +348,53 @@ async def review_document(
     document_id: UUID,
     review: DocumentReviewRequest,
     current_user = Depends(require_counsellor),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Review document (counsellor/admin only)"""
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    existing = await db.documents.get(document_id, "id")
     
-    if not response.data:
+    if not existing:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Update document with review
-    updated = supabase.table("documents").update({
+    updated = await db.documents.update({
         "status": review.status,
         "review_comments": review.review_comments,
         "counsellor_id": str(current_user.id),
         "reviewed_at": datetime.utcnow().isoformat()
-    }).eq("id", str(document_id)).execute()
+    }, id=document_id)
     
-    # Send notifications
-    document = updated.data[0]
-    notification_service = NotificationService(supabase)
-    email_service = EmailService()
+    if not updated:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    student_id = UUID(document["student_id"])
+    # Queue the notification and email (delivered by the outbox dispatcher)
+    document = updated[0]
+    student_id = document["student_id"]
+    # Once per review outcome of each submission
+    dedup_key = f"document:{document_id}:{review.status}:{document.get('submitted_at') or document['reviewed_at']}"
     
     if review.status == "approved":
-        await notification_service.notify_document_approved(student_id, document["type"], document_id)
+        await outbox.enqueue([
+            notification_entry(
+                "notify_document_approved", dedup_key,
+                user_id=student_id, document_type=document["type"], document_id=document_id
+            ),
+            email_entry(
+                "send_document_approved_email", student_id, f"{dedup_key}:email",
+                document_type=document["type"]
+            ),
+        ])
     elif review.status == "needs_revision":
-        await notification_service.notify_document_needs_revision(student_id, document["type"], document_id)
+        await outbox.enqueue([
+            notification_entry(
+                "notify_document_needs_revision", dedup_key,
+                user_id=student_id, document_type=document["type"], document_id=document_id
+            ),
+            email_entry(
+                "send_document_needs_revision_email", student_id, f"{dedup_key}:email",
+                document_type=document["type"], comments=review.review_comments
+            ),
+        ])
     
     return DocumentResponse(**document)
 
@@ -211,22 +403,20 @@ async def review_document(
 async def delete_document(
     document_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Delete document"""
     # Check ownership
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    document = await db.documents.get(document_id)
     
-    if not response.data:
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    document = response.data[0]
-    
     if document["student_id"] != str(current_user.id) and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Delete document
-    supabase.table("documents").delete().eq("id", str(document_id)).execute()
+    await db.documents.delete(id=document_id)
     
     return {"message": "Document deleted successfully"}
 
@@ -236,17 +426,16 @@ async def upload_document_file(
     document_id: UUID,
     file: UploadFile = File(...),
     current_user = Depends(get_current_user),
+    db: Database = Depends(get_db),
     supabase: Client = Depends(get_supabase)
 ):
     """Upload file for document"""
     # Check ownership
-    response = supabase.table("documents").select("*").eq("id", str(document_id)).execute()
+    document = await db.documents.get(document_id)
     
-    if not response.data:
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    document = response.data[0]
-    
     if document["student_id"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -255,9 +444,9 @@ async def upload_document_file(
     file_data = await storage_service.upload_file(file, str(current_user.id), document["type"])
     
     # Update document with file info
-    updated = supabase.table("documents").update(file_data).eq("id", str(document_id)).execute()
+    updated = await db.documents.update(file_data, id=document_id)
     
-    return DocumentResponse(**updated.data[0])
+    return DocumentResponse(**updated[0])
 
 
 
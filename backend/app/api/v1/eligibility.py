@@ -3,9 +3,9 @@ Eligibility checker endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 
-from app.dependencies import get_supabase, get_current_user
+from app.dependencies import get_db, get_current_user
+from app.repositories.database import Database
 from app.models.eligibility import EligibilityCheckRequest, EligibilityResponse, EligibilityResult
 
 router = APIRouter()
@@ -102,7 +102,7 @@ def calculate_eligibility(request: EligibilityCheckRequest) -> EligibilityResult
 async def check_eligibility(
     request: EligibilityCheckRequest,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Check student eligibility for German universities"""
     # Calculate eligibility
@@ -115,25 +115,23 @@ async def check_eligibility(
         **result.model_dump()
     }
     
-    response = supabase.table("eligibility_checks").insert(eligibility_data).execute()
+    created = await db.eligibility_checks.insert(eligibility_data)
     
-    return EligibilityResponse(**response.data[0])
+    return EligibilityResponse(**created[0])
 
 
 @router.get("/me", response_model=EligibilityResponse)
 async def get_my_eligibility(
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Get latest eligibility check result"""
-    response = supabase.table("eligibility_checks").select("*").eq(
-        "student_id", str(current_user.id)
-    ).order("created_at", desc=True).limit(1).execute()
+    latest = await db.eligibility_checks.get_latest_for_student(current_user.id)
     
-    if not response.data:
+    if not latest:
         raise HTTPException(status_code=404, detail="No eligibility check found")
     
-    return EligibilityResponse(**response.data[0])
+    return EligibilityResponse(**latest)
 
 
 
@@ -3,12 +3,12 @@ Messaging system endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 from uuid import UUID
 
-from app.dependencies import get_supabase, get_supabase_admin, get_current_user
+from app.dependencies import get_db_admin, get_current_user
+from app.repositories.database import Database
 from app.models.message import MessageResponse, MessageCreate, MessageUpdate, MessageListResponse
-from app.services.notification_service import NotificationService
+from app.services.outbox import outbox, notification_entry
 
 router = APIRouter()
 
@@ -17,20 +17,16 @@ router = APIRouter()
 async def get_messages(
     conversation_id: UUID = None,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Get messages for current user"""
-    query = supabase.table("messages").select("*")
-    
     if conversation_id:
-        query = query.eq("conversation_id", str(conversation_id))
+        rows = await db.messages.list_for_conversation(conversation_id)
     else:
         # Get all conversations where user is sender or receiver
-        query = query.or_(f"sender_id.eq.{current_user.id},receiver_id.eq.{current_user.id}")
-    
-    response = query.order("created_at", desc=True).execute()
+        rows = await db.messages.list_for_user(current_user.id)
     
-    messages = [MessageResponse(**msg) for msg in response.data]
+    messages = [MessageResponse(**msg) for msg in rows]
     
     # Count unread messages
     unread_count = sum(1 for msg in messages if not msg.read and str(msg.receiver_id) == str(current_user.id))
@@ -46,7 +42,7 @@ async def get_messages(
 async def send_message(
     message: MessageCreate,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Send a message"""
     import uuid
@@ -60,46 +56,47 @@ async def send_message(
         "read": False
     }
     
-    response = supabase.table("messages").insert(message_data).execute()
+    created = await db.messages.insert(message_data)
     
-    # Send notification to receiver
-    notification_service = NotificationService(supabase)
-    await notification_service.notify_new_message(
-        user_id=message.receiver_id,
-        sender_name=current_user.name or "Someone",
-        message_id=UUID(response.data[0]["id"])
-    )
+    # Queue a notification for the receiver
+    await outbox.enqueue([
+        notification_entry(
+            "notify_new_message",
+            f"message:{created[0]['id']}",
+            user_id=message.receiver_id,
+            sender_name=current_user.name or "Someone",
+            message_id=created[0]["id"]
+        )
+    ])
     
-    return MessageResponse(**response.data[0])
+    return MessageResponse(**created[0])
 
 
 @router.put("/{message_id}/read", response_model=MessageResponse)
 async def mark_message_read(
     message_id: UUID,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_admin)
+    db: Database = Depends(get_db_admin)
 ):
     """Mark message as read"""
     from datetime import datetime
     
     # Check if user is receiver
-    response = supabase.table("messages").select("*").eq("id", str(message_id)).execute()
+    message = await db.messages.get(message_id)
     
-    if not response.data:
+    if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    message = response.data[0]
-    
     if message["receiver_id"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Update message
-    updated = supabase.table("messages").update({
+    updated = await db.messages.update({
         "read": True,
         "read_at": datetime.utcnow().isoformat()
-    }).eq("id", str(message_id)).execute()
+    }, id=message_id)
     
-    return MessageResponse(**updated.data[0])
+    return MessageResponse(**updated[0])
 
 
 
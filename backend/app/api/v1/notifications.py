@@ -2,13 +2,19 @@
 Notification API endpoints for student dashboard
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from supabase import Client
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
+import logging
 
-from app.dependencies import get_supabase, get_current_user
+from app.config import settings
+from app.dependencies import get_db, get_current_user_id, get_stream_user_id, create_stream_token
+from app.realtime import EventSourceResponse, format_event, realtime_hub, stream_subscription
+from app.repositories.database import Database
+from app.services.notification_service import get_unread_count as cached_unread_count, invalidate_unread_count
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,7 +35,8 @@ class NotificationResponse(BaseModel):
 
 class NotificationListResponse(BaseModel):
     notifications: list[NotificationResponse]
-    total: int
+    total: Optional[int] = None
+    has_more: bool = False
     unread_count: int
 
 
@@ -48,8 +55,9 @@ async def get_notifications(
     offset: int = Query(default=0, ge=0),
     type_filter: Optional[str] = Query(default=None, alias="type"),
     is_read: Optional[bool] = Query(default=None),
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    count: str = Query(default="planned", pattern="^(exact|planned|none)$"),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
     """
     Get user notifications with filtering and pagination
@@ -59,45 +67,30 @@ async def get_notifications(
         offset: Number of notifications to skip (for pagination)
         type_filter: Filter by notification type
         is_read: Filter by read status (true/false/null for all)
+        count: How to compute total - "planned" (planner estimate, default),
+            "exact", or "none" to skip it; has_more is always accurate
 
     Returns:
         List of notifications with total count and unread count
     """
     try:
-        user_id = current_user.get("id")
-
-        # Build query
-        query = supabase.table("notifications").select("*", count="exact")
-        query = query.eq("user_id", user_id)
-
-        # Apply filters
-        if type_filter:
-            query = query.eq("type", type_filter)
-
-        if is_read is not None:
-            query = query.eq("is_read", is_read)
-
-        # Order by created_at descending (newest first)
-        query = query.order("created_at", desc=True)
-
-        # Apply pagination
-        query = query.range(offset, offset + limit - 1)
-
-        # Execute query
-        response = query.execute()
-
-        # Get unread count
-        unread_response = supabase.table("notifications")\
-            .select("id", count="exact")\
-            .eq("user_id", user_id)\
-            .eq("is_read", False)\
-            .execute()
+        # Page of notifications (newest first) with filters applied
+        response = await db.notifications.list_for_user(
+            user_id,
+            limit=limit,
+            offset=offset,
+            notification_type=type_filter,
+            is_read=is_read,
+            count=None if count == "none" else count
+        )
 
-        unread_count = unread_response.count if hasattr(unread_response, 'count') else 0
+        # Unread count from the trigger-maintained counter (cached per worker)
+        unread_count = await cached_unread_count(db, user_id)
 
         return NotificationListResponse(
-            notifications=response.data,
-            total=response.count if hasattr(response, 'count') else len(response.data),
+            notifications=response.data[:limit],
+            total=response.count,
+            has_more=len(response.data) > limit,
             unread_count=unread_count
         )
 
@@ -108,8 +101,8 @@ async def get_notifications(
 # GET /api/v1/notifications/unread - Get unread count
 @router.get("/unread", response_model=UnreadCountResponse)
 async def get_unread_count(
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
     """
     Get count of unread notifications for current user
@@ -118,15 +111,7 @@ async def get_unread_count(
         Count of unread notifications
     """
     try:
-        user_id = current_user.get("id")
-
-        response = supabase.table("notifications")\
-            .select("id", count="exact")\
-            .eq("user_id", user_id)\
-            .eq("is_read", False)\
-            .execute()
-
-        count = response.count if hasattr(response, 'count') else 0
+        count = await cached_unread_count(db, user_id)
 
         return UnreadCountResponse(count=count)
 
@@ -134,12 +119,82 @@ async def get_unread_count(
         raise HTTPException(status_code=500, detail=f"Error fetching unread count: {str(e)}")
 
 
+# POST /api/v1/notifications/stream-token - Credentials for EventSource clients
+@router.post("/stream-token")
+async def create_notification_stream_token(
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Short-lived token for opening the notification stream from a browser
+
+    EventSource cannot send an Authorization header; pass the token as
+    /stream?token=... instead. Fetch a new one for every (re)connection.
+    """
+    return {"token": create_stream_token(user_id), "expires_in": settings.REALTIME_STREAM_TOKEN_TTL}
+
+
+# GET /api/v1/notifications/stream - Push new notifications and unread counts
+@router.get("/stream")
+async def stream_notifications(
+    user_id: str = Depends(get_stream_user_id),
+    db: Database = Depends(get_db)
+):
+    """
+    Server-Sent Events stream of the user's notifications, replacing polling
+
+    Events:
+        unread: {"count": n}, on connect and after any change to the user's notifications
+        notification: a newly created notification
+        resync: the client fell behind; refetch the list and reconnect
+
+    Authenticates with a bearer token, or with ?token= from POST
+    /stream-token for browsers' EventSource, which cannot send headers. A
+    heartbeat comment is sent on idle connections. Streams close after
+    REALTIME_STREAM_MAX_AGE seconds. Stream tokens expire within a minute,
+    so EventSource's automatic reconnect (same URL) is rejected: clients
+    should close the EventSource on error and reconnect with a fresh token.
+    """
+    subscription = realtime_hub.subscribe(user_id)
+    if subscription is None:
+        raise HTTPException(status_code=429, detail="Too many open notification streams")
+
+    first = True
+    changed = False
+
+    async def handle(event: str, data: dict):
+        nonlocal changed
+        changed = True
+        if event == "notification":
+            yield format_event(event, NotificationResponse.model_validate(data).model_dump(mode="json"))
+
+    async def flush():
+        # One unread count per burst of events, not one per event
+        nonlocal first, changed
+        if not (first or changed):
+            return
+        if changed:
+            # The change may have been made through another worker
+            invalidate_unread_count(user_id)
+        first = changed = False
+        try:
+            count = await cached_unread_count(db, user_id)
+        except Exception as e:
+            logger.error(f"Failed to refresh unread count for stream: {str(e)}")
+            return
+        yield format_event("unread", {"count": count})
+
+    return EventSourceResponse(
+        stream_subscription(subscription, handle, flush),
+        on_close=lambda: realtime_hub.unsubscribe(subscription)
+    )
+
+
 # PUT /api/v1/notifications/{notification_id}/read - Mark as read
 @router.put("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
     """
     Mark a notification as read
@@ -151,28 +206,19 @@ async def mark_notification_read(
         Updated notification
     """
     try:
-        user_id = current_user.get("id")
-
         # Verify notification belongs to user
-        check_response = supabase.table("notifications")\
-            .select("id")\
-            .eq("id", notification_id)\
-            .eq("user_id", user_id)\
-            .execute()
+        existing = await db.notifications.find_one("id, is_read", id=notification_id, user_id=user_id)
 
-        if not check_response.data:
+        if not existing:
             raise HTTPException(status_code=404, detail="Notification not found")
 
         # Update notification
-        update_response = supabase.table("notifications")\
-            .update({
-                "is_read": True,
-                "read_at": datetime.utcnow().isoformat()
-            })\
-            .eq("id", notification_id)\
-            .execute()
+        updated = await db.notifications.mark_read(notification_id)
+        if not existing.get("is_read"):
+            invalidate_unread_count(user_id)
+            await realtime_hub.publish(user_id, "unread")
 
-        return {"success": True, "notification": update_response.data[0] if update_response.data else None}
+        return {"success": True, "notification": updated[0] if updated else None}
 
     except HTTPException:
         raise
@@ -183,8 +229,8 @@ async def mark_notification_read(
 # PUT /api/v1/notifications/read-all - Mark all as read
 @router.put("/read-all")
 async def mark_all_read(
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
     """
     Mark all user notifications as read
@@ -193,19 +239,13 @@ async def mark_all_read(
         Success message with count of updated notifications
     """
     try:
-        user_id = current_user.get("id")
-
         # Update all unread notifications for this user
-        response = supabase.table("notifications")\
-            .update({
-                "is_read": True,
-                "read_at": datetime.utcnow().isoformat()
-            })\
-            .eq("user_id", user_id)\
-            .eq("is_read", False)\
-            .execute()
+        updated = await db.notifications.mark_all_read(user_id)
+        invalidate_unread_count(user_id)
+        if updated:
+            await realtime_hub.publish(user_id, "unread")
 
-        updated_count = len(response.data) if response.data else 0
+        updated_count = len(updated) if updated else 0
 
         return {
             "success": True,
@@ -221,8 +261,8 @@ async def mark_all_read(
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
-    current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
     """
     Delete a notification
@@ -234,23 +274,17 @@ async def delete_notification(
         Success message
     """
     try:
-        user_id = current_user.get("id")
-
         # Verify notification belongs to user before deleting
-        check_response = supabase.table("notifications")\
-            .select("id")\
-            .eq("id", notification_id)\
-            .eq("user_id", user_id)\
-            .execute()
+        existing = await db.notifications.find_one("id, is_read", id=notification_id, user_id=user_id)
 
-        if not check_response.data:
+        if not existing:
             raise HTTPException(status_code=404, detail="Notification not found")
 
         # Delete notification
-        supabase.table("notifications")\
-            .delete()\
-            .eq("id", notification_id)\
-            .execute()
+        await db.notifications.delete(id=notification_id)
+        if not existing.get("is_read"):
+            invalidate_unread_count(user_id)
+            await realtime_hub.publish(user_id, "unread")
 
         return {
             "success": True,
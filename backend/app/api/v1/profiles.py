@@ -4,15 +4,17 @@ Profile management endpoints
 
 from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import JSONResponse
-from supabase import Client
 from uuid import UUID
 from typing import List
 from datetime import date, datetime
 
-from app.dependencies import get_supabase, get_current_user, get_supabase_admin
+from app.dependencies import get_db_admin, get_current_user
+from app.repositories.database import Database
 from app.models.profile import ProfileResponse, ProfileUpdate, ProfileCreate, ProfileCompletionResponse
+from app.tracing import get_tracer
 
 router = APIRouter()
+trace = get_tracer(__name__)
 
 
 def serialize_dates(payload: dict) -> dict:
@@ -92,17 +94,15 @@ def calculate_completion_percentage(profile_data: dict) -> int:
 @router.get("/me")
 async def get_my_profile(
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db_admin)
 ):
     """Get current user's profile"""
-    print("[DEBUG] GET_PROFILE: get_my_profile called")
+    trace.debug("GET_PROFILE: get_my_profile called")
     
-    # Use admin client to bypass RLS
-    supabase_admin = get_supabase_admin()
-    
-    db_response = supabase_admin.table("profiles").select("*").eq("user_id", str(current_user.id)).execute()
+    # Admin repositories bypass RLS
+    existing = await db.profiles.get_by_user_id(current_user.id)
 
-    if not db_response.data:
+    if not existing:
         # Create empty profile if doesn't exist (using admin client to bypass RLS)
         new_profile = {
             "user_id": str(current_user.id),
@@ -110,12 +110,12 @@ async def get_my_profile(
         }
         # Serialize dates before sending to Supabase
         serialized_profile = serialize_dates(new_profile)
-        created = supabase_admin.table("profiles").insert(serialized_profile).execute()
-        profile = ProfileResponse(**created.data[0])
+        created = await db.profiles.insert(serialized_profile)
+        profile = ProfileResponse(**created[0])
     else:
-        profile = ProfileResponse(**db_response.data[0])
+        profile = ProfileResponse(**existing)
 
-    print("[DEBUG] GET_PROFILE: Returning profile")
+    trace.debug("GET_PROFILE: Returning profile")
     # Return profile wrapped in object for consistent API response format
     return {"profile": profile.model_dump()}
 
@@ -124,13 +124,10 @@ async def get_my_profile(
 async def update_my_profile(
     profile_update: ProfileUpdate,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db_admin)
 ):
     """Update current user's profile"""
-    print(f"[DEBUG] UPDATE_PROFILE: update_my_profile called for user: {current_user.id}")
-    
-    # Use admin client to bypass RLS
-    supabase_admin = get_supabase_admin()
+    trace.debug("UPDATE_PROFILE: update_my_profile called for user: %s", current_user.id)
     
     update_data = profile_update.dict(exclude_unset=True, exclude_none=True)
 
@@ -142,19 +139,18 @@ async def update_my_profile(
         cleaned_data[key] = value
 
     update_data = cleaned_data
-    print(f"[DEBUG] update_data (after cleaning): {update_data}")
+    trace.debug("update_data (after cleaning): %s", update_data)
 
     if not update_data:
-        print("[DEBUG] No update data, returning current profile")
-        return await get_my_profile(current_user, supabase)
+        trace.debug("No update data, returning current profile")
+        return await get_my_profile(current_user, db)
 
     # Get current profile (using admin client)
-    print(f"[DEBUG] Checking if profile exists for user: {current_user.id}")
-    response_data = supabase_admin.table("profiles").select("*").eq("user_id", str(current_user.id)).execute()
-    print(f"[DEBUG] Profile query response: {response_data.data}")
+    current_profile = await db.profiles.get_by_user_id(current_user.id)
+    trace.debug("Profile query response: %s", current_profile)
 
-    if not response_data.data:
-        print("[DEBUG] Profile not found, creating new profile")
+    if not current_profile:
+        trace.debug("Profile not found, creating new profile")
         # Create profile if it doesn't exist
         new_profile = {
             "user_id": str(current_user.id),
@@ -163,40 +159,34 @@ async def update_my_profile(
         }
         # Recalculate completion percentage
         new_profile['completion_percentage'] = calculate_completion_percentage(new_profile)
-        print(f"[DEBUG] Creating profile with data: {new_profile}")
+        trace.debug("Creating profile with data: %s", new_profile)
 
         try:
-            print(f"[DEBUG] Attempting to create profile with data: {new_profile}")
             # Serialize dates before sending to Supabase
             serialized_profile = serialize_dates(new_profile)
-            created = supabase_admin.table("profiles").insert(serialized_profile).execute()
-            print(f"[DEBUG] Profile creation result: {created}")
-            print(f"[DEBUG] Profile created successfully: {created.data[0] if created.data else 'No data'}")
-            if created.data:
-                print(f"[DEBUG] Created profile keys: {list(created.data[0].keys())}")
-                profile = ProfileResponse(**created.data[0])
+            created = await db.profiles.insert(serialized_profile)
+            trace.debug("Profile creation result: %s", created)
+            if created:
+                profile = ProfileResponse(**created[0])
             else:
-                print("[ERROR] No data returned from profile creation")
+                trace.error("No data returned from profile creation")
                 raise HTTPException(status_code=500, detail="Failed to create profile")
         except Exception as e:
-            print(f"[ERROR] Failed to create profile: {type(e).__name__}: {e}")
-            import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            trace.error("Failed to create profile: %s: %s", type(e).__name__, e, exc_info=True)
             raise
 
     else:
-        print("[DEBUG] Profile found, updating existing profile")
-        current_profile = response_data.data[0]
+        trace.debug("Profile found, updating existing profile")
 
         # Get list of valid columns from current profile (what exists in DB)
         valid_columns = set(current_profile.keys())
-        print(f"[DEBUG] Valid columns in database: {valid_columns}")
+        trace.debug("Valid columns in database: %s", valid_columns)
 
         # Filter update_data to only include columns that exist in DB
         filtered_update_data = {k: v for k, v in update_data.items() if k in valid_columns}
         invalid_columns = set(update_data.keys()) - valid_columns
         if invalid_columns:
-            print(f"[DEBUG] Skipping invalid columns: {invalid_columns}")
+            trace.debug("Skipping invalid columns: %s", invalid_columns)
 
         # Merge updates
         updated_profile = {**current_profile, **filtered_update_data}
@@ -205,25 +195,20 @@ async def update_my_profile(
         updated_profile['completion_percentage'] = calculate_completion_percentage(updated_profile)
 
         # Update in database (using admin client)
-        print(f"[DEBUG] Updating profile with data: {updated_profile}")
         try:
             # Serialize dates before sending to Supabase
             serialized_profile = serialize_dates(updated_profile)
-            print(f"[DEBUG] Serialized profile (after date conversion): {serialized_profile}")
-
-            result = supabase_admin.table("profiles").update(serialized_profile).eq("user_id", str(current_user.id)).execute()
-            print(f"[DEBUG] Profile update result: {result}")
-            print(f"[DEBUG] Profile updated successfully: {result.data[0] if result.data else 'No data'}")
-            if result.data:
-                print(f"[DEBUG] Updated profile keys: {list(result.data[0].keys())}")
-                profile = ProfileResponse(**result.data[0])
+            trace.debug("Updating profile with data: %s", serialized_profile)
+
+            result = await db.profiles.update(serialized_profile, user_id=current_user.id)
+            trace.debug("Profile update result: %s", result)
+            if result:
+                profile = ProfileResponse(**result[0])
             else:
-                print("[ERROR] No data returned from profile update")
+                trace.error("No data returned from profile update")
                 raise HTTPException(status_code=500, detail="Failed to update profile")
         except Exception as e:
-            print(f"[ERROR] Failed to update profile: {type(e).__name__}: {e}")
-            import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            trace.error("Failed to update profile: %s: %s", type(e).__name__, e, exc_info=True)
             raise
 
     # Return profile (CORS middleware will add headers automatically)
@@ -233,22 +218,18 @@ async def update_my_profile(
 @router.get("/me/completion", response_model=ProfileCompletionResponse)
 async def get_profile_completion(
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db_admin)
 ):
     """Get profile completion status"""
-    # Use admin client to bypass RLS
-    supabase_admin = get_supabase_admin()
-    
-    response = supabase_admin.table("profiles").select("*").eq("user_id", str(current_user.id)).execute()
+    profile = await db.profiles.get_by_user_id(current_user.id)
     
-    if not response.data:
+    if not profile:
         return ProfileCompletionResponse(
             completion_percentage=0,
             missing_fields=["All fields"],
             completed_sections=[]
         )
     
-    profile = response.data[0]
     completion = calculate_completion_percentage(profile)
     
     required_fields = [
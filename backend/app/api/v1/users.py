@@ -3,10 +3,10 @@ User management endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
 from uuid import UUID
 
-from app.dependencies import get_supabase, get_current_user, require_admin
+from app.dependencies import get_db, get_current_user, require_admin, invalidate_cached_user
+from app.repositories.database import Database
 from app.models.user import UserResponse, UserUpdate
 
 router = APIRouter()
@@ -22,7 +22,7 @@ async def get_my_info(current_user = Depends(get_current_user)):
 async def update_my_info(
     user_update: UserUpdate,
     current_user = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db)
 ):
     """Update current user information"""
     update_data = user_update.dict(exclude_unset=True)
@@ -30,27 +30,28 @@ async def update_my_info(
     if not update_data:
         return current_user
     
-    response = supabase.table("users").update(update_data).eq("id", str(current_user.id)).execute()
+    updated = await db.users.update(update_data, id=current_user.id)
+    invalidate_cached_user(current_user.id)
     
-    if not response.data:
+    if not updated:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(**response.data[0])
+    return UserResponse(**updated[0])
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: UUID,
-    supabase: Client = Depends(get_supabase),
+    db: Database = Depends(get_db),
     current_user = Depends(require_admin)
 ):
     """Get user by ID (admin only)"""
-    response = supabase.table("users").select("*").eq("id", str(user_id)).execute()
+    user = await db.users.get(user_id)
     
-    if not response.data:
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(**response.data[0])
+    return UserResponse(**user)
 
 
 
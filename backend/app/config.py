@@ -4,7 +4,7 @@ Loads environment variables and provides centralized config access
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 from functools import lru_cache
 
@@ -24,7 +24,38 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+
+    # Authenticated user lookup cache (per worker)
+    USER_CACHE_TTL: int = 60  # seconds
+    USER_CACHE_MAX_SIZE: int = 1024
+
+    # Verified JWT claims cache (per worker, never outlives the token's exp)
+    TOKEN_CACHE_TTL: int = 300  # seconds
+    TOKEN_CACHE_MAX_SIZE: int = 4096
+
+    # Unread notification count cache (per worker, in front of notification_counters)
+    NOTIFICATION_UNREAD_CACHE_TTL: int = 15  # seconds
+    NOTIFICATION_UNREAD_CACHE_MAX_SIZE: int = 4096
+
+    # Bulk notifications (admin broadcast)
+    NOTIFICATION_BULK_BATCH_SIZE: int = 500  # rows per insert
+    NOTIFICATION_BULK_CONCURRENCY: int = 4  # inserts in flight
     
+    # Realtime push (Server-Sent Events at /api/v1/notifications/stream)
+    REALTIME_BACKEND: str = "sqlite"  # sqlite (shared by workers on the host) or memory (per worker)
+    REALTIME_SQLITE_PATH: str = "realtime_events.db"
+    REALTIME_POLL_INTERVAL: float = 0.25  # seconds, sqlite backend
+    REALTIME_QUEUE_SIZE: int = 100  # pending events per stream before the client must resync
+    REALTIME_HEARTBEAT_INTERVAL: int = 15  # seconds
+    REALTIME_MAX_STREAMS_PER_USER: int = 5  # per worker
+    REALTIME_STREAM_MAX_AGE: int = 3600  # seconds; clients then reconnect with a fresh token
+    REALTIME_RETRY_MS: int = 3000  # reconnect delay suggested to EventSource clients
+    REALTIME_STREAM_TOKEN_TTL: int = 60  # seconds; ?token= credentials for EventSource clients
+
+    # Analytics rollup refresh (per worker, 0 disables the background job)
+    ANALYTICS_REFRESH_INTERVAL: int = 300  # seconds
+    ANALYTICS_REFRESH_LEASE: int = 600  # seconds one worker's refresh may hold the cross-worker lease
+
     # CORS - Parse from comma-separated string for production
     CORS_ORIGINS_STR: str = ""
 
@@ -46,6 +77,12 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str = ""
     SUPABASE_SERVICE_KEY: str = ""
     SUPABASE_JWT_SECRET: str = ""
+
+    # Supabase connection pooling (per worker, per key type)
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 20
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 10
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    SUPABASE_HTTP_TIMEOUT: float = 30.0  # seconds
     
     # Google OAuth
     GOOGLE_CLIENT_ID: str = ""
@@ -55,14 +92,88 @@ class Settings(BaseSettings):
     # Google Gemini AI
     GEMINI_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-1.5-pro"
+    AI_MAX_CONCURRENCY: int = 8  # concurrent Gemini calls per worker
+    AI_REQUEST_TIMEOUT: float = 120.0  # seconds
+
+    # Background generation jobs (per worker)
+    GENERATION_JOB_STORE: str = "supabase"  # supabase (generation_jobs table) or sqlite
+    GENERATION_JOB_SQLITE_PATH: str = "generation_jobs.db"
+    GENERATION_WORKERS: int = 4
+    GENERATION_QUEUE_MAX_SIZE: int = 100
+    GENERATION_MAX_ATTEMPTS: int = 3
+    GENERATION_RETRY_BASE_DELAY: float = 2.0  # seconds, doubled per attempt
+    GENERATION_RETRY_AFTER: int = 30  # seconds suggested to clients when the queue is full
+    GENERATION_JOB_STALE_AFTER: int = 3600  # seconds queued/running before a job counts as abandoned
+    GENERATION_BATCH_MAX_TARGETS: int = 10
+    GENERATION_BATCH_CONCURRENCY: int = 5  # concurrent generations per batch request
+
+    # AI generation cache (shared on-disk by workers on the same host)
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_DIR: str = ".generation_cache"
+    GENERATION_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
     
     # Email Service (SendGrid)
     SENDGRID_API_KEY: str = ""
+    SENDGRID_API_URL: str = "https://api.sendgrid.com"
     FROM_EMAIL: str = "noreply@ajnova.com"
+    EMAIL_BACKEND: str = "sendgrid"  # sendgrid, or memory (records emails instead of sending them)
+    EMAIL_BATCH_SIZE: int = 1000  # recipients per SendGrid request (SendGrid's maximum)
+    EMAIL_BATCH_CONCURRENCY: int = 4  # SendGrid requests in flight per batch send
+    EMAIL_POOL_MAX_CONNECTIONS: int = 10  # per worker
+    EMAIL_HTTP_TIMEOUT: float = 10.0  # seconds
+
+    # Outbox dispatcher (per worker; notifications and emails queued by requests, see migration 008)
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_POLL_INTERVAL: float = 1.0  # seconds; enqueues in the same worker wake it immediately
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_CONCURRENCY: int = 10  # deliveries in flight
+    OUTBOX_LEASE_SECONDS: int = 60  # claimed entries become due again after this
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETRY_BASE_DELAY: float = 5.0  # seconds, doubled per attempt
+    OUTBOX_RETENTION_DAYS: int = 7  # sent entries (and their dedup keys) are kept this long
     
-    # Rate Limiting
-    RATE_LIMIT_REQUESTS: int = 100
+    # Rate Limiting (token buckets; budgets are requests per RATE_LIMIT_PERIOD)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS: int = 100  # default budget
     RATE_LIMIT_PERIOD: int = 60  # seconds
+    RATE_LIMIT_STORE: str = "memory"  # memory (per worker) or sqlite (shared by workers on the host)
+    RATE_LIMIT_SQLITE_PATH: str = "rate_limit.db"
+    RATE_LIMIT_MAX_KEYS: int = 100_000  # memory store only
+    RATE_LIMIT_ROLE_BUDGETS: Dict[str, int] = {
+        "anonymous": 60,
+        "student": 100,
+        "counsellor": 300,
+        "admin": 600,
+    }
+    RATE_LIMIT_ROUTE_BUDGETS: Dict[str, int] = {
+        "POST /api/v1/documents/generate": 10,
+        "POST /api/v1/documents/jobs": 10,
+        "/api/v1/auth": 20,
+    }
+    
+    # Debug Tracing (levels: DEBUG, INFO, WARNING, ERROR)
+    TRACE_LEVEL: str = "WARNING"
+    TRACE_LEVELS: Dict[str, str] = {}  # per-module overrides, e.g. {"app.api.v1.profiles": "DEBUG"}
+    
+    # Access Logging (JSON lines on stdout; sample rates are 0.0-1.0)
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_STATUS_SAMPLE_RATES: Dict[str, float] = {"4xx": 1.0, "5xx": 1.0}
+    ACCESS_LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {"/health": 0.0}
+    ACCESS_LOG_SLOW_MS: int = 1000  # always log requests slower than this
+    
+    # Metrics (/metrics, Prometheus text format)
+    METRICS_ENABLED: bool = True
+    METRICS_MULTIPROC_DIR: str = ""  # shared directory for gunicorn workers; empty = this worker only
+    METRICS_FLUSH_INTERVAL: int = 5  # seconds between worker snapshots
+    
+    # Query Budget (database round trips per request; X-DB-Query-Count outside production)
+    QUERY_BUDGET_ENABLED: bool = True
+    QUERY_BUDGET: int = 15
+    QUERY_BUDGET_ROUTES: Dict[str, int] = {  # "METHOD /route/{template}" -> budget
+        "POST /api/v1/admin/notifications/broadcast": 100,  # paged recipient lookup + batched inserts
+    }
+    QUERY_N_PLUS_ONE_THRESHOLD: int = 5  # identical query shapes per request
     
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
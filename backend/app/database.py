@@ -0,0 +1,166 @@
+"""
+Supabase client registry
+Keeps one pooled, keep-alive Supabase client per key type for each worker process
+"""
+
+import threading
+import logging
+from typing import Dict
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from supabase import create_client, Client, ClientOptions
+
+from app.config import settings
+from app.repositories.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Key types the registry knows how to build clients for
+ANON = "anon"
+SERVICE = "service"
+
+
+class SupabaseClientRegistry:
+    """
+    Process-wide registry of Supabase clients
+
+    Each key type gets its own httpx connection pool, so repeated requests reuse
+    open TLS sessions instead of performing a fresh handshake per dependency call.
+    Two flavours are kept per key type: the synchronous supabase-py client (auth
+    admin and storage) and an async PostgREST client backing the repositories.
+    Clients are created in the FastAPI startup hook and closed on shutdown; if a
+    client is requested before startup (scripts, alternate entry points) it is
+    created lazily on first use.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Client] = {}
+        self._http_clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, AsyncPostgrestClient] = {}
+        self._async_http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._databases: Dict[str, Database] = {}
+        self._lock = threading.Lock()
+
+    def _key_for(self, key_type: str) -> str:
+        if key_type == ANON:
+            return settings.SUPABASE_KEY
+        if key_type == SERVICE:
+            return settings.SUPABASE_SERVICE_KEY
+        raise ValueError(f"Unknown Supabase key type: {key_type}")
+
+    def _pool_options(self) -> dict:
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+            ),
+            "timeout": settings.SUPABASE_HTTP_TIMEOUT,
+            "follow_redirects": True,
+            "http2": True,
+        }
+
+    def get(self, key_type: str) -> Client:
+        """Get the pooled sync client for a key type, creating it on first use"""
+        client = self._clients.get(key_type)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key_type)
+            if client is None:
+                http_client = httpx.Client(**self._pool_options())
+                client = create_client(
+                    settings.SUPABASE_URL,
+                    self._key_for(key_type),
+                    options=ClientOptions(httpx_client=http_client),
+                )
+                self._http_clients[key_type] = http_client
+                self._clients[key_type] = client
+            return client
+
+    def get_async(self, key_type: str) -> AsyncPostgrestClient:
+        """Get the pooled async PostgREST client for a key type"""
+        client = self._async_clients.get(key_type)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._async_clients.get(key_type)
+            if client is None:
+                if not settings.SUPABASE_URL:
+                    raise ValueError("SUPABASE_URL is not configured")
+                key = self._key_for(key_type)
+                http_client = httpx.AsyncClient(**self._pool_options())
+                client = AsyncPostgrestClient(
+                    f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1",
+                    headers={
+                        "apikey": key,
+                        "Authorization": f"Bearer {key}",
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                    },
+                    http_client=http_client,
+                )
+                self._async_http_clients[key_type] = http_client
+                self._async_clients[key_type] = client
+            return client
+
+    def database(self, key_type: str) -> Database:
+        """Get the repository container bound to a key type"""
+        database = self._databases.get(key_type)
+        if database is None:
+            database = Database(self.get_async(key_type))
+            self._databases[key_type] = database
+        return database
+
+    async def startup(self) -> None:
+        """Create the pooled clients for every key type"""
+        for key_type in (ANON, SERVICE):
+            try:
+                self.get(key_type)
+                self.database(key_type)
+            except Exception as e:
+                # Leave it to lazy creation so a misconfigured key doesn't stop the worker
+                logger.error(f"Failed to create {key_type} Supabase client: {str(e)}")
+        logger.info("Supabase client registry initialised")
+
+    async def shutdown(self) -> None:
+        """Close every pooled connection"""
+        for key_type, async_http_client in list(self._async_http_clients.items()):
+            try:
+                await async_http_client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close {key_type} async Supabase client: {str(e)}")
+
+        with self._lock:
+            for key_type, http_client in self._http_clients.items():
+                try:
+                    http_client.close()
+                except Exception as e:
+                    logger.error(f"Failed to close {key_type} Supabase client: {str(e)}")
+            self._http_clients.clear()
+            self._clients.clear()
+            self._async_http_clients.clear()
+            self._async_clients.clear()
+            self._databases.clear()
+        logger.info("Supabase client registry closed")
+
+    @property
+    def is_initialised(self) -> bool:
+        return bool(self._clients)
+
+
+# Global registry instance (one per worker process)
+supabase_registry = SupabaseClientRegistry()
+
+
+def get_client(key_type: str = ANON) -> Client:
+    """Get a pooled Supabase client from the global registry"""
+    return supabase_registry.get(key_type)
+
+
+def get_database(key_type: str = ANON) -> Database:
+    """Get the async repositories bound to a pooled client"""
+    return supabase_registry.database(key_type)
@@ -2,32 +2,110 @@
 Shared dependencies for dependency injection
 """
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from supabase import create_client, Client
+import jwt as pyjwt
+from supabase import Client
 from typing import Optional
+import hashlib
+import time
 
+from app.cache import TTLCache
 from app.config import settings
+from app.database import get_client, get_database, ANON, SERVICE
+from app.repositories.database import Database
 from app.models.user import UserInDB
+from app.tracing import get_tracer
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Audience of the short-lived tokens accepted in ?token= by event streams
+STREAM_TOKEN_AUDIENCE = "event-stream"
+
+trace = get_tracer(__name__)
+
+# Authenticated user lookups, keyed by user id
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    Drop a user from the lookup cache after their row changes
+
+    The cache is per worker process, so this only affects the worker that
+    made the change; the others pick the change up when their entry
+    expires, within USER_CACHE_TTL seconds.
+    """
+    user_cache.invalidate(str(user_id))
+
+
+# Verified token claims, keyed by SHA-256 digest of the raw token
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a Supabase JWT (HS256, audience "authenticated") and return its claims
+
+    Verified claims are cached per token digest, never past the token's exp
+    claim, so repeated requests with the same bearer token skip signature
+    verification. Raises a PyJWT error if the token is invalid or expired.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    cached = token_cache.get(digest)
+    if cached is not None:
+        if cached.get("exp") is None or cached["exp"] > now:
+            return cached
+        token_cache.invalidate(digest)
+        raise pyjwt.ExpiredSignatureError("Signature has expired")
+
+    # The JWT secret can be found in Supabase Dashboard > Settings > API > JWT Settings
+    claims = pyjwt.decode(
+        token,
+        settings.SUPABASE_JWT_SECRET,
+        audience="authenticated",
+        algorithms=["HS256"]
+    )
+
+    ttl = settings.TOKEN_CACHE_TTL
+    if claims.get("exp") is not None:
+        ttl = min(ttl, claims["exp"] - now)
+    if ttl > 0:
+        token_cache.set(digest, claims, ttl=ttl)
+
+    return claims
+
 
 # Supabase client
 def get_supabase() -> Client:
-    """Get Supabase client instance"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    """Get pooled Supabase client instance"""
+    return get_client(ANON)
 
 
 def get_supabase_admin() -> Client:
-    """Get Supabase admin client instance with service role key"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    """Get pooled Supabase admin client instance with service role key"""
+    return get_client(SERVICE)
+
+
+def get_db() -> Database:
+    """Get async repositories bound to the pooled anon client"""
+    return get_database(ANON)
+
+
+def get_db_admin() -> Database:
+    """Get async repositories bound to the pooled service role client (bypasses RLS)"""
+    return get_database(SERVICE)
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase)
+    db: Database = Depends(get_db_admin)
 ) -> UserInDB:
     """
     Dependency to get current authenticated user from Supabase JWT token
@@ -40,48 +118,41 @@ async def get_current_user(
 
     try:
         token = credentials.credentials
-        print(f"Received token: {token[:50]}...")  # Print first 50 chars
-
-        # Decode and verify Supabase JWT token
-        # The JWT secret can be found in Supabase Dashboard > Settings > API > JWT Settings
-        import jwt as pyjwt
-        from app.config import settings
-
-        print(f"JWT Secret configured: {bool(settings.SUPABASE_JWT_SECRET)}")
+        trace.debug("Received token: %s...", token[:50])
+        trace.debug("JWT Secret configured: %s", bool(settings.SUPABASE_JWT_SECRET))
 
-        # Verify the token signature using Supabase JWT secret
-        decoded = pyjwt.decode(
-            token,
-            settings.SUPABASE_JWT_SECRET,
-            audience="authenticated",
-            algorithms=["HS256"]
-        )
-        print(f"Token decoded successfully, user_id: {decoded.get('sub')}")
+        # Decode and verify Supabase JWT token (cached per token)
+        decoded = decode_token(token)
+        trace.debug("Token decoded successfully, user_id: %s", decoded.get("sub"))
         user_id = decoded.get("sub")
 
         if not user_id:
-            print("No user_id in token")
+            trace.info("No user_id in token")
             raise credentials_exception
 
     except Exception as e:
-        print(f"Token validation error: {type(e).__name__}: {e}")
+        trace.info("Token validation error: %s: %s", type(e).__name__, e)
         raise credentials_exception
 
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
+
     # Get user from database using admin client to bypass RLS
-    print(f"Fetching user from database with ID: {user_id}")
-    supabase_admin = get_supabase_admin()
-    response = supabase_admin.table("users").select("*").eq("id", user_id).execute()
+    trace.debug("Fetching user from database with ID: %s", user_id)
+    user_row = await db.users.get(user_id)
 
-    print(f"Database response: {response.data}")
+    trace.debug("Database response: %s", user_row)
 
-    if not response.data:
-        print("No user found in database, creating new user...")
+    if not user_row:
+        trace.info("No user found in database, creating new user %s", user_id)
         # User exists in Supabase Auth but not in our users table
         # Get user info from Supabase Auth using admin client
-        auth_user = supabase_admin.auth.admin.get_user_by_id(user_id)
+        supabase_admin = get_supabase_admin()
+        auth_user = await run_in_threadpool(supabase_admin.auth.admin.get_user_by_id, user_id)
 
         if not auth_user or not auth_user.user:
-            print("User not found in Supabase Auth either!")
+            trace.warning("User %s not found in Supabase Auth either", user_id)
             raise credentials_exception
 
         # Create user record using admin client to bypass RLS
@@ -109,27 +180,97 @@ async def get_current_user(
         }
 
         try:
-            created = supabase_admin.table("users").insert(new_user).execute()
-            user_data = created.data[0]
-            print(f"User created: {user_data.get('email')}")
+            created = await db.users.insert(new_user)
+            user_data = created[0]
+            trace.info("User created: %s", user_data.get("email"))
         except Exception as e:
             if "duplicate key" in str(e).lower():
                 # User was created by another request, try to fetch again
-                print("User already exists, fetching again...")
-                response = supabase_admin.table("users").select("*").eq("id", user_id).execute()
-                if response.data:
-                    user_data = response.data[0]
-                    print(f"User data found on retry: {user_data.get('email', 'NO EMAIL')}")
+                trace.debug("User already exists, fetching again...")
+                user_row = await db.users.get(user_id)
+                if user_row:
+                    user_data = user_row
+                    trace.debug("User data found on retry: %s", user_data.get("email", "NO EMAIL"))
                 else:
-                    print("Still no user found after retry!")
+                    trace.warning("Still no user found after retry for %s", user_id)
                     raise credentials_exception
             else:
                 raise e
     else:
-        user_data = response.data[0]
-        print(f"User data found: {user_data.get('email', 'NO EMAIL')}")
+        user_data = user_row
+        trace.debug("User data found: %s", user_data.get("email", "NO EMAIL"))
+
+    user = UserInDB(**user_data)
+    user_cache.set(user_id, user)
+    return user
 
-    return UserInDB(**user_data)
+
+async def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> str:
+    """
+    Dependency to get the authenticated user's id from the verified token only
+
+    Skips the users table lookup, for endpoints that only need the caller's id.
+    """
+    try:
+        user_id = decode_token(credentials.credentials).get("sub")
+    except Exception:
+        user_id = None
+
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
+
+def create_stream_token(user_id: str) -> str:
+    """
+    Short-lived token letting a client open event streams as the user
+
+    Browsers' EventSource cannot send an Authorization header, so it passes
+    this token in ?token= instead. It expires after REALTIME_STREAM_TOKEN_TTL
+    seconds and is only accepted by stream endpoints (its own audience, signed
+    with SECRET_KEY), so a leaked URL grants little.
+    """
+    claims = {
+        "sub": str(user_id),
+        "aud": STREAM_TOKEN_AUDIENCE,
+        "exp": int(time.time()) + settings.REALTIME_STREAM_TOKEN_TTL,
+    }
+    return pyjwt.encode(claims, settings.SECRET_KEY, algorithm="HS256")
+
+
+async def get_stream_user_id(
+    token: Optional[str] = Query(None, description="Stream token from POST /notifications/stream-token"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> str:
+    """
+    Dependency for event stream endpoints: the user's id from a bearer token
+    (fetch-based clients) or from a stream token in ?token= (EventSource)
+    """
+    try:
+        if credentials is not None:
+            user_id = decode_token(credentials.credentials).get("sub")
+        elif token:
+            user_id = pyjwt.decode(
+                token, settings.SECRET_KEY, audience=STREAM_TOKEN_AUDIENCE, algorithms=["HS256"]
+            ).get("sub")
+        else:
+            user_id = None
+    except Exception:
+        user_id = None
+
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
 
 
 async def get_current_active_user(
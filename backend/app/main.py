@@ -7,9 +7,20 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import settings
+from app.database import supabase_registry
+from app.metrics import metrics_exporter
+from app.realtime import realtime_hub
+from app.middleware.logging import LoggingMiddleware, access_log
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.tracing import get_tracer, tracing
+from app.services.analytics_service import analytics_refresher
+from app.services.email_service import close_email_transport
+from app.services.generation_jobs import generation_queue
+from app.services.outbox import outbox
 
 # Import all routers first
 from app.api.v1 import (
@@ -22,6 +33,7 @@ from app.api.v1 import (
     applications,
     messages,
     consultations,
+    notifications,
     admin
 )
 
@@ -34,17 +46,43 @@ app = FastAPI(
     redoc_url="/api/redoc",
 )
 
+trace = get_tracer(__name__)
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     print("Starting AJ NOVA Backend API...")
     print(f"Environment: {settings.ENVIRONMENT}")
     print(f"API URL: {settings.BACKEND_URL}")
+    tracing.start()
+    if settings.ACCESS_LOG_ENABLED:
+        access_log.start()
+    await supabase_registry.startup()
+    analytics_refresher.start()
+    generation_queue.start()
+    await realtime_hub.start()
+    outbox.start()
+    if settings.METRICS_ENABLED:
+        metrics_exporter.start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down AJ NOVA Backend API...")
+    await analytics_refresher.stop()
+    await generation_queue.stop()
+    await outbox.stop()
+    await close_email_transport()
+    await realtime_hub.stop()
+    await supabase_registry.shutdown()
+    if settings.METRICS_ENABLED:
+        await metrics_exporter.stop()
+    access_log.stop()
+    tracing.stop()
+
+# Rate Limiting (added first so CORS and GZip wrap its 429 responses)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
 # CORS Middleware
 app.add_middleware(
@@ -58,6 +96,14 @@ app.add_middleware(
 # GZip Compression
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Request Metrics and Query Budget
+if settings.METRICS_ENABLED or settings.QUERY_BUDGET_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Access Logging (outermost, so timing and size cover the whole stack)
+if settings.ACCESS_LOG_ENABLED:
+    app.add_middleware(LoggingMiddleware)
+
 # Exception Handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc: RequestValidationError):
@@ -72,13 +118,14 @@ async def http_exception_handler(request, exc: HTTPException):
     """Handle HTTP exceptions"""
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request, exc: Exception):
     """Handle all unhandled exceptions"""
-    print(f"Unhandled exception: {exc}")
+    trace.error("Unhandled exception: %s", exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
@@ -94,6 +141,7 @@ app.include_router(documents.router, prefix="/api/v1/documents", tags=["Document
 app.include_router(applications.router, prefix="/api/v1/applications", tags=["Applications"])
 app.include_router(messages.router, prefix="/api/v1/messages", tags=["Messages"])
 app.include_router(consultations.router, prefix="/api/v1/consultations", tags=["Consultations"])
+app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
 
 
@@ -112,10 +160,10 @@ async def root():
 async def health_check():
     """Health check endpoint with database connectivity test"""
     try:
-        from app.dependencies import get_supabase
-        supabase = get_supabase()
+        from app.database import get_database
+        db = get_database()
         # Test database connection
-        supabase.table("users").select("id").limit(1).execute()
+        await db.users.find("id", limit=1)
 
         return {
             "status": "healthy",
@@ -136,6 +184,15 @@ async def health_check():
         )
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics, merged across workers when METRICS_MULTIPROC_DIR is set"""
+        return PlainTextResponse(
+            metrics_exporter.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
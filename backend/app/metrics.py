@@ -0,0 +1,322 @@
+"""
+Metrics
+Prometheus-style counters and histograms, aggregated per worker and merged for /metrics
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Buckets for per-request database round trip counts
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self) -> list:
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+
+class Histogram:
+    """Histogram with labels; per label set, bucket counts plus sum and count"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def snapshot(self) -> list:
+        return [[list(labels), [list(s[0]), s[1], s[2]]] for labels, s in self.values.items()]
+
+
+class MetricsRegistry:
+    """
+    Every metric of this worker process
+
+    Updates are plain dict operations on the event loop thread, so no locks
+    are taken on the request path. Under gunicorn each worker writes its
+    snapshot to METRICS_MULTIPROC_DIR (see MetricsExporter) and /metrics
+    merges every worker's file.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = self.metrics[name] = Counter(name, help, labelnames)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = self.metrics[name] = Histogram(name, help, labelnames, buckets)
+        return metric
+
+    def snapshot(self) -> Dict[str, list]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render(self, snapshots: Iterable[Dict[str, list]]) -> str:
+        """Merge worker snapshots and render the Prometheus text format"""
+        snapshots = list(snapshots)
+        lines: List[str] = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+
+            if metric.kind == "counter":
+                merged: Dict[tuple, float] = {}
+                for snapshot in snapshots:
+                    for labels, value in snapshot.get(name, []):
+                        merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+                for labels, value in sorted(merged.items()):
+                    lines.append(f"{name}{_labels(metric.labelnames, labels)} {_number(value)}")
+                continue
+
+            merged_h: Dict[tuple, list] = {}
+            for snapshot in snapshots:
+                for labels, (counts, total, count) in snapshot.get(name, []):
+                    if len(counts) != len(metric.buckets) + 1:
+                        continue  # written with other buckets by an older worker
+                    series = merged_h.setdefault(tuple(labels), [[0] * len(counts), 0.0, 0])
+                    series[0] = [a + b for a, b in zip(series[0], counts)]
+                    series[1] += total
+                    series[2] += count
+            for labels, (counts, total, count) in sorted(merged_h.items()):
+                cumulative = 0
+                for bound, bucket_count in zip((*metric.buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    bucket_labels = _labels(metric.labelnames + ("le",), labels + (le,))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# Global registry (one per worker process)
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+db_request_duration = registry.histogram(
+    "db_request_duration_seconds", "Supabase (PostgREST) round trip latency",
+    ("table", "method")
+)
+db_requests_per_http_request = registry.histogram(
+    "db_requests_per_http_request", "Supabase round trips made while serving one HTTP request",
+    ("route",), buckets=COUNT_BUCKETS
+)
+ai_request_duration = registry.histogram(
+    "ai_request_duration_seconds", "Gemini generation latency",
+    ("document_type", "mode", "outcome")
+)
+ai_tokens = registry.counter(
+    "ai_tokens_total", "Gemini tokens used", ("document_type", "kind")
+)
+ai_cache_requests = registry.counter(
+    "ai_cache_requests_total", "Generation cache lookups", ("result",)
+)
+email_send_duration = registry.histogram(
+    "email_send_duration_seconds", "SendGrid request latency", ("outcome",)
+)
+email_recipients = registry.counter(
+    "email_recipients_total", "Email recipients sent to or failed, by template", ("template", "outcome")
+)
+outbox_deliveries = registry.counter(
+    "outbox_deliveries_total", "Outbox entries delivered, retried or given up on", ("kind", "outcome")
+)
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter", ("role", "budget")
+)
+realtime_connections = registry.counter(
+    "realtime_connections_total", "Event streams opened, and closed by reason", ("state",)
+)
+realtime_events = registry.counter(
+    "realtime_events_total", "Events written to event streams", ("event",)
+)
+
+
+@dataclass
+class RequestStats:
+    """Per-request counters, reachable from any code running for the request"""
+    db_requests: int = 0
+    db_seconds: float = 0.0
+    # Query shape (table, method, filter columns and operators) -> times issued
+    db_shapes: Dict[str, int] = field(default_factory=dict)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes issued at least threshold times, most repeated first"""
+        return sorted(
+            ((shape, count) for shape, count in self.db_shapes.items() if count >= threshold),
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+
+# Set by MetricsMiddleware for the duration of each HTTP request
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+# Called with (method, route template, stats) when a request finishes; used by app.testing
+request_observers: List[Callable[[str, str, RequestStats], None]] = []
+
+
+def record_db_request(table: str, method: str, seconds: float, shape: Optional[str] = None) -> None:
+    """Record one Supabase round trip (called from BaseRepository.execute)"""
+    db_request_duration.observe(seconds, table, method)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_requests += 1
+        stats.db_seconds += seconds
+        if shape is not None:
+            stats.db_shapes[shape] = stats.db_shapes.get(shape, 0) + 1
+
+
+class MetricsExporter:
+    """
+    Shares this worker's metrics with the other gunicorn workers
+
+    With METRICS_MULTIPROC_DIR set, the worker's snapshot is written to
+    <dir>/metrics_<pid>.json every METRICS_FLUSH_INTERVAL seconds and at
+    shutdown; /metrics merges every file in the directory. Files of exited
+    workers are kept so counters stay monotonic; clear the directory when
+    the server (not a worker) starts. Without the setting, /metrics serves
+    this worker only.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def directory(self) -> Optional[str]:
+        return settings.METRICS_MULTIPROC_DIR or None
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+
+    def flush(self, snapshot: Optional[Dict[str, list]] = None) -> None:
+        """Write this worker's snapshot atomically"""
+        if not self.directory:
+            return
+        if snapshot is None:
+            snapshot = registry.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._path())
+
+    def snapshots(self) -> List[Dict[str, list]]:
+        """Every worker's latest snapshot, this worker's taken now"""
+        own = registry.snapshot()
+        if not self.directory:
+            return [own]
+        own_path = self._path()
+        snapshots = [own]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.startswith("metrics_") or not name.endswith(".json") or path == own_path:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics file {name}: {str(e)}")
+        return snapshots
+
+    def render(self) -> str:
+        return registry.render(self.snapshots())
+
+    def start(self) -> None:
+        if self.directory and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            self.flush()
+        except OSError as e:
+            logger.error(f"Failed to write metrics snapshot: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                # Snapshot on the event loop thread, write off it
+                await asyncio.to_thread(self.flush, registry.snapshot())
+            except OSError as e:
+                logger.error(f"Failed to write metrics snapshot: {str(e)}")
+
+
+# Global exporter (one per worker process)
+metrics_exporter = MetricsExporter()
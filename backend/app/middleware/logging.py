@@ -1,68 +1,158 @@
 """
 Logging middleware
-Logs all incoming requests and responses
+Structured, sampled access logs written off the request path
 """
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-import time
+import json
 import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueListener
+from typing import Dict, Optional, Tuple
 
-logger = logging.getLogger(__name__)
-
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Log all requests and responses"""
-    
-    async def dispatch(self, request: Request, call_next) -> Response:
-        """Log request and response"""
-        start_time = time.time()
-        
-        # Log request
-        logger.info(f"➡️  {request.method} {request.url.path}")
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Calculate duration
-        duration = time.time() - start_time
-        
-        # Log response
-        logger.info(
-            f"⬅️  {request.method} {request.url.path} "
-            f"- Status: {response.status_code} "
-            f"- Duration: {duration:.2f}s"
-        )
-        
-        # Add custom headers
-        response.headers["X-Process-Time"] = str(duration)
-        
-        return response
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.config import settings
+from app.tracing import DeferredQueueHandler
 
+logger = logging.getLogger(__name__)
 
+# Access records go only to the queue handler installed by AccessLog.start()
+access_logger = logging.getLogger("app.access")
+access_logger.propagate = False
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; dict messages are merged into the record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        return json.dumps(entry, default=str)
+
+
+class AccessLog:
+    """
+    Background writer for access records (one per worker process)
+
+    The request path only enqueues a LogRecord; a QueueListener thread
+    serialises it to JSON on stdout.
+    """
+
+    def __init__(self):
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JSONFormatter())
+        access_logger.handlers = [DeferredQueueHandler(records)]
+        access_logger.setLevel(logging.INFO)
+        self._listener = QueueListener(records, stream)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and stop the writer thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        access_logger.handlers = []
+
+
+# Global access log writer (one per worker process)
+access_log = AccessLog()
+
+
+class LoggingMiddleware:
+    """
+    Access logging and request timing (pure ASGI)
+
+    Sets X-Process-Time (seconds until the response headers were sent) and
+    logs one record per request with method, path, status, duration and
+    response size. The record is written when the response body finishes,
+    so streamed responses are timed end to end. Sampling: a status class
+    listed in ACCESS_LOG_STATUS_SAMPLE_RATES ("2xx", "5xx", ...) uses its
+    rate, otherwise the longest matching prefix in
+    ACCESS_LOG_ROUTE_SAMPLE_RATES, otherwise ACCESS_LOG_SAMPLE_RATE.
+    Requests slower than ACCESS_LOG_SLOW_MS are always logged.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.default_rate = settings.ACCESS_LOG_SAMPLE_RATE
+        self.status_rates: Dict[str, float] = settings.ACCESS_LOG_STATUS_SAMPLE_RATES
+        self.route_rates: Tuple[Tuple[str, float], ...] = tuple(sorted(
+            settings.ACCESS_LOG_ROUTE_SAMPLE_RATES.items(), key=lambda item: len(item[0]), reverse=True
+        ))
+        self.slow_ns = settings.ACCESS_LOG_SLOW_MS * 1_000_000
+
+    def _sample_rate(self, path: str, status: int) -> float:
+        rate = self.status_rates.get(f"{status // 100}xx")
+        if rate is not None:
+            return rate
+        for prefix, route_rate in self.route_rates:
+            if path.startswith(prefix):
+                return route_rate
+        return self.default_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status = 500
+        size = 0
+        logged = False
+
+        def log() -> None:
+            nonlocal logged
+            logged = True
+            elapsed = time.perf_counter_ns() - start
+            rate = self._sample_rate(scope["path"], status)
+            if elapsed < self.slow_ns and (rate <= 0 or (rate < 1 and random.random() >= rate)):
+                return
+            if not access_logger.isEnabledFor(logging.INFO):
+                return
+            client = scope.get("client")
+            # makeRecord + handle skips Logger.info's caller lookup (a stack walk)
+            access_logger.handle(access_logger.makeRecord(
+                access_logger.name, logging.INFO, __file__, 0, {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(elapsed / 1_000_000, 3),
+                    "bytes": size,
+                    "client": client[0] if client else None,
+                    "sample_rate": rate,
+                }, None, None
+            ))
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                process_time = str((time.perf_counter_ns() - start) / 1e9).encode()
+                message["headers"] = [*message.get("headers", ()), (b"x-process-time", process_time)]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                log()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not logged:
+                log()
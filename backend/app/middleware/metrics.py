@@ -0,0 +1,110 @@
+"""
+Metrics middleware
+Per-route latency, per-request database round trips and query budgets
+"""
+
+import time
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import (
+    RequestStats, current_request, db_requests_per_http_request, http_request_duration, request_observers
+)
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Matched route as a template, e.g. /api/v1/documents/{document_id}
+
+    Rebuilt from the request path and path params, since routes of included
+    routers may only know their path relative to the router prefix.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    if not params:
+        return scope["path"]
+    return "/".join(
+        f"{{{params[segment]}}}" if segment in params else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+class MetricsMiddleware:
+    """
+    Request metrics (pure ASGI)
+
+    Installs a RequestStats for the request (see app.metrics.current_request)
+    and, when the response finishes, records its latency and Supabase round
+    trips under the matched route template, e.g. /api/v1/documents/{document_id}.
+    Requests that match no route are grouped as "unmatched".
+
+    Query budget: outside production the round trips made before the
+    headers were sent are reported in X-DB-Query-Count. A request making
+    more than its budget (QUERY_BUDGET_ROUTES by "METHOD template", else
+    QUERY_BUDGET) logs a warning, and any query shape repeated
+    QUERY_N_PLUS_ONE_THRESHOLD times is logged as a suspected N+1.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.count_header = settings.ENVIRONMENT != "production"
+        self.budget_enabled = settings.QUERY_BUDGET_ENABLED
+        self.default_budget = settings.QUERY_BUDGET
+        self.route_budgets = settings.QUERY_BUDGET_ROUTES
+        self.repeat_threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+
+    def _check_budget(self, method: str, template: str, stats: RequestStats) -> None:
+        route = f"{method} {template}"
+        budget = self.route_budgets.get(route, self.default_budget)
+        if stats.db_requests > budget:
+            logger.warning(
+                f"Query budget exceeded: {route} made {stats.db_requests} database requests "
+                f"(budget {budget}, {stats.db_seconds * 1000:.1f} ms)"
+            )
+        for shape, count in stats.repeated_shapes(self.repeat_threshold):
+            logger.warning(f"Suspected N+1 on {route}: {count}x {shape}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            template = route_template(scope)
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], template, str(status))
+            db_requests_per_http_request.observe(stats.db_requests, template)
+            if self.budget_enabled:
+                self._check_budget(scope["method"], template, stats)
+            for observer in request_observers:
+                observer(scope["method"], template, stats)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.count_header:
+                    count = str(stats.db_requests).encode()
+                    message["headers"] = [*message.get("headers", ()), (b"x-db-query-count", count)]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record()
+            current_request.reset(token)
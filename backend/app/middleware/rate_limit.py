@@ -1,90 +1,278 @@
 """
 Rate limiting middleware
-Simple in-memory rate limiter
+Token-bucket rate limiter with per-route and per-role budgets
 """
 
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from collections import defaultdict
+from abc import ABC, abstractmethod
+import asyncio
+import math
+import sqlite3
+import threading
 import time
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.config import settings
+from app.metrics import rate_limit_rejections
 
+logger = logging.getLogger(__name__)
+
+# Paths never rate limited
+EXEMPT_PATHS = {"/health", "/", "/api/docs", "/api/redoc", "/openapi.json", "/metrics"}
+
+# (key, capacity, refill per second) of one bucket a request draws from
+Bucket = Tuple[str, float, float]
+
+# (allowed, tokens remaining, seconds until a token is available)
+TakeResult = Tuple[bool, float, float]
+
+
+class BucketStore(ABC):
+    """Token bucket state, keyed by client and budget"""
+
+    @abstractmethod
+    async def take(self, buckets: Sequence[Bucket]) -> List[TakeResult]:
+        """
+        Refill the buckets for the elapsed time, then take one token from
+        each, but only if every one of them has a token; a request rejected
+        by one bucket costs nothing in the others
+        """
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple rate limiting middleware"""
-    
-    def __init__(self, app):
-        super().__init__(app)
-        # Store: {ip: (request_count, window_start_time)}
-        self.requests: Dict[str, Tuple[int, float]] = defaultdict(lambda: (0, time.time()))
-        self.rate_limit = settings.RATE_LIMIT_REQUESTS
-        self.time_window = settings.RATE_LIMIT_PERIOD
-    
-    async def dispatch(self, request: Request, call_next) -> Response:
-        """Check rate limit before processing request"""
-        
-        # Skip rate limiting for health check and docs
-        if request.url.path in ["/health", "/", "/api/docs", "/api/redoc"]:
-            return await call_next(request)
-        
-        # Get client IP
-        client_ip = request.client.host
-        
-        # Get current request count and window start
-        request_count, window_start = self.requests[client_ip]
-        current_time = time.time()
-        
-        # Reset window if time has passed
-        if current_time - window_start > self.time_window:
-            request_count = 0
-            window_start = current_time
-        
-        # Check if rate limit exceeded
-        if request_count >= self.rate_limit:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Max {self.rate_limit} requests per {self.time_window} seconds"
-            )
-        
-        # Increment request count
-        self.requests[client_ip] = (request_count + 1, window_start)
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.rate_limit)
-        response.headers["X-RateLimit-Remaining"] = str(self.rate_limit - request_count - 1)
-        response.headers["X-RateLimit-Reset"] = str(int(window_start + self.time_window))
-        
-        return response
 
+def _take_all(levels: List[float], buckets: Sequence[Bucket]) -> List[TakeResult]:
+    """Results for buckets refilled to levels, taking a token from each only if all have one"""
+    if all(tokens >= 1 for tokens in levels):
+        return [(True, tokens - 1, 0.0) for tokens in levels]
+    return [
+        (tokens >= 1, tokens, 0.0 if tokens >= 1 else (1 - tokens) / rate)
+        for tokens, (_, _, rate) in zip(levels, buckets)
+    ]
 
 
+class MemoryBucketStore(BucketStore):
+    """
+    Buckets in this process only
 
+    Buckets are kept in access order. A bucket idle for longer than ttl has
+    refilled completely and is equivalent to a missing one, so expired
+    buckets are dropped from the front on every take; memory is bounded by
+    the number of clients active within ttl (and by max_keys).
+    """
 
+    def __init__(self, ttl: float, max_keys: int = 100_000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
 
+    async def take(self, buckets: Sequence[Bucket]) -> List[TakeResult]:
+        now = time.monotonic()
+        levels = []
+        for key, capacity, rate in buckets:
+            bucket = self._buckets.pop(key, None)
+            levels.append(capacity if bucket is None else _refill(*bucket, now, capacity, rate))
+        results = _take_all(levels, buckets)
+        for (key, _, _), (_, tokens, _) in zip(buckets, results):
+            self._buckets[key] = (tokens, now)
 
+        while self._buckets:
+            oldest_key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated <= self.ttl and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[oldest_key]
 
+        return results
 
 
+class SQLiteBucketStore(BucketStore):
+    """
+    Buckets in a local SQLite file, shared by every worker on the host
 
+    Each take is one short IMMEDIATE transaction, so concurrent workers see
+    a single budget per client. That transaction holds the file's write
+    lock, so every rate-limited request on the host is serialised through
+    it (see the README for the measured cost). Expired buckets are pruned
+    periodically.
+    """
 
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        self._takes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _take_sync(self, buckets: Sequence[Bucket]) -> List[TakeResult]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for key, capacity, rate in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+                    ).fetchone()
+                    levels.append(capacity if row is None else _refill(row[0], row[1], now, capacity, rate))
+                results = _take_all(levels, buckets)
+                self._conn.executemany(
+                    "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    [(key, tokens, now) for (key, _, _), (_, tokens, _) in zip(buckets, results)]
+                )
+                self._takes += 1
+                if self._takes % self.PRUNE_EVERY == 0:
+                    self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.ttl,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return results
+
+    async def take(self, buckets: Sequence[Bucket]) -> List[TakeResult]:
+        return await asyncio.to_thread(self._take_sync, buckets)
+
+
+def create_bucket_store() -> BucketStore:
+    """Build the store selected by RATE_LIMIT_STORE"""
+    ttl = settings.RATE_LIMIT_PERIOD
+    if settings.RATE_LIMIT_STORE == "sqlite":
+        return SQLiteBucketStore(settings.RATE_LIMIT_SQLITE_PATH, ttl)
+    return MemoryBucketStore(ttl, settings.RATE_LIMIT_MAX_KEYS)
 
 
+class RateLimitMiddleware:
+    """
+    Token-bucket rate limiting (pure ASGI)
 
+    Every client gets a bucket sized by its role (RATE_LIMIT_ROLE_BUDGETS,
+    falling back to RATE_LIMIT_REQUESTS) that refills over RATE_LIMIT_PERIOD.
+    Routes listed in RATE_LIMIT_ROUTE_BUDGETS ("/prefix" or "METHOD /prefix",
+    longest match wins) get an additional bucket of their own. Clients are
+    identified by user id when the bearer token verifies, otherwise by IP;
+    the role is read from the auth user cache, so the limiter never queries
+    the database. Rejections are 429 with Retry-After. If the store fails,
+    requests are let through.
+    """
 
+    def __init__(self, app: ASGIApp, store: Optional[BucketStore] = None):
+        self.app = app
+        self._store = store
+        self.period = settings.RATE_LIMIT_PERIOD
+        self.default_budget = settings.RATE_LIMIT_REQUESTS
+        self.role_budgets: Dict[str, int] = settings.RATE_LIMIT_ROLE_BUDGETS
+        # Longest prefixes first
+        self.route_budgets = sorted(
+            (self._parse_route(route) + (budget,) for route, budget in settings.RATE_LIMIT_ROUTE_BUDGETS.items()),
+            key=lambda item: len(item[1]),
+            reverse=True
+        )
 
+    @property
+    def store(self) -> BucketStore:
+        if self._store is None:
+            self._store = create_bucket_store()
+        return self._store
 
+    @staticmethod
+    def _parse_route(route: str) -> Tuple[Optional[str], str]:
+        method, _, prefix = route.strip().rpartition(" ")
+        return (method.upper() or None), prefix
 
+    def _identify(self, scope: Scope) -> Tuple[str, str]:
+        """(client key, role) for a request"""
+        # Imported here: dependencies pulls in the database layer
+        from app.dependencies import decode_token, user_cache
 
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        user_id = decode_token(token).get("sub")
+                    except Exception:
+                        break
+                    if user_id:
+                        user = user_cache.get(user_id)
+                        return f"user:{user_id}", (user.role if user else "authenticated")
+                break
 
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}", "anonymous"
 
+    def _route_budget(self, method: str, path: str) -> Optional[Tuple[str, int]]:
+        for route_method, prefix, budget in self.route_budgets:
+            if path.startswith(prefix) and route_method in (None, method):
+                return f"{route_method or '*'} {prefix}", budget
+        return None
 
+    async def _take(self, checks: List[Tuple[str, int]]) -> List[TakeResult]:
+        try:
+            return await self.store.take([(key, budget, budget / self.period) for key, budget in checks])
+        except Exception as e:
+            logger.error(f"Rate limit store failed, allowing request: {str(e)}")
+            return [(True, budget, 0.0) for _, budget in checks]
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        client, role = self._identify(scope)
+        budget = self.role_budgets.get(role, self.default_budget)
+        checks = [(client, budget)]
+        route = self._route_budget(scope["method"], scope["path"])
+        if route:
+            checks.insert(0, (f"{client}|{route[0]}", route[1]))
+
+        results = await self._take(checks)
+
+        rejected = [
+            (retry_after, key, key_budget)
+            for (key, key_budget), (allowed, _, retry_after) in zip(checks, results)
+            if not allowed
+        ]
+        if rejected:
+            # The request can only pass once every bucket has refilled
+            retry_after, key, key_budget = max(rejected)
+            rate_limit_rejections.inc(role, "route" if key != client else "role")
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": f"Rate limit exceeded. Max {key_budget} requests per {self.period} seconds"},
+                headers={
+                    "Retry-After": str(max(1, math.ceil(retry_after))),
+                    "X-RateLimit-Limit": str(key_budget),
+                    "X-RateLimit-Remaining": "0",
+                }
+            )
+            await response(scope, receive, send)
+            return
 
+        limit, remaining = budget, budget
+        for (_, key_budget), (_, tokens, _) in zip(checks, results):
+            if tokens < remaining:
+                limit, remaining = key_budget, tokens
 
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(limit)
+                headers["X-RateLimit-Remaining"] = str(int(remaining))
+            await send(message)
 
+        await self.app(scope, receive, send_with_headers)
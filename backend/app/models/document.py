@@ -31,6 +31,21 @@ class DocumentGenerateRequest(BaseModel):
     university: str
     program: str
     additional_info: Optional[str] = None
+    regenerate: bool = False  # bypass the generation cache
+
+
+class DocumentGenerateTarget(BaseModel):
+    """One document to generate in a batch"""
+    type: str = Field(..., pattern="^(sop|lor|resume|cover_letter)$")
+    university: str
+    program: str
+
+
+class DocumentBatchGenerateRequest(BaseModel):
+    """Batch AI document generation request"""
+    targets: list[DocumentGenerateTarget] = Field(..., min_length=1)
+    additional_info: Optional[str] = None
+    regenerate: bool = False
 
 
 class DocumentReviewRequest(BaseModel):
@@ -71,28 +86,31 @@ class DocumentListResponse(BaseModel):
     total: int
 
 
+class GenerationJobResponse(BaseModel):
+    """AI generation job status"""
+    id: UUID
+    status: str
+    attempts: int = 0
+    error: Optional[str] = None
+    document_id: Optional[UUID] = None
+    document: Optional[DocumentResponse] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 
+class DocumentBatchItemResult(BaseModel):
+    """Outcome of one batch generation target"""
+    type: str
+    university: str
+    program: str
+    status: str  # succeeded or failed
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+class DocumentBatchGenerateResponse(BaseModel):
+    """Batch AI document generation results, in request order"""
+    results: list[DocumentBatchItemResult]
+    succeeded: int
+    failed: int
@@ -0,0 +1,20 @@
+"""Email models"""
+
+from pydantic import BaseModel
+from typing import List
+
+
+class EmailBatchFailure(BaseModel):
+    """A SendGrid request whose recipients were not sent to"""
+    batch: int
+    emails: List[str]
+    error: str
+
+
+class EmailBatchResult(BaseModel):
+    """Outcome of sending one email to many recipients"""
+    recipients: int
+    sent: int
+    failed: int
+    batches: int
+    failures: List[EmailBatchFailure] = []
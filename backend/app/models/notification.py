@@ -0,0 +1,37 @@
+"""Notification models"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+from uuid import UUID
+
+from app.models.email import EmailBatchResult
+
+
+class NotificationBroadcastRequest(BaseModel):
+    """One notification sent to many recipients"""
+    audience: str = Field(..., pattern="^(all_students|counsellor_students|users)$")
+    counsellor_id: Optional[UUID] = None  # counsellor_students; defaults to the caller
+    user_ids: Optional[List[UUID]] = None  # users
+    type: str = "announcement"
+    title: str = Field(..., min_length=1, max_length=200)
+    message: str = Field(..., min_length=1)
+    link: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    email: bool = False  # also email the announcement to every recipient
+
+
+class NotificationChunkFailure(BaseModel):
+    """A batch of recipients whose insert failed"""
+    chunk: int
+    user_ids: List[str]
+    error: str
+
+
+class NotificationBulkResult(BaseModel):
+    """Outcome of a bulk notification send"""
+    recipients: int
+    created: int
+    failed: int
+    chunks: int
+    failures: List[NotificationChunkFailure] = []
+    emails: Optional[EmailBatchResult] = None  # when email was requested
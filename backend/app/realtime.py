@@ -0,0 +1,361 @@
+"""
+Realtime push
+Per-user pub/sub feeding Server-Sent Event streams, with pluggable cross-worker backends
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import current_request, realtime_connections, realtime_events
+
+logger = logging.getLogger(__name__)
+
+# Internal event ending a stream, queued by RealtimeHub.stop()
+CLOSE = "close"
+
+# (user id, event name, JSON-serializable data)
+Event = Tuple[str, str, Dict[str, Any]]
+Deliver = Callable[[str, str, Dict[str, Any]], None]
+
+
+class Subscription:
+    """
+    One stream's bounded queue of pending events
+
+    Publishers never wait on a slow client: once the queue is full the
+    subscription is marked overflowed, further events are dropped, and the
+    stream tells the client to resync (refetch) and closes.
+    """
+
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event: str, data: Dict[str, Any]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def close(self) -> None:
+        """Ask the stream to end (the client will reconnect)"""
+        self.put(CLOSE, {})
+
+
+class PubSubBackend(ABC):
+    """Carries published events to the hub of every worker"""
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        """Begin delivering events published by any worker to deliver"""
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        """Publish one event to every worker"""
+
+    async def publish_many(self, events: List[Event]) -> None:
+        for user_id, event, data in events:
+            await self.publish(user_id, event, data)
+
+
+class MemoryPubSubBackend(PubSubBackend):
+    """Events delivered within this process only"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        if self._deliver is not None:
+            self._deliver(user_id, event, data)
+
+
+class SQLitePubSubBackend(PubSubBackend):
+    """
+    Events in a local SQLite file, shared by every worker on the host
+
+    Publishing appends a row. Each worker polls for rows past the last id it
+    has seen every poll_interval and delivers them to its own subscribers,
+    so delivery latency is at most one interval. Rows older than retention
+    are pruned periodically.
+    """
+
+    PRUNE_EVERY = 1000
+    BATCH = 1000
+
+    def __init__(self, path: str, poll_interval: float, retention: float = 60.0):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        self._published = 0
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS realtime_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, event TEXT NOT NULL, "
+                "data TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _publish_sync(self, events: List[Event]) -> None:
+        now = time.time()
+        rows = [(user_id, event, json.dumps(data, default=str), now) for user_id, event, data in events]
+        with self._lock:
+            # One transaction however many events
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO realtime_events (user_id, event, data, created) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        previous, self._published = self._published, self._published + len(rows)
+        if previous // self.PRUNE_EVERY != self._published // self.PRUNE_EVERY:
+            self._execute("DELETE FROM realtime_events WHERE created < ?", (now - self.retention,))
+
+    async def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._publish_sync, [(user_id, event, data)])
+
+    async def publish_many(self, events: List[Event]) -> None:
+        if events:
+            await asyncio.to_thread(self._publish_sync, events)
+
+    async def start(self, deliver: Deliver) -> None:
+        if self._task is not None:
+            return
+        # Only events published from now on are delivered
+        rows = await asyncio.to_thread(self._execute, "SELECT COALESCE(MAX(id), 0) FROM realtime_events")
+        self._last_id = rows[0][0]
+        self._task = asyncio.create_task(self._poll(deliver))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _poll(self, deliver: Deliver) -> None:
+        while True:
+            try:
+                rows = await asyncio.to_thread(
+                    self._execute,
+                    "SELECT id, user_id, event, data FROM realtime_events WHERE id > ? ORDER BY id LIMIT ?",
+                    (self._last_id, self.BATCH)
+                )
+                for row_id, user_id, event, data in rows:
+                    self._last_id = row_id
+                    deliver(user_id, event, json.loads(data))
+                if len(rows) == self.BATCH:
+                    continue
+            except Exception as e:
+                logger.error(f"Realtime poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_pubsub_backend() -> PubSubBackend:
+    """Build the backend selected by REALTIME_BACKEND"""
+    if settings.REALTIME_BACKEND == "sqlite":
+        return SQLitePubSubBackend(settings.REALTIME_SQLITE_PATH, settings.REALTIME_POLL_INTERVAL)
+    return MemoryPubSubBackend()
+
+
+class RealtimeHub:
+    """
+    Per-user pub/sub for this worker's event streams
+
+    publish() hands an event to the backend, which delivers it to the hub of
+    every worker; each hub copies it into the queues of its own subscribers
+    for that user. Publishing never raises, so a push failure cannot fail
+    the write that triggered it.
+    """
+
+    def __init__(self, backend: Optional[PubSubBackend] = None):
+        self._backend = backend
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    @property
+    def backend(self) -> PubSubBackend:
+        if self._backend is None:
+            self._backend = create_pubsub_backend()
+        return self._backend
+
+    async def start(self) -> None:
+        """Start receiving events from the backend"""
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        """Stop receiving events and end this worker's open streams"""
+        await self.backend.stop()
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Open a subscription, or None if the user already has REALTIME_MAX_STREAMS_PER_USER"""
+        subscriptions = self._subscribers.setdefault(user_id, set())
+        if len(subscriptions) >= settings.REALTIME_MAX_STREAMS_PER_USER:
+            return None
+        subscription = Subscription(user_id, settings.REALTIME_QUEUE_SIZE)
+        subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+
+    def connections(self) -> int:
+        """Open subscriptions in this worker"""
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    async def publish(self, user_id: str, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Send an event to every stream the user has open, on any worker"""
+        try:
+            await self.backend.publish(str(user_id), event, data or {})
+        except Exception as e:
+            logger.error(f"Failed to publish {event} event: {str(e)}")
+
+    async def publish_many(self, events: List[Event]) -> None:
+        """Send many (user id, event, data) events with one backend write"""
+        try:
+            await self.backend.publish_many([(str(user_id), event, data or {}) for user_id, event, data in events])
+        except Exception as e:
+            logger.error(f"Failed to publish {len(events)} events: {str(e)}")
+
+    def _deliver(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.put(event, data)
+
+
+# Comment line keeping idle connections (and any proxies) open
+HEARTBEAT = ": heartbeat\n\n"
+
+
+def format_event(event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventSourceResponse(StreamingResponse):
+    """
+    text/event-stream response that always releases its subscription
+
+    The event generator is closed (running its finally blocks) however the
+    stream ends, including client disconnects. Database round trips made
+    while streaming are left out of the request's query budget.
+    """
+
+    def __init__(self, content: AsyncIterator[str], on_close: Optional[Callable[[], None]] = None):
+        super().__init__(
+            content,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token = current_request.set(None)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            current_request.reset(token)
+            await self.body_iterator.aclose()
+            if self.on_close is not None:
+                self.on_close()
+
+
+async def stream_subscription(
+    subscription: Subscription,
+    handle: Callable[[str, Dict[str, Any]], AsyncIterator[str]],
+    flush: Optional[Callable[[], AsyncIterator[str]]] = None
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a subscription
+
+    Each queued event is passed to handle, which yields the messages to
+    send; flush runs whenever the queue has been drained, so handlers can
+    coalesce work (such as a count refresh) across a burst of events. A
+    heartbeat comment is sent after REALTIME_HEARTBEAT_INTERVAL seconds of
+    silence, which also detects dead connections. Streams end after
+    REALTIME_STREAM_MAX_AGE seconds, or with a resync event if the client
+    fell behind; clients reconnect (re-authenticating) either way.
+    """
+    heartbeat = settings.REALTIME_HEARTBEAT_INTERVAL
+    deadline = time.monotonic() + settings.REALTIME_STREAM_MAX_AGE
+    realtime_connections.inc("opened")
+    state = "closed"
+    try:
+        yield f"retry: {settings.REALTIME_RETRY_MS}\n\n"
+        if flush is not None:
+            async for message in flush():
+                yield message
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                state = "expired"
+                return
+            try:
+                event, data = await asyncio.wait_for(subscription.queue.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                if time.monotonic() < deadline:
+                    yield HEARTBEAT
+                continue
+
+            if subscription.overflowed:
+                state = "overflow"
+                realtime_events.inc("resync")
+                yield format_event("resync", {})
+                return
+            if event == CLOSE:
+                return
+
+            realtime_events.inc(event)
+            async for message in handle(event, data):
+                yield message
+            if flush is not None and subscription.queue.empty():
+                async for message in flush():
+                    yield message
+    finally:
+        realtime_connections.inc(state)
+
+
+# Global hub instance (one per worker process)
+realtime_hub = RealtimeHub()
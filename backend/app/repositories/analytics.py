@@ -0,0 +1,147 @@
+"""Analytics rollup repositories"""
+
+from typing import Any, Dict, List, Optional
+
+from app.repositories.base import BaseRepository
+
+# Rows per request when reading rollups, at most PostgREST's default max-rows
+PAGE_SIZE = 1000
+
+# Rows per request when writing rollups
+INSERT_CHUNK_SIZE = 1000
+
+# analytics_refresh_state row holding the cross-worker refresh lease; its
+# watermark is when the lease expires and refreshed_at when it was last released
+REFRESH_LEASE = "refresh_lease"
+
+EPOCH = "1970-01-01T00:00:00+00:00"
+
+
+async def _read_pages(repository: BaseRepository, build) -> List[Dict[str, Any]]:
+    """
+    Every row of a query ordered by the table's primary key
+
+    The rollup tables have composite keys rather than an id, so they are
+    paged by offset instead of with find_all's keyset cursor.
+    """
+    rows: List[Dict[str, Any]] = []
+    while True:
+        response = await repository.execute(build().range(len(rows), len(rows) + PAGE_SIZE - 1))
+        rows.extend(response.data)
+        if len(response.data) < PAGE_SIZE:
+            return rows
+
+
+class AnalyticsDailyRepository(BaseRepository):
+    """Data access for the analytics_daily table"""
+
+    table = "analytics_daily"
+
+    async def list_since(self, day: str, columns: str = "day, metric, key, count, total") -> List[Dict[str, Any]]:
+        """Get every rollup row from the given day onwards"""
+        return await _read_pages(
+            self, lambda: self.query(columns).gte("day", day).order("day").order("metric").order("key")
+        )
+
+    async def replace_days(
+        self,
+        metrics: List[str],
+        days: Optional[List[str]],
+        rows: List[Dict[str, Any]],
+        stamp: str
+    ) -> None:
+        """
+        Replace the rollups of the given metrics on the given days (every day if None)
+
+        The new rows are upserted with updated_at=stamp before the rows of
+        those metrics and days carrying any other stamp are deleted, so a
+        reader sees either the old or the new value of a key, never a gap.
+        """
+        if days is not None and not days:
+            return
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = [{**row, "updated_at": stamp} for row in rows[start:start + INSERT_CHUNK_SIZE]]
+            await self.execute(self.client.from_(self.table).upsert(chunk, on_conflict="day,metric,key"))
+
+        builder = self.client.from_(self.table).delete().in_("metric", metrics).neq("updated_at", stamp)
+        if days is not None:
+            builder = builder.in_("day", days)
+        await self.execute(builder)
+
+
+class AnalyticsCounterRepository(BaseRepository):
+    """Data access for the analytics_counters table"""
+
+    table = "analytics_counters"
+
+    async def list_all(self, columns: str = "metric, key, count") -> List[Dict[str, Any]]:
+        """Get every counter"""
+        return await _read_pages(self, lambda: self.query(columns).order("metric").order("key"))
+
+    async def compute_totals(self) -> List[Dict[str, Any]]:
+        """Current counter values, grouped and counted by the analytics_counter_totals view"""
+        response = await self.execute(self.client.from_("analytics_counter_totals").select("metric, key, count"))
+        return response.data
+
+    async def replace(self, metrics: List[str], rows: List[Dict[str, Any]], stamp: str) -> None:
+        """Replace every counter of the given metrics, upserting before deleting stale keys"""
+        if rows:
+            rows = [{**row, "updated_at": stamp} for row in rows]
+            await self.execute(self.client.from_(self.table).upsert(rows, on_conflict="metric,key"))
+        builder = self.client.from_(self.table).delete().in_("metric", metrics).neq("updated_at", stamp)
+        await self.execute(builder)
+
+
+class AnalyticsRefreshStateRepository(BaseRepository):
+    """Data access for the analytics_refresh_state table"""
+
+    table = "analytics_refresh_state"
+
+    async def get_watermarks(self) -> Dict[str, Optional[str]]:
+        """Get the refresh watermark of every source, keyed by source"""
+        rows = await self.find("source, watermark")
+        return {row["source"]: row.get("watermark") for row in rows if row["source"] != REFRESH_LEASE}
+
+    async def set_watermark(self, source: str, watermark: str, refreshed_at: str) -> None:
+        """Record how far a source has been aggregated"""
+        builder = self.client.from_(self.table).upsert(
+            {"source": source, "watermark": watermark, "refreshed_at": refreshed_at},
+            on_conflict="source"
+        )
+        await self.execute(builder)
+
+    async def claim_lease(self, now: str, until: str, idle_since: Optional[str] = None) -> bool:
+        """
+        Take the refresh lease until `until` if no other worker holds it
+
+        With idle_since, the lease is only taken if it was last released
+        before then, so one refresh runs per interval across the workers.
+        Like the outbox claim, this is a conditional update, so when workers
+        race for the lease exactly one gets it.
+        """
+        await self.execute(self.client.from_(self.table).upsert(
+            {"source": REFRESH_LEASE, "watermark": EPOCH, "refreshed_at": EPOCH},
+            on_conflict="source", ignore_duplicates=True
+        ))
+        builder = self.client.from_(self.table)\
+            .update({"watermark": until})\
+            .eq("source", REFRESH_LEASE)\
+            .lt("watermark", now)
+        if idle_since is not None:
+            builder = builder.lt("refreshed_at", idle_since)
+        response = await self.execute(builder)
+        return bool(response.data)
+
+    async def release_lease(self, until: str, refreshed_at: Optional[str] = None) -> None:
+        """
+        Give up a lease taken until `until`, unless it has since expired and
+        been taken by another worker; refreshed_at records a completed refresh
+        """
+        fields = {"watermark": EPOCH}
+        if refreshed_at is not None:
+            fields["refreshed_at"] = refreshed_at
+        builder = self.client.from_(self.table)\
+            .update(fields)\
+            .eq("source", REFRESH_LEASE)\
+            .eq("watermark", until)
+        await self.execute(builder)
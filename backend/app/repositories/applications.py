@@ -0,0 +1,22 @@
+"""Application repository"""
+
+from typing import Any, Dict, List, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+# Columns admins may request from the application listing (fields=)
+APPLICATION_COLUMNS = (
+    "id", "student_id", "university_name", "program_name", "intake", "status", "counsellor_id",
+    "applied_date", "decision_date", "notes", "timeline", "created_at", "updated_at",
+)
+
+
+class ApplicationRepository(BaseRepository):
+    """Data access for the applications table"""
+
+    table = "applications"
+
+    async def list_for_student(self, student_id: Union[str, UUID]) -> List[Dict[str, Any]]:
+        """Get a student's applications, newest first"""
+        return await self.find(student_id=student_id, order_by="created_at", desc=True)
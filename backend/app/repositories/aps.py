@@ -0,0 +1,25 @@
+"""APS submission repository"""
+
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+# Columns admins may request from the submission listing (fields=)
+APS_SUBMISSION_COLUMNS = (
+    "id", "student_id", "form_data", "status", "counsellor_id", "verification_comments",
+    "submitted_at", "verified_at", "updated_at",
+)
+
+# Default listing columns: the form itself is only needed on the detail view
+APS_SUBMISSION_LIST_COLUMNS = tuple(c for c in APS_SUBMISSION_COLUMNS if c != "form_data")
+
+
+class APSSubmissionRepository(BaseRepository):
+    """Data access for the aps_submissions table"""
+
+    table = "aps_submissions"
+
+    async def get_latest_for_student(self, student_id: Union[str, UUID]) -> Optional[Dict[str, Any]]:
+        """Get a student's most recent submission"""
+        return await self.find_one(student_id=student_id, order_by="submitted_at", desc=True)
@@ -0,0 +1,229 @@
+"""
+Base repository
+Async data access on top of the PostgREST client
+"""
+
+import asyncio
+import time
+from postgrest import AsyncPostgrestClient, APIResponse
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from uuid import UUID
+
+from app.metrics import current_request, record_db_request
+from app.repositories.pagination import encode_cursor, keyset_filter, quote
+
+# Max values per in.(...) filter before find_in splits the request
+IN_CHUNK_SIZE = 200
+
+
+def query_shape(table: str, builder) -> str:
+    """
+    A query with its values stripped, e.g. "GET users ?select=id,role&id=eq&limit"
+
+    Identical shapes issued many times in one request suggest an N+1 loop.
+    """
+    request = getattr(builder, "request", builder)
+    parts = []
+    for key, value in request.params.multi_items():
+        if key in ("select", "order", "on_conflict"):
+            parts.append(f"{key}={value}")
+        elif key in ("limit", "offset", "or", "and"):
+            parts.append(key)
+        else:
+            parts.append(f"{key}={value.split('.', 1)[0]}")
+    return f"{request.http_method} {table} ?{'&'.join(parts)}"
+
+
+def _value(value: Any) -> Any:
+    """Normalise filter values (UUIDs are sent as strings)"""
+    return str(value) if isinstance(value, UUID) else value
+
+
+class BaseRepository:
+    """Async CRUD helpers for a single table"""
+
+    table: str = ""
+
+    def __init__(self, client: AsyncPostgrestClient):
+        self.client = client
+
+    def query(self, columns: str = "*", count: Optional[str] = None):
+        """Start a select query on this table"""
+        return self.client.from_(self.table).select(columns, count=count)
+
+    def filter(self, builder, **filters):
+        """Apply equality filters to a query builder"""
+        for column, value in filters.items():
+            builder = builder.eq(column, _value(value))
+        return builder
+
+    async def execute(self, builder) -> APIResponse:
+        """Execute a query builder, recording the round trip in metrics"""
+        start = time.perf_counter()
+        try:
+            return await builder.execute()
+        finally:
+            method = getattr(getattr(builder, "request", builder), "http_method", "UNKNOWN")
+            # Shapes are only needed inside an instrumented request
+            shape = query_shape(self.table, builder) if current_request.get() is not None else None
+            record_db_request(self.table, method, time.perf_counter() - start, shape)
+
+    async def find(
+        self,
+        columns: str = "*",
+        order_by: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[Dict[str, Any]]:
+        """Get all rows matching the equality filters"""
+        builder = self.filter(self.query(columns), **filters)
+        if order_by:
+            builder = builder.order(order_by, desc=desc)
+        if limit is not None:
+            builder = builder.limit(limit)
+
+        response = await self.execute(builder)
+        return response.data
+
+    async def find_one(
+        self,
+        columns: str = "*",
+        order_by: Optional[str] = None,
+        desc: bool = False,
+        **filters
+    ) -> Optional[Dict[str, Any]]:
+        """Get the first row matching the equality filters"""
+        rows = await self.find(columns, order_by=order_by, desc=desc, limit=1, **filters)
+        return rows[0] if rows else None
+
+    async def get(self, id: Union[str, UUID], columns: str = "*") -> Optional[Dict[str, Any]]:
+        """Get a row by primary key"""
+        return await self.find_one(columns, id=id)
+
+    async def find_in(
+        self,
+        column: str,
+        values: List[Any],
+        columns: str = "*",
+        chunk_size: int = IN_CHUNK_SIZE
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all rows whose column is in the given values
+
+        Large value lists are split into chunks fetched concurrently, keeping
+        each request URL well under proxy limits.
+        """
+        values = list(dict.fromkeys(_value(v) for v in values))
+        if not values:
+            return []
+
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        responses = await asyncio.gather(*(
+            self.execute(self.query(columns).in_(column, chunk)) for chunk in chunks
+        ))
+        return [row for response in responses for row in response.data]
+
+    async def find_between(
+        self,
+        column: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: str = "*",
+        page_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all rows whose column falls in [start, end); either bound may be open
+
+        Paged like find_all, ordered by column; columns must include id and column.
+        """
+        bounds = []
+        if start is not None:
+            bounds.append(f"{column}.gte.{quote(start)}")
+        if end is not None:
+            bounds.append(f"{column}.lt.{quote(end)}")
+        return await self.find_all(columns, page_size=page_size, order_by=column, or_filters=bounds)
+
+    async def find_page(
+        self,
+        columns: str = "*",
+        limit: Optional[int] = 50,
+        cursor: Optional[str] = None,
+        or_filters: Iterable[str] = (),
+        order_by: str = "created_at",
+        desc: bool = True,
+        count: Optional[str] = None,
+        **filters
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Get one page of rows, the cursor for the next page and the total
+
+        Uses keyset pagination on (order_by, id), newest first by default;
+        columns must include both. Each entry of or_filters is a PostgREST
+        or=(...) body; separate entries are ANDed together. Without a limit
+        every remaining row is returned. With count ("exact", "planned" or
+        "estimated") the first page also reports how many rows match; later
+        pages report None, since the cursor narrows the count. Raises
+        ValueError for a malformed cursor.
+        """
+        count = count if not cursor else None
+        builder = self.filter(self.query(columns, count=count), **filters)
+        after = keyset_filter(cursor, order_by, desc)
+        for expression in [*or_filters, after]:
+            if expression:
+                builder = builder.or_(expression)
+        builder = builder.order(order_by, desc=desc).order("id", desc=desc)
+        if limit is not None:
+            builder = builder.limit(limit + 1)
+
+        response = await self.execute(builder)
+        rows = response.data
+        total = response.count if count else None
+        if limit is None or len(rows) <= limit:
+            return rows, None, total
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1], order_by), total
+
+    async def find_all(
+        self,
+        columns: str = "*",
+        page_size: int = 1000,
+        order_by: str = "created_at",
+        or_filters: Iterable[str] = (),
+        **filters
+    ) -> List[Dict[str, Any]]:
+        """
+        Get every row matching the filters, oldest first
+
+        Fetched in keyset pages of page_size, so PostgREST's max-rows limit
+        cannot silently truncate the result; columns must include id and
+        order_by (order_by="id" pages tables without a timestamp). or_filters
+        are applied as in find_page.
+        """
+        rows: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            page, cursor, _ = await self.find_page(
+                columns, limit=page_size, cursor=cursor, or_filters=or_filters, order_by=order_by, desc=False,
+                **filters
+            )
+            rows.extend(page)
+            if cursor is None:
+                return rows
+
+    async def insert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Insert one or many rows and return them"""
+        response = await self.execute(self.client.from_(self.table).insert(data))
+        return response.data
+
+    async def update(self, data: Dict[str, Any], **filters) -> List[Dict[str, Any]]:
+        """Update all rows matching the equality filters and return them"""
+        builder = self.filter(self.client.from_(self.table).update(data), **filters)
+        response = await self.execute(builder)
+        return response.data
+
+    async def delete(self, **filters) -> List[Dict[str, Any]]:
+        """Delete all rows matching the equality filters"""
+        builder = self.filter(self.client.from_(self.table).delete(), **filters)
+        response = await self.execute(builder)
+        return response.data
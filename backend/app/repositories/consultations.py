@@ -0,0 +1,59 @@
+"""Consultation repository"""
+
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+# Columns admins may request from the consultation listing (fields=)
+CONSULTATION_COLUMNS = (
+    "id", "student_id", "counsellor_id", "consultation_type", "scheduled_at", "duration_minutes",
+    "status", "meeting_link", "notes", "created_at", "updated_at",
+)
+
+# Embedded counsellor resource used by the consultation list
+COUNSELLOR_EMBED = "counsellor:users!consultations_counsellor_id_fkey(name, email)"
+
+
+class ConsultationRepository(BaseRepository):
+    """Data access for the consultations table"""
+
+    table = "consultations"
+
+    async def list_with_counsellor(
+        self,
+        student_id: Optional[Union[str, UUID]] = None,
+        status: Optional[str] = None,
+        scheduled_from: Optional[str] = None,
+        scheduled_before: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get consultations joined with their counsellor, ordered by schedule"""
+        builder = self.query(f"*, {COUNSELLOR_EMBED}")
+
+        if student_id:
+            builder = builder.eq("student_id", str(student_id))
+        if status:
+            builder = builder.eq("status", status)
+        if scheduled_from:
+            builder = builder.gte("scheduled_at", scheduled_from)
+        if scheduled_before:
+            builder = builder.lt("scheduled_at", scheduled_before)
+
+        response = await self.execute(builder.order("scheduled_at", desc=False))
+        return response.data
+
+    async def find_scheduled_between(
+        self,
+        start: str,
+        end: str,
+        counsellor_id: Optional[Union[str, UUID]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get the non-cancelled consultations scheduled in [start, end)"""
+        builder = self.query("counsellor_id, scheduled_at, duration_minutes")\
+            .neq("status", "cancelled")\
+            .gte("scheduled_at", start)\
+            .lt("scheduled_at", end)
+        if counsellor_id:
+            builder = builder.eq("counsellor_id", str(counsellor_id))
+        response = await self.execute(builder)
+        return response.data
@@ -0,0 +1,45 @@
+"""
+Repository container
+Groups every table repository behind one object bound to a PostgREST client
+"""
+
+from postgrest import AsyncPostgrestClient
+
+from app.repositories.users import UserRepository
+from app.repositories.profiles import ProfileRepository
+from app.repositories.documents import DocumentRepository
+from app.repositories.aps import APSSubmissionRepository
+from app.repositories.applications import ApplicationRepository
+from app.repositories.messages import MessageRepository
+from app.repositories.consultations import ConsultationRepository
+from app.repositories.leads import LeadRepository
+from app.repositories.notifications import NotificationRepository, NotificationCounterRepository
+from app.repositories.eligibility import EligibilityCheckRepository
+from app.repositories.generation_jobs import GenerationJobRepository
+from app.repositories.outbox import OutboxRepository
+from app.repositories.analytics import (
+    AnalyticsDailyRepository, AnalyticsCounterRepository, AnalyticsRefreshStateRepository
+)
+
+
+class Database:
+    """Async repositories for every table the API touches"""
+
+    def __init__(self, client: AsyncPostgrestClient):
+        self.client = client
+        self.users = UserRepository(client)
+        self.profiles = ProfileRepository(client)
+        self.documents = DocumentRepository(client)
+        self.aps_submissions = APSSubmissionRepository(client)
+        self.applications = ApplicationRepository(client)
+        self.messages = MessageRepository(client)
+        self.consultations = ConsultationRepository(client)
+        self.leads = LeadRepository(client)
+        self.notifications = NotificationRepository(client)
+        self.notification_counters = NotificationCounterRepository(client)
+        self.eligibility_checks = EligibilityCheckRepository(client)
+        self.generation_jobs = GenerationJobRepository(client)
+        self.outbox = OutboxRepository(client)
+        self.analytics_daily = AnalyticsDailyRepository(client)
+        self.analytics_counters = AnalyticsCounterRepository(client)
+        self.analytics_refresh_state = AnalyticsRefreshStateRepository(client)
@@ -0,0 +1,57 @@
+"""Document repository"""
+
+from typing import Any, Dict, List, Tuple, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+# Columns counsellors and admins may request from document listings (fields=)
+DOCUMENT_COLUMNS = (
+    "id", "student_id", "type", "title", "content", "file_url", "file_name", "file_size", "mime_type",
+    "status", "version", "counsellor_id", "review_comments", "created_at", "updated_at",
+    "submitted_at", "reviewed_at",
+)
+
+# Default listing columns: content holds the full essay text, fetched per document
+DOCUMENT_LIST_COLUMNS = tuple(c for c in DOCUMENT_COLUMNS if c != "content")
+
+
+class DocumentRepository(BaseRepository):
+    """Data access for the documents table"""
+
+    table = "documents"
+
+    async def list_for_student(self, student_id: Union[str, UUID]) -> List[Dict[str, Any]]:
+        """Get a student's documents, newest first"""
+        return await self.find(student_id=student_id, order_by="created_at", desc=True)
+
+    async def create_draft(
+        self,
+        student_id: Union[str, UUID],
+        document_type: str,
+        title: str,
+        content: str
+    ) -> Dict[str, Any]:
+        """Store generated content as a new draft document"""
+        created = await self.create_drafts(student_id, [(document_type, title, content)])
+        return created[0]
+
+    async def create_drafts(
+        self,
+        student_id: Union[str, UUID],
+        drafts: List[Tuple[str, str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Store several (type, title, content) drafts in one insert, returned in order"""
+        if not drafts:
+            return []
+        return await self.insert([
+            {
+                "student_id": str(student_id),
+                "type": document_type,
+                "title": title,
+                "content": content,
+                "status": "draft",
+                "version": 1
+            }
+            for document_type, title, content in drafts
+        ])
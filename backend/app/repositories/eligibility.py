@@ -0,0 +1,16 @@
+"""Eligibility repositories"""
+
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+
+class EligibilityCheckRepository(BaseRepository):
+    """Data access for the eligibility_checks table"""
+
+    table = "eligibility_checks"
+
+    async def get_latest_for_student(self, student_id: Union[str, UUID]) -> Optional[Dict[str, Any]]:
+        """Get a student's most recent eligibility check"""
+        return await self.find_one(student_id=student_id, order_by="created_at", desc=True)
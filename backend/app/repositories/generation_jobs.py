@@ -0,0 +1,23 @@
+"""Generation job repository"""
+
+from typing import Any, Dict, List
+
+from app.repositories.base import BaseRepository
+
+# Jobs that have not finished yet
+ACTIVE_STATUSES = ["queued", "running"]
+
+
+class GenerationJobRepository(BaseRepository):
+    """Data access for the generation_jobs table"""
+
+    table = "generation_jobs"
+
+    async def fail_stale(self, before: str, error: str, now: str) -> List[Dict[str, Any]]:
+        """Mark queued or running jobs last updated before `before` as failed"""
+        builder = self.client.from_(self.table)\
+            .update({"status": "failed", "error": error, "finished_at": now})\
+            .in_("status", ACTIVE_STATUSES)\
+            .lt("updated_at", before)
+        response = await self.execute(builder)
+        return response.data
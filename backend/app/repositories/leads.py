@@ -0,0 +1,15 @@
+"""Lead repository"""
+
+from app.repositories.base import BaseRepository
+
+# Columns admins may request from the lead listing (fields=)
+LEAD_COLUMNS = (
+    "id", "name", "email", "phone", "source", "status", "assigned_to", "notes",
+    "created_at", "updated_at",
+)
+
+
+class LeadRepository(BaseRepository):
+    """Data access for the leads table"""
+
+    table = "leads"
@@ -0,0 +1,22 @@
+"""Message repository"""
+
+from typing import Any, Dict, List, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository
+
+
+class MessageRepository(BaseRepository):
+    """Data access for the messages table"""
+
+    table = "messages"
+
+    async def list_for_user(self, user_id: Union[str, UUID]) -> List[Dict[str, Any]]:
+        """Get every message the user sent or received, newest first"""
+        builder = self.query().or_(f"sender_id.eq.{user_id},receiver_id.eq.{user_id}")
+        response = await self.execute(builder.order("created_at", desc=True))
+        return response.data
+
+    async def list_for_conversation(self, conversation_id: Union[str, UUID]) -> List[Dict[str, Any]]:
+        """Get every message in a conversation, newest first"""
+        return await self.find(conversation_id=conversation_id, order_by="created_at", desc=True)
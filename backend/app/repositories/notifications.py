@@ -0,0 +1,72 @@
+"""Notification repository"""
+
+from postgrest import APIResponse
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+from datetime import datetime
+
+from app.repositories.base import BaseRepository
+
+
+class NotificationRepository(BaseRepository):
+    """Data access for the notifications table"""
+
+    table = "notifications"
+
+    async def insert_once(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert a notification unless one with its dedup_key exists; returns the new row, or None"""
+        builder = self.client.from_(self.table).upsert(data, on_conflict="dedup_key", ignore_duplicates=True)
+        response = await self.execute(builder)
+        return response.data[0] if response.data else None
+
+    async def list_for_user(
+        self,
+        user_id: Union[str, UUID],
+        limit: int,
+        offset: int,
+        notification_type: Optional[str] = None,
+        is_read: Optional[bool] = None,
+        count: Optional[str] = "planned"
+    ) -> APIResponse:
+        """
+        Get a page of a user's notifications (newest first)
+
+        One extra row is fetched so callers can tell whether another page
+        follows without a total. count is passed to PostgREST ("exact",
+        "planned" or "estimated"); None skips counting.
+        """
+        builder = self.query("*", count=count).eq("user_id", str(user_id))
+
+        if notification_type:
+            builder = builder.eq("type", notification_type)
+        if is_read is not None:
+            builder = builder.eq("is_read", is_read)
+
+        builder = builder.order("created_at", desc=True).range(offset, offset + limit)
+        return await self.execute(builder)
+
+    async def mark_read(self, notification_id: str):
+        """Mark one notification as read"""
+        return await self.update(
+            {"is_read": True, "read_at": datetime.utcnow().isoformat()},
+            id=notification_id
+        )
+
+    async def mark_all_read(self, user_id: Union[str, UUID]):
+        """Mark all of a user's unread notifications as read"""
+        return await self.update(
+            {"is_read": True, "read_at": datetime.utcnow().isoformat()},
+            user_id=user_id,
+            is_read=False
+        )
+
+
+class NotificationCounterRepository(BaseRepository):
+    """Data access for the notification_counters table (maintained by triggers)"""
+
+    table = "notification_counters"
+
+    async def get_unread(self, user_id: Union[str, UUID]) -> int:
+        """Get a user's unread notification count; users without a row have none"""
+        row = await self.find_one("unread_count", user_id=str(user_id))
+        return row["unread_count"] if row else 0
@@ -0,0 +1,68 @@
+"""Outbox repository"""
+
+from typing import Any, Dict, List
+
+from app.repositories.base import BaseRepository
+
+# Entries the dispatcher may claim: queued, or leased by a worker that never finished
+DUE_STATUSES = ["pending", "sending"]
+
+
+class OutboxRepository(BaseRepository):
+    """Data access for the outbox table"""
+
+    table = "outbox"
+
+    async def enqueue(self, entries: List[Dict[str, Any]]) -> int:
+        """Insert entries, skipping any whose dedup_key is already present; returns how many were new"""
+        builder = self.client.from_(self.table).upsert(entries, on_conflict="dedup_key", ignore_duplicates=True)
+        response = await self.execute(builder)
+        return len(response.data)
+
+    async def claim(self, limit: int, now: str, lease_until: str) -> List[Dict[str, Any]]:
+        """
+        Lease up to limit due entries, oldest first
+
+        The lease is a conditional update that only matches entries still
+        due, so when workers race for the same entries each is claimed once.
+        """
+        builder = self.query("id")\
+            .in_("status", DUE_STATUSES)\
+            .lte("available_at", now)\
+            .order("available_at", desc=False)\
+            .limit(limit)
+        response = await self.execute(builder)
+        ids = [row["id"] for row in response.data]
+        if not ids:
+            return []
+
+        builder = self.client.from_(self.table)\
+            .update({"status": "sending", "available_at": lease_until})\
+            .in_("id", ids)\
+            .in_("status", DUE_STATUSES)\
+            .lte("available_at", now)
+        response = await self.execute(builder)
+        return response.data
+
+    async def mark_sent(self, ids: List[str], now: str) -> None:
+        """Record entries as delivered"""
+        if ids:
+            builder = self.client.from_(self.table)\
+                .update({"status": "sent", "sent_at": now, "last_error": None})\
+                .in_("id", ids)
+            await self.execute(builder)
+
+    async def record_failures(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Write back failed entries with their new status, attempts and error
+
+        Claimed entries are complete rows, so one upsert on id updates them
+        all in a single request.
+        """
+        if entries:
+            await self.execute(self.client.from_(self.table).upsert(entries, on_conflict="id"))
+
+    async def prune_sent(self, before: str) -> None:
+        """Delete delivered entries older than before (their dedup keys can then recur)"""
+        builder = self.client.from_(self.table).delete().eq("status", "sent").lt("sent_at", before)
+        await self.execute(builder)
@@ -0,0 +1,76 @@
+"""
+Keyset pagination helpers
+Opaque cursors over (sort column, id), and fields= projections for list endpoints
+"""
+
+import base64
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+def encode_cursor(row: Dict[str, Any], column: str = "created_at") -> str:
+    """Build the cursor pointing just past the given row"""
+    payload = json.dumps({column: row.get(column), "id": str(row.get("id"))})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, column: str = "created_at") -> Tuple[str, str]:
+    """
+    Decode a cursor into its (sort value, id) pair; raises ValueError if malformed
+
+    A cursor issued for a listing sorted by another column is malformed too.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = payload[column], payload["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not value or not row_id:
+        raise ValueError("Invalid cursor")
+    return str(value), str(row_id)
+
+
+def quote(value: str) -> str:
+    """Quote a value for use inside a PostgREST or=(...) expression"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def keyset_filter(cursor: Optional[str], column: str = "created_at", desc: bool = True) -> Optional[str]:
+    """
+    PostgREST or=(...) body selecting rows after the cursor
+
+    Rows are ordered by column, then id, both descending (or both ascending),
+    so "after" means a further column value, or the same value and a further id.
+    """
+    if not cursor:
+        return None
+    value, row_id = decode_cursor(cursor, column)
+    op = "lt" if desc else "gt"
+    ts = quote(value)
+    return f"{column}.{op}.{ts},and({column}.eq.{ts},id.{op}.{quote(row_id)})"
+
+
+def select_columns(
+    fields: Optional[str],
+    allowed: Sequence[str],
+    default: Sequence[str],
+    required: Sequence[str] = ("id", "created_at")
+) -> str:
+    """
+    PostgREST select list for a comma-separated fields= query parameter
+
+    Without fields the default columns are selected. Only plain column names
+    from allowed are accepted, so clients cannot request embedded resources;
+    the required columns (those the cursor is built from) are always added.
+    Raises ValueError for unknown names.
+    """
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    else:
+        names = list(default)
+    return ",".join(dict.fromkeys([*required, *names]))
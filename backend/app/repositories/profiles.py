@@ -0,0 +1,50 @@
+"""Profile repository"""
+
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from app.repositories.base import BaseRepository, IN_CHUNK_SIZE
+
+# Profile columns shown on the counsellor/admin student listings
+STUDENT_LIST_COLUMNS = ",".join([
+    "id", "user_id", "first_name", "middle_name", "last_name", "date_of_birth",
+    "gender", "nationality", "mobile_number", "address",
+    "highest_qualification", "field_of_study", "institution_name", "graduation_year",
+    "cgpa_percentage", "cgpa_type", "english_test_type", "english_score", "german_level",
+    "work_experience_years", "preferred_intake", "interested_country", "study_level",
+    "preferred_program", "completion_percentage", "counsellor_id", "updated_at",
+])
+
+
+class ProfileRepository(BaseRepository):
+    """Data access for the profiles table"""
+
+    table = "profiles"
+
+    async def get_by_user_id(self, user_id: Union[str, UUID], columns: str = "*") -> Optional[Dict[str, Any]]:
+        """Get the profile belonging to a user"""
+        return await self.find_one(columns, user_id=user_id)
+
+    async def get_by_user_ids(self, user_ids: List[Union[str, UUID]], columns: str = "*") -> Dict[str, Dict[str, Any]]:
+        """Get the profiles belonging to many users, keyed by user id"""
+        profiles = await self.find_in("user_id", user_ids, columns)
+        return {str(profile["user_id"]): profile for profile in profiles}
+
+    async def user_ids_by_nationality(self, search: str, limit: int = IN_CHUNK_SIZE) -> List[str]:
+        """
+        Get the ids of users whose nationality contains the search term
+
+        At most limit ids, most recent profiles first: the ids end up in one
+        in.(...) filter, which must stay short enough for the request URL.
+        """
+        builder = self.query("user_id")\
+            .ilike("nationality", f"*{search}*")\
+            .order("created_at", desc=True)\
+            .limit(limit)
+        response = await self.execute(builder)
+        return [str(row["user_id"]) for row in response.data if row.get("user_id")]
+
+    async def user_ids_by_counsellor(self, counsellor_id: Union[str, UUID]) -> List[str]:
+        """Get the ids of every student assigned to a counsellor"""
+        rows = await self.find_all("id, user_id, created_at", counsellor_id=str(counsellor_id))
+        return [str(row["user_id"]) for row in rows if row.get("user_id")]
@@ -0,0 +1,63 @@
+"""User repository"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.repositories.base import BaseRepository
+from app.repositories.pagination import quote
+
+# Columns admins may request from the user listing (fields=)
+USER_COLUMNS = (
+    "id", "email", "name", "role", "auth_provider", "google_id", "profile_picture_url", "status",
+    "created_at", "last_login", "updated_at",
+)
+
+# User columns on the counsellor/admin student listing
+STUDENT_USER_COLUMNS = ",".join([
+    "id", "email", "name", "role", "status", "profile_picture_url", "created_at", "last_login",
+])
+
+
+class UserRepository(BaseRepository):
+    """Data access for the users table"""
+
+    table = "users"
+
+    async def list_by_roles(self, roles: List[str], columns: str = "*") -> List[Dict[str, Any]]:
+        """Get all users having one of the given roles"""
+        return await self.find_in("role", roles, columns)
+
+    async def list_ids(self, role: str, status: Optional[str] = "active") -> List[str]:
+        """Get the ids of every user with the role (and status, unless None)"""
+        filters = {"status": status} if status is not None else {}
+        rows = await self.find_all("id, created_at", role=role, **filters)
+        return [row["id"] for row in rows]
+
+    async def search_page(
+        self,
+        role: str,
+        search: Optional[str] = None,
+        extra_ids: List[str] = (),
+        columns: str = STUDENT_USER_COLUMNS,
+        limit: Optional[int] = 50,
+        cursor: Optional[str] = None,
+        count: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Get newest-first users of a role, optionally matching a search term
+
+        The term is matched case-insensitively against name and email; users
+        listed in extra_ids match as well (e.g. hits on a profile column).
+        They go into a single in.(...) clause, so callers keep the list short
+        (at most IN_CHUNK_SIZE ids).
+        """
+        or_filters = []
+        if search:
+            term = quote(f"*{search}*")
+            clauses = [f"name.ilike.{term}", f"email.ilike.{term}"]
+            if extra_ids:
+                clauses.append(f"id.in.({','.join(quote(i) for i in extra_ids)})")
+            or_filters.append(",".join(clauses))
+
+        return await self.find_page(
+            columns, limit=limit, cursor=cursor, or_filters=or_filters, count=count, role=role
+        )
@@ -3,28 +3,43 @@ AI service using Google Gemini
 Handles document generation with AI
 """
 
+import asyncio
+import time
 import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional
 
 from app.config import settings
+from app.metrics import ai_cache_requests, ai_request_duration, ai_tokens
 from app.models.profile import ProfileInDB
+from app.services.generation_cache import GenerationCache, get_generation_cache
+
+# Part of the generation cache key; bump when the prompt templates change
+PROMPT_TEMPLATE_VERSION = "1"
 
 
 class AIService:
-    """AI service for document generation"""
+    """
+    AI service for document generation
+
+    Uses Gemini's async API so a generation never blocks the event loop. Use
+    get_ai_service() rather than constructing it per request. Results are
+    cached by prompt (see generation_cache) unless regenerate is set.
+    """
     
     def __init__(self):
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        # Caps concurrent Gemini calls per worker
+        self._slots = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
     
-    def generate_sop(
+    def sop_prompt(
         self,
         profile: ProfileInDB,
         university: str,
         program: str,
         additional_info: Optional[str] = None
     ) -> str:
-        """Generate Statement of Purpose"""
+        """Prompt for a Statement of Purpose"""
         prompt = f"""
 Generate a professional Statement of Purpose for a Master's program in {program} at {university}.
 
@@ -50,16 +65,14 @@ Requirements:
 
 Generate a compelling SOP that showcases the student's unique qualifications and passion for the program:
 """
-        
-        response = self.model.generate_content(prompt)
-        return response.text
+        return prompt
     
-    def generate_resume(
+    def resume_prompt(
         self,
         profile: ProfileInDB,
         additional_info: Optional[str] = None
     ) -> str:
-        """Generate professional resume"""
+        """Prompt for a professional resume"""
         prompt = f"""
 Generate a professional academic resume/CV for a student applying to German universities.
 
@@ -89,11 +102,9 @@ Generate a well-formatted resume with sections: Personal Information, Education,
 
 Use a clean, professional format suitable for German university applications.
 """
-        
-        response = self.model.generate_content(prompt)
-        return response.text
+        return prompt
     
-    def generate_lor(
+    def lor_prompt(
         self,
         profile: ProfileInDB,
         recommender_name: str,
@@ -101,7 +112,7 @@ Use a clean, professional format suitable for German university applications.
         relationship: str,
         additional_info: Optional[str] = None
     ) -> str:
-        """Generate Letter of Recommendation"""
+        """Prompt for a Letter of Recommendation"""
         prompt = f"""
 Generate a professional Letter of Recommendation for a student applying to German universities.
 
@@ -126,18 +137,16 @@ Generate a strong letter that:
 
 Format as a formal business letter with proper structure.
 """
-        
-        response = self.model.generate_content(prompt)
-        return response.text
+        return prompt
     
-    def generate_cover_letter(
+    def cover_letter_prompt(
         self,
         profile: ProfileInDB,
         university: str,
         program: str,
         additional_info: Optional[str] = None
     ) -> str:
-        """Generate cover letter"""
+        """Prompt for a cover letter"""
         prompt = f"""
 Generate a professional cover letter for a university application to {program} at {university}.
 
@@ -162,10 +171,57 @@ Generate a concise, professional cover letter (300-400 words) that:
 
 Format as a formal business letter.
 """
-        
-        response = self.model.generate_content(prompt)
-        return response.text
+        return prompt
     
+    def build_prompt(
+        self,
+        document_type: str,
+        profile: ProfileInDB,
+        university: str,
+        program: str,
+        additional_info: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """Build the generation prompt for a document type"""
+        if document_type == "sop":
+            return self.sop_prompt(profile, university, program, additional_info)
+        elif document_type == "resume":
+            return self.resume_prompt(profile, additional_info)
+        elif document_type == "lor":
+            recommender_name = kwargs.get("recommender_name", "Professor")
+            recommender_title = kwargs.get("recommender_title", "Associate Professor")
+            relationship = kwargs.get("relationship", "Academic Supervisor")
+            return self.lor_prompt(
+                profile, recommender_name, recommender_title, relationship, additional_info
+            )
+        elif document_type == "cover_letter":
+            return self.cover_letter_prompt(profile, university, program, additional_info)
+        else:
+            raise ValueError(f"Unsupported document type: {document_type}")
+
+    def cache_key(self, prompt: str) -> str:
+        """Generation cache key for a prompt sent to the configured model"""
+        return GenerationCache.key(PROMPT_TEMPLATE_VERSION, settings.GEMINI_MODEL, prompt)
+
+    async def _cached(self, cache, key: str, regenerate: bool) -> Optional[str]:
+        """Look a prompt up in the generation cache, recording the outcome"""
+        if not cache:
+            return None
+        if regenerate:
+            ai_cache_requests.inc("bypass")
+            return None
+        cached = await cache.get(key)
+        ai_cache_requests.inc("hit" if cached is not None else "miss")
+        return cached
+
+    @staticmethod
+    def _record_usage(document_type: str, usage) -> None:
+        """Count the tokens Gemini reports for a response"""
+        if usage is None:
+            return
+        ai_tokens.inc(document_type, "prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+        ai_tokens.inc(document_type, "completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
+
     async def generate_document(
         self,
         document_type: str,
@@ -173,6 +229,7 @@ Format as a formal business letter.
         university: str,
         program: str,
         additional_info: Optional[str] = None,
+        regenerate: bool = False,
         **kwargs
     ) -> str:
         """
@@ -184,50 +241,95 @@ Format as a formal business letter.
             university: University name
             program: Program name
             additional_info: Additional context
+            regenerate: Skip the generation cache and call Gemini
             **kwargs: Additional arguments for specific document types
         
         Returns:
             Generated document text
         """
-        if document_type == "sop":
-            return self.generate_sop(profile, university, program, additional_info)
-        elif document_type == "resume":
-            return self.generate_resume(profile, additional_info)
-        elif document_type == "lor":
-            recommender_name = kwargs.get("recommender_name", "Professor")
-            recommender_title = kwargs.get("recommender_title", "Associate Professor")
-            relationship = kwargs.get("relationship", "Academic Supervisor")
-            return self.generate_lor(
-                profile, recommender_name, recommender_title, relationship, additional_info
-            )
-        elif document_type == "cover_letter":
-            return self.generate_cover_letter(profile, university, program, additional_info)
-        else:
-            raise ValueError(f"Unsupported document type: {document_type}")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        prompt = self.build_prompt(document_type, profile, university, program, additional_info, **kwargs)
+
+        cache = get_generation_cache()
+        key = self.cache_key(prompt) if cache else None
+        cached = await self._cached(cache, key, regenerate)
+        if cached is not None:
+            return cached
+
+        async with self._slots:
+            start = time.perf_counter()
+            try:
+                response = await self.model.generate_content_async(
+                    prompt, request_options={"timeout": settings.AI_REQUEST_TIMEOUT}
+                )
+                text = response.text
+            except Exception:
+                ai_request_duration.observe(time.perf_counter() - start, document_type, "sync", "error")
+                raise
+        ai_request_duration.observe(time.perf_counter() - start, document_type, "sync", "ok")
+        self._record_usage(document_type, getattr(response, "usage_metadata", None))
+        if cache and text:
+            await cache.set(key, text)
+        return text
+
+    async def stream_document(
+        self,
+        document_type: str,
+        profile: ProfileInDB,
+        university: str,
+        program: str,
+        additional_info: Optional[str] = None,
+        regenerate: bool = False,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Generate a document, yielding text chunks as Gemini produces them
 
+        A cached document is yielded as a single chunk.
+        """
+        prompt = self.build_prompt(document_type, profile, university, program, additional_info, **kwargs)
+
+        cache = get_generation_cache()
+        key = self.cache_key(prompt) if cache else None
+        cached = await self._cached(cache, key, regenerate)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        usage = None
+        async with self._slots:
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await self.model.generate_content_async(
+                    prompt, stream=True, request_options={"timeout": settings.AI_REQUEST_TIMEOUT}
+                )
+                async for chunk in response:
+                    # The final chunk carries the usage totals
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    # Chunks without text parts (e.g. safety metadata) raise on .text
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        parts.append(text)
+                        yield text
+                outcome = "ok"
+            finally:
+                ai_request_duration.observe(time.perf_counter() - start, document_type, "stream", outcome)
+        self._record_usage(document_type, usage)
+
+        if cache and parts:
+            await cache.set(key, "".join(parts))
+
+
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """Get the process-wide AI service (configured once per worker)"""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
@@ -0,0 +1,146 @@
+"""
+Availability service
+Computes bookable consultation slots from a single query over the booking window
+"""
+
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from app.repositories.database import Database
+from app.timeutils import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Working hours (UTC) and days offered for consultations
+WORKDAY_START = time(9, 0)
+WORKDAY_END = time(17, 0)
+WORKING_WEEKDAYS = range(0, 5)
+
+# Duration assumed for bookings stored without one
+DEFAULT_BOOKING_MINUTES = 30
+
+# How far before the window to look for bookings that run into it
+BOOKING_LOOKBACK = timedelta(hours=12)
+
+
+class IntervalIndex:
+    """
+    Booked intervals for one counsellor
+
+    Intervals are merged into a sorted, non-overlapping list, so an overlap
+    check is a single binary search.
+    """
+
+    def __init__(self, intervals: List[Tuple[float, float]]):
+        merged: List[List[float]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def overlaps(self, start: float, end: float) -> bool:
+        """Whether [start, end) intersects any booked interval"""
+        # Last interval starting before `end` is the only candidate
+        position = bisect_left(self.starts, end) - 1
+        return position >= 0 and self.ends[position] > start
+
+
+class AvailabilityService:
+    """Consultation slot availability"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def _load_bookings(
+        self,
+        window_start: datetime,
+        window_end: datetime,
+        counsellor_id: Optional[str] = None
+    ) -> Dict[str, IntervalIndex]:
+        """Fetch every active booking in the window and index it by counsellor"""
+        bookings = await self.db.consultations.find_scheduled_between(
+            (window_start - BOOKING_LOOKBACK).isoformat(),
+            window_end.isoformat(),
+            counsellor_id=counsellor_id
+        )
+
+        intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for booking in bookings:
+            if not booking.get("counsellor_id") or not booking.get("scheduled_at"):
+                continue
+            try:
+                start = parse_timestamp(booking["scheduled_at"]).timestamp()
+            except ValueError:
+                logger.warning(f"Skipping consultation with bad scheduled_at: {booking['scheduled_at']}")
+                continue
+            minutes = booking.get("duration_minutes") or DEFAULT_BOOKING_MINUTES
+            intervals.setdefault(str(booking["counsellor_id"]), []).append((start, start + minutes * 60))
+
+        return {cid: IntervalIndex(spans) for cid, spans in intervals.items()}
+
+    async def get_slots(
+        self,
+        start_date: Optional[date] = None,
+        days: int = 30,
+        duration_minutes: int = 60,
+        counsellor_id: Optional[str] = None,
+        available_only: bool = False,
+        offset: int = 0,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        List consultation slots over a window of days
+
+        Slots start every duration_minutes within working hours on weekdays;
+        a slot is unavailable if it overlaps any non-cancelled booking of its
+        counsellor. Slots already in the past are skipped. Results are ordered
+        by time, then counsellor, and paginated with offset/limit.
+        """
+        now = datetime.now(timezone.utc)
+        first_day = start_date or now.date()
+        window_start = datetime.combine(first_day, WORKDAY_START, tzinfo=timezone.utc)
+        window_end = datetime.combine(first_day + timedelta(days=days), time(0), tzinfo=timezone.utc)
+
+        filters = {"id": counsellor_id} if counsellor_id else {}
+        counsellors = await self.db.users.find("id", role="counsellor", **filters)
+        counsellor_ids = sorted(str(c["id"]) for c in counsellors)
+
+        if not counsellor_ids:
+            return {"slots": [], "total": 0, "next_offset": None}
+
+        booked = await self._load_bookings(window_start, window_end, counsellor_id)
+        empty = IntervalIndex([])
+        step = timedelta(minutes=duration_minutes)
+
+        slots = []
+        for day_offset in range(days):
+            current_date = first_day + timedelta(days=day_offset)
+            if current_date.weekday() not in WORKING_WEEKDAYS:
+                continue
+
+            slot_start = datetime.combine(current_date, WORKDAY_START, tzinfo=timezone.utc)
+            day_end = datetime.combine(current_date, WORKDAY_END, tzinfo=timezone.utc)
+            while slot_start + step <= day_end:
+                if slot_start >= now:
+                    start_ts = slot_start.timestamp()
+                    end_ts = start_ts + duration_minutes * 60
+                    for cid in counsellor_ids:
+                        available = not booked.get(cid, empty).overlaps(start_ts, end_ts)
+                        if available or not available_only:
+                            slots.append({
+                                "date": slot_start.replace(tzinfo=None).isoformat(),
+                                "time": slot_start.strftime("%H:%M"),
+                                "counsellorId": cid,
+                                "durationMinutes": duration_minutes,
+                                "available": available
+                            })
+                slot_start += step
+
+        page = slots[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(slots) else None
+        return {"slots": page, "total": len(slots), "next_offset": next_offset}
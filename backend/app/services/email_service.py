@@ -1,25 +1,244 @@
 """
 Email notification service
-Handles sending emails via SendGrid
+Sends templated emails through the SendGrid v3 API, many recipients per request
 """
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
-from typing import List, Optional
+from abc import ABC, abstractmethod
+from html import escape
+from string import Template
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import asyncio
 import logging
+import time
+
+import httpx
 
 from app.config import settings
+from app.metrics import email_recipients, email_send_duration
+from app.models.email import EmailBatchFailure, EmailBatchResult
 
 logger = logging.getLogger(__name__)
 
+# SendGrid accepts at most this many personalizations (recipients) per request
+MAX_PERSONALIZATIONS = 1000
+
+_LAYOUT = """
+        <html>
+            <body>
+                {body}
+                <br>
+                <p>Best regards,<br>The AJ NOVA Team</p>
+            </body>
+        </html>
+        """
+
+
+class SafeHtml(str):
+    """Markup inserted into a template as is; every other value is escaped"""
+
+
+def link(url: str, label: str) -> SafeHtml:
+    """A paragraph holding one link"""
+    return SafeHtml(f'<p><a href="{escape(url)}">{escape(label)}</a></p>')
+
+
+class EmailTemplate:
+    """
+    Subject and HTML body compiled once, rendered once per batch
+
+    Fields are written ${field}. Fields in recipient_fields differ per
+    recipient: rendering leaves them as SendGrid substitution tags (-field-),
+    filled in by SendGrid for each personalization, so a whole batch shares
+    one rendered body. Recipient fields may only appear in the body.
+    """
+
+    def __init__(self, name: str, subject: str, html: str, recipient_fields: Sequence[str] = ("name",)):
+        self.name = name
+        self.subject = Template(subject)
+        self.html = Template(_LAYOUT.format(body=html))
+        self.recipient_fields = tuple(recipient_fields)
+
+        if not self.subject.is_valid() or not self.html.is_valid():
+            raise ValueError(f"Email template {name} has malformed ${{...}} fields")
+        if set(self.subject.get_identifiers()) & set(self.recipient_fields):
+            raise ValueError(f"Email template {name} uses recipient fields in its subject")
+        fields = set(self.subject.get_identifiers()) | set(self.html.get_identifiers())
+        self.fields = fields - set(self.recipient_fields)
+
+    def render(self, context: Dict[str, Any]) -> Dict[str, str]:
+        """Subject and HTML for the shared context, with recipient fields left as tags"""
+        missing = self.fields - context.keys()
+        if missing:
+            raise ValueError(f"Email template {self.name} is missing {', '.join(sorted(missing))}")
+        html_values = {key: value if isinstance(value, SafeHtml) else escape(str(value)) for key, value in context.items()}
+        html_values.update({field: f"-{field}-" for field in self.recipient_fields})
+        return {
+            "subject": self.subject.substitute({key: str(value) for key, value in context.items()}),
+            "html": self.html.substitute(html_values),
+        }
+
+    def substitutions(self, recipient: Dict[str, Any]) -> Dict[str, str]:
+        """SendGrid substitutions for one recipient"""
+        return {f"-{field}-": escape(str(recipient.get(field) or "")) for field in self.recipient_fields}
+
+
+class EmailTemplateRegistry:
+    """Templates by name, compiled when registered"""
+
+    def __init__(self):
+        self._templates: Dict[str, EmailTemplate] = {}
+
+    def register(self, name: str, subject: str, html: str, recipient_fields: Sequence[str] = ("name",)) -> EmailTemplate:
+        template = self._templates[name] = EmailTemplate(name, subject, html, recipient_fields)
+        return template
+
+    def get(self, name: str) -> EmailTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"Unknown email template: {name}")
+        return template
+
+
+templates = EmailTemplateRegistry()
+
+templates.register(
+    "welcome",
+    "Welcome to AJ NOVA!",
+    """<h1>Welcome to AJ NOVA, ${name}!</h1>
+                <p>We're excited to help you with your German university admissions journey.</p>
+                <p>Get started by completing your profile to unlock AI-powered document generation and personalized guidance.</p>
+                <p><a href="${frontend_url}/dashboard/profile">Complete Your Profile →</a></p>""",
+)
+templates.register(
+    "document_approved",
+    "Your ${document_type} has been approved!",
+    """<h2>Great news, ${name}!</h2>
+                <p>Your ${document_type} has been reviewed and approved by our counsellors.</p>
+                <p>You can now download the final version from your dashboard.</p>
+                <p><a href="${frontend_url}/dashboard/documents">View Documents →</a></p>""",
+)
+templates.register(
+    "document_needs_revision",
+    "Revision needed for your ${document_type}",
+    """<h2>Hi ${name},</h2>
+                <p>Your ${document_type} has been reviewed and needs some revisions.</p>
+                <p><strong>Counsellor Comments:</strong></p>
+                <p>${comments}</p>
+                <p><a href="${frontend_url}/dashboard/documents">Edit Document →</a></p>""",
+)
+templates.register(
+    "consultation_reminder",
+    "Consultation Reminder - AJ NOVA",
+    """<h2>Hi ${name},</h2>
+                <p>This is a reminder about your upcoming consultation.</p>
+                <p><strong>Scheduled:</strong> ${scheduled_at}</p>
+                ${meeting_info}
+                <p>Please be ready 5 minutes before the scheduled time.</p>""",
+)
+templates.register(
+    "announcement",
+    "${title}",
+    """<h2>Hi ${name},</h2>
+                <p>${message}</p>
+                ${link_info}""",
+)
+
+
+class EmailTransport(ABC):
+    """Delivers SendGrid v3 mail/send payloads"""
+
+    @abstractmethod
+    async def send(self, payload: Dict[str, Any]) -> None:
+        """Send one request; raises on failure"""
+
+    async def close(self) -> None:
+        pass
+
+
+class SendGridTransport(EmailTransport):
+    """SendGrid's HTTP API over one pooled, keep-alive async client per worker"""
+
+    def __init__(self, api_key: str):
+        self.client = httpx.AsyncClient(
+            base_url=settings.SENDGRID_API_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(
+                max_connections=settings.EMAIL_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EMAIL_POOL_MAX_CONNECTIONS,
+            ),
+            timeout=settings.EMAIL_HTTP_TIMEOUT,
+        )
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        response = await self.client.post("/v3/mail/send", json=payload)
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid returned {response.status_code}: {response.text[:200]}")
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class MemoryEmailTransport(EmailTransport):
+    """Records payloads instead of sending them (local development, tests, benchmarks)"""
+
+    def __init__(self):
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        self.sent.append(payload)
+
+
+_transport: Optional[EmailTransport] = None
+
+
+def get_email_transport() -> Optional[EmailTransport]:
+    """The worker's transport for EMAIL_BACKEND, created on first use; None if SendGrid is not configured"""
+    global _transport
+    if _transport is None:
+        if settings.EMAIL_BACKEND == "memory":
+            _transport = MemoryEmailTransport()
+        elif settings.SENDGRID_API_KEY:
+            _transport = SendGridTransport(settings.SENDGRID_API_KEY)
+    return _transport
+
+
+def set_email_transport(transport: Optional[EmailTransport]) -> Optional[EmailTransport]:
+    """Replace the worker's transport (tests); returns the previous one"""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
+async def close_email_transport() -> None:
+    """Close the worker's transport on shutdown"""
+    transport = set_email_transport(None)
+    if transport is not None:
+        await transport.close()
+
 
 class EmailService:
     """Email service for notifications"""
-    
+
     def __init__(self):
-        self.client = SendGridAPIClient(settings.SENDGRID_API_KEY) if settings.SENDGRID_API_KEY else None
         self.from_email = settings.FROM_EMAIL
-    
+
+    @property
+    def transport(self) -> Optional[EmailTransport]:
+        return get_email_transport()
+
+    @property
+    def configured(self) -> bool:
+        return self.transport is not None
+
+    async def _post(self, payload: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.transport.send(payload)
+        except Exception:
+            email_send_duration.observe(time.perf_counter() - start, "error")
+            raise
+        email_send_duration.observe(time.perf_counter() - start, "sent")
+
     async def send_email(
         self,
         to_email: str,
@@ -28,44 +247,107 @@ class EmailService:
         plain_content: Optional[str] = None
     ) -> bool:
         """Send email"""
-        if not self.client:
+        if not self.configured:
             logger.warning("SendGrid not configured, skipping email")
             return False
-        
+
+        content = [{"type": "text/html", "value": html_content}]
+        if plain_content:
+            content.insert(0, {"type": "text/plain", "value": plain_content})
         try:
-            message = Mail(
-                from_email=self.from_email,
-                to_emails=to_email,
-                subject=subject,
-                html_content=html_content,
-                plain_text_content=plain_content or ""
-            )
-            
-            response = self.client.send(message)
-            logger.info(f"Email sent to {to_email}: {response.status_code}")
-            return True
-            
+            await self._post({
+                "personalizations": [{"to": [{"email": to_email}]}],
+                "from": {"email": self.from_email},
+                "subject": subject,
+                "content": content,
+            })
         except Exception as e:
             logger.error(f"Failed to send email to {to_email}: {str(e)}")
             return False
-    
+        logger.info(f"Email sent to {to_email}")
+        return True
+
+    async def send_batch(
+        self,
+        template_name: str,
+        recipients: Iterable[Dict[str, Any]],
+        **context
+    ) -> EmailBatchResult:
+        """
+        Send a template to many recipients
+
+        Recipients are dicts with an email and the template's recipient
+        fields (name), e.g. users rows; duplicate addresses get one email.
+        The template is rendered once, and recipients are sent in requests
+        of up to EMAIL_BATCH_SIZE personalizations, EMAIL_BATCH_CONCURRENCY
+        at a time. Failed requests are reported with their addresses rather
+        than raised.
+        """
+        template = templates.get(template_name)
+        unique: Dict[str, Dict[str, Any]] = {}
+        for recipient in recipients:
+            email = recipient.get("email")
+            if email:
+                unique.setdefault(email.lower(), recipient)
+        batch = list(unique.values())
+        batch_size = max(1, min(settings.EMAIL_BATCH_SIZE, MAX_PERSONALIZATIONS))
+        chunks = [batch[i:i + batch_size] for i in range(0, len(batch), batch_size)]
+        result = EmailBatchResult(recipients=len(batch), sent=0, failed=0, batches=len(chunks))
+        if not batch:
+            return result
+
+        if not self.configured:
+            logger.warning(f"SendGrid not configured, skipping {template_name} email to {len(batch)} recipients")
+            result.failed = len(batch)
+            result.failures = [
+                EmailBatchFailure(batch=index, emails=[r["email"] for r in chunk], error="SendGrid not configured")
+                for index, chunk in enumerate(chunks)
+            ]
+            return result
+
+        rendered = template.render({"frontend_url": settings.FRONTEND_URL, **context})
+        slots = asyncio.Semaphore(settings.EMAIL_BATCH_CONCURRENCY)
+
+        async def send(chunk: List[Dict[str, Any]]) -> None:
+            payload = {
+                "personalizations": [
+                    {
+                        "to": [{"email": r["email"], **({"name": r["name"]} if r.get("name") else {})}],
+                        "substitutions": template.substitutions(r),
+                    }
+                    for r in chunk
+                ],
+                "from": {"email": self.from_email},
+                "subject": rendered["subject"],
+                "content": [{"type": "text/html", "value": rendered["html"]}],
+            }
+            async with slots:
+                await self._post(payload)
+
+        outcomes = await asyncio.gather(*(send(chunk) for chunk in chunks), return_exceptions=True)
+        for index, (chunk, outcome) in enumerate(zip(chunks, outcomes)):
+            if isinstance(outcome, BaseException):
+                result.failed += len(chunk)
+                result.failures.append(
+                    EmailBatchFailure(batch=index, emails=[r["email"] for r in chunk], error=str(outcome))
+                )
+                email_recipients.inc(template_name, "error", amount=len(chunk))
+                logger.error(f"Failed to send {template_name} email to {len(chunk)} recipients: {str(outcome)}")
+            else:
+                result.sent += len(chunk)
+                email_recipients.inc(template_name, "sent", amount=len(chunk))
+        logger.info(f"Sent {template_name} email to {result.sent}/{result.recipients} recipients in {result.batches} requests")
+        return result
+
+    async def send_template(self, template_name: str, to_email: str, name: str, **context) -> bool:
+        """Send a template to one recipient"""
+        result = await self.send_batch(template_name, [{"email": to_email, "name": name}], **context)
+        return result.sent == 1
+
     async def send_welcome_email(self, to_email: str, name: str) -> bool:
         """Send welcome email to new user"""
-        subject = "Welcome to AJ NOVA!"
-        html_content = f"""
-        <html>
-            <body>
-                <h1>Welcome to AJ NOVA, {name}!</h1>
-                <p>We're excited to help you with your German university admissions journey.</p>
-                <p>Get started by completing your profile to unlock AI-powered document generation and personalized guidance.</p>
-                <p><a href="{settings.FRONTEND_URL}/dashboard/profile">Complete Your Profile →</a></p>
-                <br>
-                <p>Best regards,<br>The AJ NOVA Team</p>
-            </body>
-        </html>
-        """
-        return await self.send_email(to_email, subject, html_content)
-    
+        return await self.send_template("welcome", to_email, name)
+
     async def send_document_approved_email(
         self,
         to_email: str,
@@ -73,21 +355,8 @@ class EmailService:
         document_type: str
     ) -> bool:
         """Send document approval notification"""
-        subject = f"Your {document_type.upper()} has been approved!"
-        html_content = f"""
-        <html>
-            <body>
-                <h2>Great news, {name}!</h2>
-                <p>Your {document_type.upper()} has been reviewed and approved by our counsellors.</p>
-                <p>You can now download the final version from your dashboard.</p>
-                <p><a href="{settings.FRONTEND_URL}/dashboard/documents">View Documents →</a></p>
-                <br>
-                <p>Best regards,<br>The AJ NOVA Team</p>
-            </body>
-        </html>
-        """
-        return await self.send_email(to_email, subject, html_content)
-    
+        return await self.send_template("document_approved", to_email, name, document_type=document_type.upper())
+
     async def send_document_needs_revision_email(
         self,
         to_email: str,
@@ -96,22 +365,11 @@ class EmailService:
         comments: str
     ) -> bool:
         """Send document revision request notification"""
-        subject = f"Revision needed for your {document_type.upper()}"
-        html_content = f"""
-        <html>
-            <body>
-                <h2>Hi {name},</h2>
-                <p>Your {document_type.upper()} has been reviewed and needs some revisions.</p>
-                <p><strong>Counsellor Comments:</strong></p>
-                <p>{comments}</p>
-                <p><a href="{settings.FRONTEND_URL}/dashboard/documents">Edit Document →</a></p>
-                <br>
-                <p>Best regards,<br>The AJ NOVA Team</p>
-            </body>
-        </html>
-        """
-        return await self.send_email(to_email, subject, html_content)
-    
+        return await self.send_template(
+            "document_needs_revision", to_email, name,
+            document_type=document_type.upper(), comments=comments
+        )
+
     async def send_consultation_reminder_email(
         self,
         to_email: str,
@@ -120,47 +378,21 @@ class EmailService:
         meeting_link: Optional[str] = None
     ) -> bool:
         """Send consultation reminder"""
-        subject = "Consultation Reminder - AJ NOVA"
-        meeting_info = f'<p><a href="{meeting_link}">Join Meeting →</a></p>' if meeting_link else ""
-        
-        html_content = f"""
-        <html>
-            <body>
-                <h2>Hi {name},</h2>
-                <p>This is a reminder about your upcoming consultation.</p>
-                <p><strong>Scheduled:</strong> {scheduled_at}</p>
-                {meeting_info}
-                <p>Please be ready 5 minutes before the scheduled time.</p>
-                <br>
-                <p>Best regards,<br>The AJ NOVA Team</p>
-            </body>
-        </html>
-        """
-        return await self.send_email(to_email, subject, html_content)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        meeting_info = link(meeting_link, "Join Meeting →") if meeting_link else SafeHtml("")
+        return await self.send_template(
+            "consultation_reminder", to_email, name,
+            scheduled_at=scheduled_at, meeting_info=meeting_info
+        )
 
+    async def send_announcement(
+        self,
+        recipients: Iterable[Dict[str, Any]],
+        title: str,
+        message: str,
+        link_url: Optional[str] = None
+    ) -> EmailBatchResult:
+        """Send one announcement to many recipients"""
+        if link_url and link_url.startswith("/"):
+            link_url = f"{settings.FRONTEND_URL}{link_url}"
+        link_info = link(link_url, "View on AJ NOVA →") if link_url else SafeHtml("")
+        return await self.send_batch("announcement", recipients, title=title, message=message, link_info=link_info)
@@ -0,0 +1,144 @@
+"""
+Generation cache
+Content-addressed on-disk cache of AI generated documents
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCache:
+    """
+    Generated text keyed by a hash of template version, model and prompt
+
+    Prompts are built deterministically from the profile and request, so an
+    identical prompt can be served from disk instead of Gemini. Entries are
+    one file each, written atomically so several workers can share the
+    directory. When the directory grows past max_bytes, the least recently
+    used entries (by mtime, refreshed on every hit) are evicted.
+    """
+
+    SUFFIX = ".txt"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def key(template_version: str, model: str, prompt: str) -> str:
+        """Cache key for a prompt sent to a model"""
+        payload = json.dumps(
+            {"version": template_version, "model": model, "prompt": prompt},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _entries(self) -> list:
+        """(mtime, size, path) of every entry"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return content
+
+    def _write(self, key: str, content: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        data = content.encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under 90% of max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        logger.info(f"Generation cache evicted {removed} entries ({total} bytes kept)")
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached text for a key, or None"""
+        try:
+            return await asyncio.to_thread(self._read, key)
+        except OSError as e:
+            logger.warning(f"Generation cache read failed: {str(e)}")
+            return None
+
+    async def set(self, key: str, content: str) -> None:
+        """Store text for a key; failures are logged, never raised"""
+        try:
+            await asyncio.to_thread(self._write, key, content)
+        except OSError as e:
+            logger.warning(f"Generation cache write failed: {str(e)}")
+
+
+_generation_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Get the process-wide generation cache, or None when disabled"""
+    global _generation_cache
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None
+    if _generation_cache is None:
+        _generation_cache = GenerationCache(
+            settings.GENERATION_CACHE_DIR, settings.GENERATION_CACHE_MAX_BYTES
+        )
+    return _generation_cache
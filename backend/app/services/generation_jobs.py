@@ -0,0 +1,326 @@
+"""
+Generation job queue
+Runs AI document generation in the background so requests return a job id immediately
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+import logging
+
+from google.api_core import exceptions as google_exceptions
+
+from app.config import settings
+from app.database import get_database, SERVICE
+from app.models.document import DocumentGenerateRequest
+from app.models.profile import ProfileInDB
+from app.repositories.database import Database
+from app.services.ai_service import get_ai_service
+
+logger = logging.getLogger(__name__)
+
+# Gemini failures worth retrying (quota, overload, timeouts)
+TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class QueueFullError(Exception):
+    """Raised when the generation queue is at capacity"""
+
+
+def _now(delta: float = 0.0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=delta)).isoformat()
+
+
+class JobStore(ABC):
+    """Persistence for generation jobs"""
+
+    @abstractmethod
+    async def create(self, job: Dict[str, Any]) -> None:
+        """Insert a new job row"""
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields) -> None:
+        """Update the given fields of a job"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job row, or None if it does not exist"""
+
+    @abstractmethod
+    async def fail_stale(self, before: str, error: str) -> int:
+        """Fail queued or running jobs not updated since before; returns how many"""
+
+
+class SupabaseJobStore(JobStore):
+    """Jobs kept in the generation_jobs table (see migration 006)"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        await self.db.generation_jobs.insert(job)
+
+    async def update(self, job_id: str, **fields) -> None:
+        await self.db.generation_jobs.update(fields, id=job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.generation_jobs.get(job_id)
+
+    async def fail_stale(self, before: str, error: str) -> int:
+        return len(await self.db.generation_jobs.fail_stale(before, error, _now()))
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs kept in a local SQLite file, for development without the migration"""
+
+    COLUMNS = (
+        "id", "student_id", "request", "status", "attempts", "error", "document_id",
+        "created_at", "updated_at", "started_at", "finished_at"
+    )
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_jobs ("
+                "id TEXT PRIMARY KEY, student_id TEXT, request TEXT NOT NULL, status TEXT DEFAULT 'queued', "
+                "attempts INTEGER DEFAULT 0, error TEXT, document_id TEXT, created_at TEXT, updated_at TEXT, "
+                "started_at TEXT, finished_at TEXT)"
+            )
+            self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        row = {**job, "request": json.dumps(job["request"]), "updated_at": job.get("created_at")}
+        columns = [c for c in self.COLUMNS if c in row]
+        sql = f"INSERT INTO generation_jobs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        await asyncio.to_thread(self._execute, sql, tuple(row[c] for c in columns))
+
+    async def update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        sql = f"UPDATE generation_jobs SET {assignments} WHERE id = ?"
+        await asyncio.to_thread(self._execute, sql, (*fields.values(), job_id))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(self._execute, "SELECT * FROM generation_jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(rows[0])
+        job["request"] = json.loads(job["request"])
+        return job
+
+    async def fail_stale(self, before: str, error: str) -> int:
+        now = _now()
+        rows = await asyncio.to_thread(
+            self._execute,
+            "UPDATE generation_jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? "
+            "WHERE status IN ('queued', 'running') AND updated_at < ? RETURNING id",
+            (error, now, now, before)
+        )
+        return len(rows)
+
+
+class GenerationJobQueue:
+    """
+    In-process worker pool for AI document generation
+
+    Jobs are persisted through a JobStore and executed by a fixed number of
+    asyncio workers per process. The in-memory queue is bounded; submit()
+    raises QueueFullError rather than letting work pile up. Transient Gemini
+    errors are retried with exponential backoff and jitter. Jobs still queued
+    or running when the process shuts down are marked failed. A process that
+    crashes cannot do that, so on start the queue also fails jobs that have
+    sat queued or running for GENERATION_JOB_STALE_AFTER seconds.
+    """
+
+    def __init__(self):
+        self._store: Optional[JobStore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._sweep: Optional[asyncio.Task] = None
+        # Jobs submitted here and not finished, including the ones running
+        self._pending: Dict[str, Any] = {}
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            if settings.GENERATION_JOB_STORE == "sqlite":
+                self._store = SQLiteJobStore(settings.GENERATION_JOB_SQLITE_PATH)
+            else:
+                self._store = SupabaseJobStore(get_database(SERVICE))
+        return self._store
+
+    def start(self) -> None:
+        """Start the worker pool"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.GENERATION_QUEUE_MAX_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(n)) for n in range(settings.GENERATION_WORKERS)
+        ]
+        self._sweep = asyncio.create_task(self._fail_stale())
+        logger.info(f"Generation queue started with {len(self._workers)} workers")
+
+    async def stop(self) -> None:
+        """Stop the workers and fail any job that will not run or finish"""
+        tasks = [*self._workers, self._sweep] if self._sweep else self._workers
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sweep = None
+
+        for job_id in list(self._pending):
+            try:
+                await self.store.update(job_id, status="failed", error="Server restarted before the job finished", finished_at=_now())
+            except Exception as e:
+                logger.error(f"Failed to mark generation job {job_id} as failed: {str(e)}")
+        self._pending.clear()
+
+    async def submit(
+        self,
+        db: Database,
+        student_id: str,
+        profile: ProfileInDB,
+        request: DocumentGenerateRequest
+    ) -> Dict[str, Any]:
+        """Persist a job and queue it; raises QueueFullError at capacity"""
+        if self._queue is None:
+            self.start()
+        if self._queue.full():
+            raise QueueFullError("Generation queue is full")
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "student_id": str(student_id),
+            "request": request.model_dump(),
+            "status": "queued",
+            "attempts": 0,
+            "created_at": _now(),
+        }
+        await self.store.create(job)
+
+        self._pending[job["id"]] = (db, profile, request)
+        try:
+            self._queue.put_nowait(job["id"])
+        except asyncio.QueueFull:
+            self._pending.pop(job["id"], None)
+            await self.store.update(job["id"], status="failed", error="Generation queue is full", finished_at=_now())
+            raise QueueFullError("Generation queue is full")
+
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's current state"""
+        return await self.store.get(job_id)
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            # Cancellation by stop() propagates past this block, leaving the
+            # job in _pending so that stop() marks it failed
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Generation worker {number} crashed on job {job_id}: {str(e)}")
+                # Never leave the job running, or clients polling it would wait forever
+                try:
+                    await self._fail(job_id, 0, e, "Generation job failed")
+                except Exception as store_error:
+                    logger.error(f"Failed to mark generation job {job_id} as failed: {str(store_error)}")
+            self._pending.pop(job_id, None)
+            self._queue.task_done()
+
+    async def _fail_stale(self) -> None:
+        # Jobs left queued or running by a process that died without stop()
+        try:
+            count = await self.store.fail_stale(
+                _now(-settings.GENERATION_JOB_STALE_AFTER), "Server restarted before the job finished"
+            )
+        except Exception as e:
+            logger.error(f"Failed to sweep stale generation jobs: {str(e)}")
+            return
+        if count:
+            logger.warning(f"Marked {count} stale generation job(s) as failed")
+
+    async def _run(self, job_id: str) -> None:
+        db, profile, request = self._pending[job_id]
+        await self.store.update(job_id, status="running", started_at=_now())
+
+        ai_service = get_ai_service()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                content = await ai_service.generate_document(
+                    document_type=request.type,
+                    profile=profile,
+                    university=request.university,
+                    program=request.program,
+                    additional_info=request.additional_info,
+                    regenerate=request.regenerate
+                )
+                break
+            except TRANSIENT_ERRORS as e:
+                if attempts >= settings.GENERATION_MAX_ATTEMPTS:
+                    await self._fail(job_id, attempts, e)
+                    return
+                delay = settings.GENERATION_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"Generation job {job_id} attempt {attempts} failed ({str(e)}), retrying in {delay:.1f}s")
+                await self.store.update(job_id, attempts=attempts, error=str(e))
+                await asyncio.sleep(delay)
+            except Exception as e:
+                await self._fail(job_id, attempts, e)
+                return
+
+        try:
+            document = await db.documents.create_draft(
+                profile.user_id, request.type, f"{request.type.upper()} - {request.university}", content
+            )
+            await self.store.update(
+                job_id,
+                status="succeeded",
+                attempts=attempts,
+                error=None,
+                document_id=document["id"],
+                finished_at=_now()
+            )
+        except Exception as e:
+            await self._fail(job_id, attempts, e, "Saving the generated document failed")
+
+    async def _fail(self, job_id: str, attempts: int, error: Exception, reason: str = "AI generation failed") -> None:
+        logger.error(f"Generation job {job_id} failed after {attempts} attempt(s): {str(error)}")
+        fields = {"attempts": attempts} if attempts else {}
+        await self.store.update(
+            job_id,
+            status="failed",
+            error=f"{reason}: {str(error)}",
+            finished_at=_now(),
+            **fields
+        )
+
+
+# Global queue instance (one per worker process)
+generation_queue = GenerationJobQueue()
@@ -1,21 +1,49 @@
 """
 Notification service
-Creates notifications in database for real-time delivery via Supabase
+Creates notifications in database and pushes them to clients' event streams
 """
 
-from supabase import Client
-from typing import Optional
+from typing import Iterable, List, Optional, Union
 from uuid import UUID
+import asyncio
 import logging
 
+from app.cache import TTLCache
+from app.config import settings
+from app.models.notification import NotificationBulkResult, NotificationChunkFailure
+from app.realtime import realtime_hub
+from app.repositories.database import Database
+
 logger = logging.getLogger(__name__)
 
+# Unread notification counts (per worker). Writes through this worker drop the
+# entry; the TTL bounds how stale a count changed elsewhere can be.
+unread_cache = TTLCache(
+    maxsize=settings.NOTIFICATION_UNREAD_CACHE_MAX_SIZE,
+    ttl=settings.NOTIFICATION_UNREAD_CACHE_TTL
+)
+
+
+async def get_unread_count(db: Database, user_id: Union[str, UUID]) -> int:
+    """Get a user's unread notification count from the cache or notification_counters"""
+    key = str(user_id)
+    count = unread_cache.get(key)
+    if count is None:
+        count = await db.notification_counters.get_unread(key)
+        unread_cache.set(key, count)
+    return count
+
+
+def invalidate_unread_count(user_id: Union[str, UUID]) -> None:
+    """Drop a user's cached unread count after their notifications change"""
+    unread_cache.invalidate(str(user_id))
+
 
 class NotificationService:
     """Notification service"""
     
-    def __init__(self, supabase: Client):
-        self.supabase = supabase
+    def __init__(self, db: Database):
+        self.db = db
     
     async def create_notification(
         self,
@@ -24,11 +52,15 @@ class NotificationService:
         title: str,
         message: str,
         link: Optional[str] = None,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        dedup_key: Optional[str] = None
     ) -> dict:
         """
-        Create notification in database
-        Supabase Realtime will automatically broadcast to subscribed clients
+        Create notification in database and push it to the user's open event streams
+
+        With a dedup_key (set by the outbox dispatcher), a notification that
+        already exists under that key is returned instead of created again,
+        and is not pushed a second time.
         """
         try:
             notification_data = {
@@ -41,18 +73,88 @@ class NotificationService:
                 "is_read": False
             }
             
-            response = self.supabase.table("notifications").insert(notification_data).execute()
-            return response.data[0] if response.data else None
+            if dedup_key:
+                row = await self.db.notifications.insert_once({**notification_data, "dedup_key": dedup_key})
+                if row is None:
+                    # Created by an earlier delivery attempt (the user may since have deleted it)
+                    existing = await self.db.notifications.find_one(dedup_key=dedup_key)
+                    return existing or {**notification_data, "dedup_key": dedup_key}
+                created = [row]
+            else:
+                created = await self.db.notifications.insert(notification_data)
+            invalidate_unread_count(user_id)
+            if created:
+                # Pushed to the user's open streams on every worker
+                await realtime_hub.publish(user_id, "notification", created[0])
+            return created[0] if created else None
             
         except Exception as e:
             logger.error(f"Failed to create notification: {str(e)}")
             return None
     
+    async def create_bulk(
+        self,
+        user_ids: Iterable[Union[str, UUID]],
+        notification_type: str,
+        title: str,
+        message: str,
+        link: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> NotificationBulkResult:
+        """
+        Create the same notification for many users
+
+        Recipients are de-duplicated and split into multi-row inserts of
+        NOTIFICATION_BULK_BATCH_SIZE, at most NOTIFICATION_BULK_CONCURRENCY
+        in flight. A failed chunk does not stop the others; it is reported
+        with its recipients so they can be retried.
+        """
+        recipients = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        size = settings.NOTIFICATION_BULK_BATCH_SIZE
+        chunks = [recipients[i:i + size] for i in range(0, len(recipients), size)]
+        slots = asyncio.Semaphore(settings.NOTIFICATION_BULK_CONCURRENCY)
+
+        async def insert(chunk: List[str]) -> List[dict]:
+            async with slots:
+                created = await self.db.notifications.insert([
+                    {
+                        "user_id": user_id,
+                        "type": notification_type,
+                        "title": title,
+                        "message": message,
+                        "link": link,
+                        "metadata": metadata or {},
+                        "is_read": False
+                    }
+                    for user_id in chunk
+                ])
+            for user_id in chunk:
+                invalidate_unread_count(user_id)
+            await realtime_hub.publish_many([(row["user_id"], "notification", row) for row in created])
+            return created
+
+        outcomes = await asyncio.gather(*(insert(chunk) for chunk in chunks), return_exceptions=True)
+
+        failures = []
+        for index, (chunk, outcome) in enumerate(zip(chunks, outcomes)):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Failed to create notifications (chunk {index}, {len(chunk)} users): {str(outcome)}")
+                failures.append(NotificationChunkFailure(chunk=index, user_ids=chunk, error=str(outcome)))
+
+        return NotificationBulkResult(
+            recipients=len(recipients),
+            created=sum(len(outcome) for outcome in outcomes if not isinstance(outcome, BaseException)),
+            failed=sum(len(failure.user_ids) for failure in failures),
+            chunks=len(chunks),
+            failures=failures
+        )
+
     async def notify_document_approved(
         self,
         user_id: UUID,
         document_type: str,
-        document_id: UUID
+        document_id: UUID,
+        dedup_key: Optional[str] = None
     ):
         """Notify user that document was approved"""
         return await self.create_notification(
@@ -60,14 +162,16 @@ class NotificationService:
             notification_type="document_approved",
             title="Document Approved",
             message=f"Your {document_type.upper()} has been approved!",
-            link=f"/dashboard/documents/{document_id}"
+            link=f"/dashboard/documents/{document_id}",
+            dedup_key=dedup_key
         )
     
     async def notify_document_needs_revision(
         self,
         user_id: UUID,
         document_type: str,
-        document_id: UUID
+        document_id: UUID,
+        dedup_key: Optional[str] = None
     ):
         """Notify user that document needs revision"""
         return await self.create_notification(
@@ -75,14 +179,16 @@ class NotificationService:
             notification_type="document_revision",
             title="Revision Needed",
             message=f"Your {document_type.upper()} needs some revisions",
-            link=f"/dashboard/documents/{document_id}"
+            link=f"/dashboard/documents/{document_id}",
+            dedup_key=dedup_key
         )
     
     async def notify_new_message(
         self,
         user_id: UUID,
         sender_name: str,
-        message_id: UUID
+        message_id: UUID,
+        dedup_key: Optional[str] = None
     ):
         """Notify user of new message"""
         return await self.create_notification(
@@ -90,14 +196,16 @@ class NotificationService:
             notification_type="new_message",
             title="New Message",
             message=f"New message from {sender_name}",
-            link=f"/dashboard/messages/{message_id}"
+            link=f"/dashboard/messages/{message_id}",
+            dedup_key=dedup_key
         )
     
     async def notify_consultation_scheduled(
         self,
         user_id: UUID,
         scheduled_at: str,
-        consultation_id: UUID
+        consultation_id: UUID,
+        dedup_key: Optional[str] = None
     ):
         """Notify user of scheduled consultation"""
         return await self.create_notification(
@@ -105,7 +213,8 @@ class NotificationService:
             notification_type="consultation_scheduled",
             title="Consultation Scheduled",
             message=f"Your consultation is scheduled for {scheduled_at}",
-            link=f"/dashboard/consultations/{consultation_id}"
+            link=f"/dashboard/consultations/{consultation_id}",
+            dedup_key=dedup_key
         )
     
     async def notify_application_update(
@@ -113,7 +222,8 @@ class NotificationService:
         user_id: UUID,
         university: str,
         status: str,
-        application_id: UUID
+        application_id: UUID,
+        dedup_key: Optional[str] = None
     ):
         """Notify user of application status update"""
         return await self.create_notification(
@@ -121,7 +231,8 @@ class NotificationService:
             notification_type="application_update",
             title="Application Update",
             message=f"Your application to {university} is now {status}",
-            link=f"/dashboard/applications/{application_id}"
+            link=f"/dashboard/applications/{application_id}",
+            dedup_key=dedup_key
         )
 
 
@@ -0,0 +1,240 @@
+"""
+Outbox
+Notifications and emails queued by request handlers and delivered in the background
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+from uuid import UUID
+import logging
+
+from app.config import settings
+from app.database import get_database, SERVICE
+from app.metrics import outbox_deliveries
+from app.repositories.database import Database
+from app.services.email_service import EmailService
+from app.services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION = "notification"
+EMAIL = "email"
+
+
+class PermanentDeliveryError(Exception):
+    """Raised for entries that cannot succeed on retry"""
+
+
+def _timestamp(delta: float = 0.0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=delta)).isoformat()
+
+
+def _json(value: Any) -> Any:
+    return str(value) if isinstance(value, UUID) else value
+
+
+def notification_entry(method: str, dedup_key: str, **kwargs) -> Dict[str, Any]:
+    """Outbox entry calling NotificationService.<method>(**kwargs)"""
+    return {
+        "kind": NOTIFICATION,
+        "method": method,
+        "payload": {name: _json(value) for name, value in kwargs.items()},
+        "dedup_key": dedup_key,
+    }
+
+
+def email_entry(method: str, user_id: Union[str, UUID], dedup_key: str, **kwargs) -> Dict[str, Any]:
+    """Outbox entry calling EmailService.<method>(email, name, **kwargs) for the user"""
+    return {
+        "kind": EMAIL,
+        "method": method,
+        "payload": {"user_id": str(user_id), **{name: _json(value) for name, value in kwargs.items()}},
+        "dedup_key": dedup_key,
+    }
+
+
+class OutboxDispatcher:
+    """
+    Background loop draining the outbox in each worker
+
+    Request handlers call enqueue(), a single insert; entries whose
+    dedup_key is already queued or sent are skipped. The loop claims due
+    entries in batches of OUTBOX_BATCH_SIZE under a lease, delivers them
+    concurrently (at most OUTBOX_CONCURRENCY at a time) and retries failures
+    with exponential backoff and jitter until OUTBOX_MAX_ATTEMPTS. Entries
+    leased by a worker that died become due again when the lease expires,
+    so delivery is at least once. Notifications are created under the
+    entry's dedup_key, so delivering an entry again does not notify twice;
+    emails have no such guard and can be sent twice.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._db: Optional[Database] = None
+        self._email: Optional[EmailService] = None
+        self._last_prune = 0.0
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_database(SERVICE)
+        return self._db
+
+    @property
+    def email(self) -> EmailService:
+        if self._email is None:
+            self._email = EmailService()
+        return self._email
+
+    async def enqueue(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Queue entries for delivery
+
+        Raises if the insert fails, so the calling request fails instead of
+        losing the notification silently. Entries carry dedup keys, so a
+        client retrying the request cannot queue them twice.
+        """
+        if not entries:
+            return
+        now = _timestamp()
+        rows = [{**entry, "status": "pending", "attempts": 0, "available_at": now} for entry in entries]
+        try:
+            await self.db.outbox.enqueue(rows)
+        except Exception as e:
+            logger.error(f"Failed to enqueue {len(rows)} outbox entries: {str(e)}")
+            raise
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> None:
+        """Start the dispatch loop (OUTBOX_ENABLED=false leaves entries for other workers)"""
+        if not settings.OUTBOX_ENABLED or self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Outbox dispatcher started")
+
+    async def stop(self) -> None:
+        """Cancel the dispatch loop; leased entries are retried once their lease expires"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wake = None
+
+    async def _run(self) -> None:
+        while True:
+            claimed = 0
+            try:
+                claimed = await self.dispatch()
+                await self._prune()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+            if claimed >= settings.OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def dispatch(self) -> int:
+        """Claim and deliver one batch; returns how many entries were claimed"""
+        entries = await self.db.outbox.claim(
+            settings.OUTBOX_BATCH_SIZE, _timestamp(), _timestamp(settings.OUTBOX_LEASE_SECONDS)
+        )
+        if not entries:
+            return 0
+
+        slots = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+
+        async def deliver(entry: Dict[str, Any]) -> None:
+            async with slots:
+                await self._deliver(entry)
+
+        outcomes = await asyncio.gather(*(deliver(entry) for entry in entries), return_exceptions=True)
+
+        sent, failed = [], []
+        for entry, outcome in zip(entries, outcomes):
+            if isinstance(outcome, BaseException):
+                failed.append((entry, outcome))
+            else:
+                sent.append(entry["id"])
+                outbox_deliveries.inc(entry["kind"], "sent")
+        await self._record_failures(failed)
+        await self.db.outbox.mark_sent(sent, _timestamp())
+        return len(entries)
+
+    async def _deliver(self, entry: Dict[str, Any]) -> None:
+        method, payload = entry["method"], dict(entry.get("payload") or {})
+
+        if entry["kind"] == NOTIFICATION:
+            if not method.startswith("notify_") and method != "create_notification":
+                raise PermanentDeliveryError(f"Unknown notification method {method}")
+            handler = getattr(NotificationService(self.db), method, None)
+            if handler is None:
+                raise PermanentDeliveryError(f"Unknown notification method {method}")
+            if await handler(**payload, dedup_key=entry["dedup_key"]) is None:
+                raise RuntimeError("Notification insert failed")
+            return
+
+        if entry["kind"] == EMAIL:
+            handler = getattr(self.email, method, None) if method.startswith("send_") else None
+            if handler is None:
+                raise PermanentDeliveryError(f"Unknown email method {method}")
+            if not self.email.configured:
+                raise PermanentDeliveryError("SendGrid not configured")
+            user = await self.db.users.get(payload.pop("user_id"), "email, name")
+            if not user or not user.get("email"):
+                raise PermanentDeliveryError("Recipient not found")
+            if not await handler(user["email"], user.get("name") or "there", **payload):
+                raise RuntimeError("Email send failed")
+            return
+
+        raise PermanentDeliveryError(f"Unknown outbox kind {entry['kind']}")
+
+    def _failure(self, entry: Dict[str, Any], error: BaseException) -> Dict[str, Any]:
+        """The entry as it should be stored after a failed attempt"""
+        attempts = (entry.get("attempts") or 0) + 1
+        # A payload that doesn't fit the method's signature won't on retry either
+        permanent = isinstance(error, (PermanentDeliveryError, TypeError))
+        fields: Dict[str, Any] = {"attempts": attempts, "last_error": str(error)}
+        if permanent or attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            fields["status"] = "failed"
+            outbox_deliveries.inc(entry["kind"], "failed")
+            logger.error(f"Outbox entry {entry['dedup_key']} failed after {attempts} attempts: {str(error)}")
+        else:
+            delay = settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            delay += random.uniform(0, delay / 2)
+            fields.update(status="pending", available_at=_timestamp(delay))
+            outbox_deliveries.inc(entry["kind"], "retried")
+            logger.warning(f"Outbox entry {entry['dedup_key']} attempt {attempts} failed ({str(error)}), retrying in {delay:.1f}s")
+        return {**entry, **fields}
+
+    async def _record_failures(self, failed: List[Tuple[Dict[str, Any], BaseException]]) -> None:
+        if not failed:
+            return
+        try:
+            await self.db.outbox.record_failures([self._failure(entry, error) for entry, error in failed])
+        except Exception as e:
+            # The entries stay leased and are retried once the lease expires
+            logger.error(f"Failed to record {len(failed)} outbox failures: {str(e)}")
+
+    async def _prune(self) -> None:
+        # At most hourly per worker
+        now = asyncio.get_running_loop().time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        await self.db.outbox.prune_sent(_timestamp(-settings.OUTBOX_RETENTION_DAYS * 86400))
+
+
+# Global dispatcher instance (one per worker process)
+outbox = OutboxDispatcher()
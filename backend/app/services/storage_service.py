@@ -4,6 +4,7 @@ Handles file uploads to Supabase Storage
 """
 
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from supabase import Client
 from typing import Optional
 import uuid
@@ -61,15 +62,17 @@ class StorageService:
         file_path = f"{user_id}/{category}/{unique_filename}"
         
         try:
-            # Upload to Supabase Storage
-            response = self.supabase.storage.from_(self.bucket_name).upload(
+            # Upload to Supabase Storage (sync client, kept off the event loop)
+            bucket = self.supabase.storage.from_(self.bucket_name)
+            response = await run_in_threadpool(
+                bucket.upload,
                 path=file_path,
                 file=file_content,
                 file_options={"content-type": file.content_type}
             )
             
             # Get public URL
-            file_url = self.supabase.storage.from_(self.bucket_name).get_public_url(file_path)
+            file_url = bucket.get_public_url(file_path)
             
             return {
                 "file_url": file_url,
@@ -86,7 +89,8 @@ class StorageService:
     async def delete_file(self, file_path: str) -> bool:
         """Delete file from storage"""
         try:
-            self.supabase.storage.from_(self.bucket_name).remove([file_path])
+            bucket = self.supabase.storage.from_(self.bucket_name)
+            await run_in_threadpool(bucket.remove, [file_path])
             return True
         except Exception as e:
             logger.error(f"File deletion failed: {str(e)}")
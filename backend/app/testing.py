@@ -0,0 +1,102 @@
+"""
+Test helpers
+pytest fixtures for asserting how many database round trips an endpoint makes,
+and for capturing the emails it sends
+
+Enable them from a conftest.py with:
+    pytest_plugins = ["app.testing"]
+"""
+
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from app.config import settings
+from app.metrics import RequestStats, current_request, request_observers
+from app.services.email_service import MemoryEmailTransport, set_email_transport
+
+
+def _describe(stats: RequestStats) -> str:
+    shapes = sorted(stats.db_shapes.items(), key=lambda item: item[1], reverse=True)
+    return "; ".join(f"{count}x {shape}" for shape, count in shapes[:5])
+
+
+class QueryRecorder:
+    """
+    Database round trips of every HTTP request served while recording
+
+    Requests are observed through MetricsMiddleware, so this works with
+    TestClient even though the app runs on another thread.
+    """
+
+    def __init__(self):
+        self.requests: List[Tuple[str, str, RequestStats]] = []
+
+    def _observe(self, method: str, route: str, stats: RequestStats) -> None:
+        self.requests.append((method, route, stats))
+
+    def __enter__(self) -> "QueryRecorder":
+        request_observers.append(self._observe)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        request_observers.remove(self._observe)
+
+    def stats_for(self, method: str, route: str) -> List[RequestStats]:
+        """Stats of every recorded request to a route template, e.g. ("GET", "/api/v1/admin/students")"""
+        return [stats for m, r, stats in self.requests if m == method.upper() and r == route]
+
+    def count(self, method: str, route: str) -> int:
+        """Database round trips of the latest request to a route"""
+        matching = self.stats_for(method, route)
+        assert matching, f"No {method} {route} request was recorded"
+        return matching[-1].db_requests
+
+    def assert_max_queries(self, method: str, route: str, limit: int) -> None:
+        """Fail if any recorded request to the route made more than limit round trips"""
+        matching = self.stats_for(method, route)
+        assert matching, f"No {method} {route} request was recorded"
+        worst = max(matching, key=lambda stats: stats.db_requests)
+        assert worst.db_requests <= limit, (
+            f"{method} {route} made {worst.db_requests} database requests (max {limit}): {_describe(worst)}"
+        )
+
+    def assert_no_n_plus_one(self, threshold: Optional[int] = None) -> None:
+        """Fail if any recorded request repeated one query shape threshold times"""
+        threshold = threshold or settings.QUERY_N_PLUS_ONE_THRESHOLD
+        for method, route, stats in self.requests:
+            repeated = stats.repeated_shapes(threshold)
+            assert not repeated, f"Suspected N+1 on {method} {route}: {repeated[0][1]}x {repeated[0][0]}"
+
+
+@contextlib.contextmanager
+def assert_max_queries(limit: int) -> Iterator[RequestStats]:
+    """Fail if the code in the block (awaited directly, not over HTTP) makes more than limit round trips"""
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request.reset(token)
+    assert stats.db_requests <= limit, (
+        f"Made {stats.db_requests} database requests (max {limit}): {_describe(stats)}"
+    )
+
+
+@pytest.fixture
+def query_recorder() -> Iterator[QueryRecorder]:
+    """Record database round trips per request for the duration of a test"""
+    with QueryRecorder() as recorder:
+        yield recorder
+
+
+@pytest.fixture
+def sent_emails() -> Iterator[List[Dict[str, Any]]]:
+    """SendGrid request payloads recorded instead of sent for the duration of a test"""
+    transport = MemoryEmailTransport()
+    previous = set_email_transport(transport)
+    try:
+        yield transport.sent
+    finally:
+        set_email_transport(previous)
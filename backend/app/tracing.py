@@ -0,0 +1,119 @@
+"""
+Debug tracing
+Leveled per-module tracing that costs nothing when disabled
+"""
+
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+# Trace records go only to the queue handler installed by tracing.start()
+trace_logger = logging.getLogger("app.trace")
+trace_logger.propagate = False
+trace_logger.setLevel(logging.DEBUG)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue the record as-is; formatting happens on the listener thread
+
+    The message is not merged with its args before queueing, so arguments
+    must not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _noop(msg: str, *args: Any, exc_info: Any = None) -> None:
+    pass
+
+
+def _resolve_level(name: str) -> int:
+    """Level for a module: longest matching dotted prefix in TRACE_LEVELS, else TRACE_LEVEL"""
+    levels: Dict[str, str] = settings.TRACE_LEVELS
+    parts = name.split(".")
+    for end in range(len(parts), 0, -1):
+        level = levels.get(".".join(parts[:end]))
+        if level:
+            return logging.getLevelName(level.upper())
+    return logging.getLevelName(settings.TRACE_LEVEL.upper())
+
+
+class Tracer:
+    """
+    Tracing for one module
+
+    debug/info/warning/error are bound once, when the tracer is created:
+    levels below the module's threshold are a shared no-op function, so a
+    disabled call costs one function call and never formats its message.
+    Use %-style args rather than f-strings to keep formatting lazy; guard
+    genuinely expensive arguments with the *_enabled flags.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        level = _resolve_level(name)
+        for method, method_level in (
+            ("debug", logging.DEBUG),
+            ("info", logging.INFO),
+            ("warning", logging.WARNING),
+            ("error", logging.ERROR),
+        ):
+            enabled = method_level >= level
+            setattr(self, f"{method}_enabled", enabled)
+            setattr(self, method, self._emitter(method_level) if enabled else _noop)
+
+    def _emitter(self, level: int):
+        name = self.name
+
+        def emit(msg: str, *args: Any, exc_info: Any = None) -> None:
+            if exc_info is True:
+                exc_info = sys.exc_info()
+            elif isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+            trace_logger.handle(trace_logger.makeRecord(name, level, name, 0, msg, args, exc_info))
+
+        return emit
+
+
+def get_tracer(name: str) -> Tracer:
+    """Tracer for a module, by convention get_tracer(__name__)"""
+    return Tracer(name)
+
+
+class TraceWriter:
+    """
+    Background writer for trace records (one per worker process)
+
+    Calls only enqueue a LogRecord; a QueueListener thread formats it and
+    writes to stderr. Before start() only warnings and errors are shown.
+    """
+
+    def __init__(self):
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        trace_logger.handlers = [DeferredQueueHandler(records)]
+        self._listener = QueueListener(records, stream)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and stop the writer thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        trace_logger.handlers = []
+
+
+# Global trace writer (one per worker process)
+tracing = TraceWriter()
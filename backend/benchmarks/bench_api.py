@@ -0,0 +1,432 @@
+"""
+API load benchmark
+Boots app.main:app against the Supabase stand-in and measures every main flow
+
+Starts benchmarks.fake_supabase (seeded at production size, with injected
+round-trip latency) and uvicorn serving app.main:app as separate processes,
+then drives the student, counsellor and admin dashboards and the main write
+flows with an async load generator. Reports p50/p95/p99 latency, throughput
+and database round trips per endpoint, and writes them as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.bench_api [--scale 1.0] [--concurrency 20] [--requests 200]
+    python -m benchmarks.bench_api --output baseline.json
+    python -m benchmarks.bench_api --compare baseline.json [--tolerance 0.2]
+
+With --compare the exit status is 1 when any endpoint's p95 latency or
+throughput regressed by more than the tolerance, or it started failing.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import jwt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = "benchmark-jwt-secret-not-for-production"
+
+# Forced for the app process: point it at the stand-in and disable the limiter
+APP_ENV = {
+    "SUPABASE_KEY": "benchmark-anon-key",
+    "SUPABASE_SERVICE_KEY": "benchmark-service-key",
+    "SUPABASE_JWT_SECRET": JWT_SECRET,
+    "RATE_LIMIT_ENABLED": "false",
+}
+
+# Defaults for the app process, overridable from the environment or --env
+APP_DEFAULT_ENV = {
+    "ENVIRONMENT": "benchmark",
+    "ACCESS_LOG_ENABLED": "false",
+    "TRACE_LEVEL": "WARNING",
+    "SENDGRID_API_KEY": "",
+    "EMAIL_BACKEND": "memory",
+}
+
+
+@dataclass
+class Context:
+    """Ids sampled from the seeded data, used to build requests"""
+    students: List[str]
+    counsellors: List[str]
+    admins: List[str]
+    counsellor_of: Dict[str, str]
+    tokens: Dict[str, str] = field(default_factory=dict)
+
+    def auth(self, user_id: str) -> Dict[str, str]:
+        token = self.tokens.get(user_id)
+        if token is None:
+            claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 24 * 3600}
+            token = self.tokens[user_id] = jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+        return {"Authorization": f"Bearer {token}"}
+
+
+# (method, path, headers, json body)
+Request = Tuple[str, str, Dict[str, str], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    group: str
+    build: Callable[[Context, random.Random], Request]
+
+
+def _student_get(path: str) -> Callable[[Context, random.Random], Request]:
+    def build(ctx: Context, rng: random.Random) -> Request:
+        return "GET", path, ctx.auth(rng.choice(ctx.students)), None
+    return build
+
+
+def _staff_get(path: str, role: str) -> Callable[[Context, random.Random], Request]:
+    def build(ctx: Context, rng: random.Random) -> Request:
+        users = ctx.counsellors if role == "counsellor" else ctx.admins
+        return "GET", path, ctx.auth(rng.choice(users)), None
+    return build
+
+
+def _send_message(ctx: Context, rng: random.Random) -> Request:
+    student = rng.choice(ctx.students)
+    body = {"receiver_id": ctx.counsellor_of[student], "message": "Benchmark message"}
+    return "POST", "/api/v1/messages", ctx.auth(student), body
+
+
+def _update_profile(ctx: Context, rng: random.Random) -> Request:
+    body = {"preferred_intake": rng.choice(("Winter 2026", "Summer 2027")), "german_level": rng.choice(("A1", "B1"))}
+    return "PUT", "/api/v1/profiles/me", ctx.auth(rng.choice(ctx.students)), body
+
+
+def _read_notifications(ctx: Context, rng: random.Random) -> Request:
+    return "PUT", "/api/v1/notifications/read-all", ctx.auth(rng.choice(ctx.students)), None
+
+
+def _check_eligibility(ctx: Context, rng: random.Random) -> Request:
+    body = {
+        "highest_qualification": "Bachelor's", "field_of_study": "Computer Science",
+        "cgpa_percentage": rng.uniform(55, 95), "english_test_type": "IELTS", "english_score": 7.0,
+        "work_experience_years": "2", "preferred_program": "MSc Computer Science", "german_level": "A2",
+    }
+    return "POST", "/api/v1/eligibility/check", ctx.auth(rng.choice(ctx.students)), body
+
+
+def _book_consultation(ctx: Context, rng: random.Random) -> Request:
+    student = rng.choice(ctx.students)
+    start = datetime.now(timezone.utc) + timedelta(days=rng.randint(7, 120))
+    start = start.replace(hour=rng.randint(9, 16), minute=rng.choice((0, 30)), second=0, microsecond=0)
+    body = {
+        "counsellor_id": ctx.counsellor_of[student], "scheduled_date": start.replace(tzinfo=None).isoformat(),
+        "duration_minutes": 30, "consultation_type": "INITIAL",
+    }
+    return "POST", "/api/v1/consultations", ctx.auth(student), body
+
+
+def _create_application(ctx: Context, rng: random.Random) -> Request:
+    student = rng.choice(ctx.students)
+    body = {
+        "student_id": student, "university_name": "TU Munich", "program_name": "MSc Computer Science",
+        "intake": "Winter 2026",
+    }
+    return "POST", "/api/v1/applications", ctx.auth(ctx.counsellor_of[student]), body
+
+
+SCENARIOS = [
+    # Student dashboard
+    Scenario("student: users/me", "student", _student_get("/api/v1/users/me")),
+    Scenario("student: profile", "student", _student_get("/api/v1/profiles/me")),
+    Scenario("student: profile completion", "student", _student_get("/api/v1/profiles/me/completion")),
+    Scenario("student: documents", "student", _student_get("/api/v1/documents")),
+    Scenario("student: applications", "student", _student_get("/api/v1/applications?stats=true")),
+    Scenario("student: messages", "student", _student_get("/api/v1/messages")),
+    Scenario("student: notifications", "student", _student_get("/api/v1/notifications")),
+    Scenario("student: unread notifications", "student", _student_get("/api/v1/notifications/unread")),
+    Scenario("student: upcoming consultations", "student", _student_get("/api/v1/consultations?type=upcoming")),
+    Scenario("student: consultation slots", "student", _student_get("/api/v1/consultations/slots")),
+    Scenario("student: aps", "student", _student_get("/api/v1/aps/me")),
+    # Counsellor dashboard
+    Scenario("counsellor: students", "counsellor", _staff_get("/api/v1/admin/students", "counsellor")),
+    Scenario("counsellor: review queue", "counsellor", _staff_get("/api/v1/admin/reviews", "counsellor")),
+    # Admin dashboard
+    Scenario("admin: users", "admin", _staff_get("/api/v1/admin/users", "admin")),
+    Scenario("admin: leads", "admin", _staff_get("/api/v1/admin/leads", "admin")),
+    Scenario("admin: documents", "admin", _staff_get("/api/v1/admin/documents", "admin")),
+    Scenario("admin: consultations", "admin", _staff_get("/api/v1/admin/consultations", "admin")),
+    Scenario("admin: applications", "admin", _staff_get("/api/v1/admin/applications", "admin")),
+    Scenario("admin: aps submissions", "admin", _staff_get("/api/v1/admin/aps-submissions", "admin")),
+    Scenario("admin: analytics", "admin", _staff_get("/api/v1/admin/analytics?days=30", "admin")),
+    Scenario("admin: counsellor performance", "admin", _staff_get("/api/v1/admin/counsellor-performance", "admin")),
+    # Write flows
+    Scenario("write: send message", "write", _send_message),
+    Scenario("write: update profile", "write", _update_profile),
+    Scenario("write: mark notifications read", "write", _read_notifications),
+    Scenario("write: eligibility check", "write", _check_eligibility),
+    Scenario("write: book consultation", "write", _book_consultation),
+    Scenario("write: create application", "write", _create_application),
+]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: Context,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int
+) -> Dict[str, Any]:
+    """Send requests (after warmup) with concurrency workers; latency and throughput summary"""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    db_queries: List[int] = []
+    remaining = 0
+
+    async def worker(measured: bool) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, headers, body = scenario.build(ctx, rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed = time.perf_counter() - start
+            if not measured:
+                continue
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            count = response.headers.get("x-db-query-count") if response is not None else None
+            if count is not None:
+                db_queries.append(int(count))
+
+    remaining = warmup
+    await asyncio.gather(*(worker(False) for _ in range(concurrency)))
+    remaining = requests
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(True) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    method, path, _, _ = scenario.build(ctx, random.Random(0))
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "group": scenario.group,
+        "method": method,
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "db_queries": round(sum(db_queries) / len(db_queries), 1) if db_queries else None,
+    }
+
+
+async def load_context(fake_url: str, sample: int, rng: random.Random) -> Context:
+    """Sample students and staff from the seeded data through the stand-in's PostgREST API"""
+    async with httpx.AsyncClient(base_url=fake_url) as client:
+        async def ids(role: str) -> List[str]:
+            response = await client.get("/rest/v1/users", params={"select": "id", "role": f"eq.{role}"})
+            response.raise_for_status()
+            return [row["id"] for row in response.json()]
+
+        students = await ids("student")
+        students = rng.sample(students, min(sample, len(students)))
+        profiles = await client.get(
+            "/rest/v1/profiles",
+            params={"select": "user_id,counsellor_id", "user_id": f"in.({','.join(students)})"}
+        )
+        counsellor_of = {row["user_id"]: row["counsellor_id"] for row in profiles.json()}
+        return Context(students, await ids("counsellor"), await ids("admin"), counsellor_of)
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with status {process.returncode}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout:.0f}s")
+
+
+def start_processes(args) -> Tuple[subprocess.Popen, subprocess.Popen]:
+    fake = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(args.fake_port),
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--scale", str(args.scale), "--seed", str(args.seed),
+        ],
+        cwd=BACKEND_DIR
+    )
+
+    env = dict(os.environ)
+    for key, value in APP_DEFAULT_ENV.items():
+        env.setdefault(key, value)
+    env.update(APP_ENV)
+    env["SUPABASE_URL"] = f"http://127.0.0.1:{args.fake_port}"
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    app = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+    return fake, app
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of results against a baseline file"""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['rps']} -> {current['rps']} req/s")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"\n{'endpoint':<34} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'db':>5} {'err':>5}"
+          + ("   p95 vs baseline" if baseline else ""))
+    for name, r in results["endpoints"].items():
+        line = (f"{name:<34} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['rps']:>8.1f} "
+                f"{r['db_queries'] if r['db_queries'] is not None else '-':>5} {r['errors']:>5}")
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"   {(r['p95_ms'] / previous['p95_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+    print("(latencies in ms, db = mean Supabase round trips per request)")
+
+
+async def run(args) -> Dict[str, Any]:
+    fake, app = start_processes(args)
+    try:
+        fake_url = f"http://127.0.0.1:{args.fake_port}"
+        app_url = f"http://127.0.0.1:{args.app_port}"
+        await wait_until_up(f"{fake_url}/rest/v1/system_settings", fake, timeout=300)
+        await wait_until_up(f"{app_url}/health", app, timeout=60)
+
+        rng = random.Random(args.seed)
+        ctx = await load_context(fake_url, args.sample_users, rng)
+        selected = [
+            s for s in SCENARIOS
+            if not args.only or any(s.group == term or s.name.startswith(term) for term in args.only)
+        ]
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        endpoints: Dict[str, Any] = {}
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60) as client:
+            for number, scenario in enumerate(selected):
+                endpoints[scenario.name] = await run_scenario(
+                    client, scenario, ctx, args.requests, args.concurrency, args.warmup, args.seed + number
+                )
+                r = endpoints[scenario.name]
+                print(f"  {scenario.name:<34} p95 {r['p95_ms']:7.1f} ms  {r['rps']:7.1f} req/s", flush=True)
+    finally:
+        for process in (app, fake):
+            process.terminate()
+        for process in (app, fake):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "workers": args.workers,
+            "env": args.env,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of production data sizes")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="injected Supabase round trip")
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--sample-users", type=int, default=500, help="students the load is spread over")
+    parser.add_argument(
+        "--only", action="append", default=[],
+        help="run only this group (student, counsellor, admin, write) or scenario name prefix"
+    )
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE setting for the app process")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, as a fraction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=54321)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_report(results, baseline)
+    print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
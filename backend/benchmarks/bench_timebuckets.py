@@ -0,0 +1,60 @@
+"""
+Time-bucketing micro-benchmark
+Compares per-period rescanning against EpochSeries for analytics trends
+
+Run from the backend directory:
+    python -m benchmarks.bench_timebuckets [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from app.timeutils import EpochSeries, parse_timestamp, period_bounds
+
+
+def make_timestamps(rows: int, now: datetime):
+    """Random ISO timestamps spread over the last year, like users.created_at"""
+    return [
+        (now - timedelta(seconds=random.randint(0, 365 * 86400))).isoformat()
+        for _ in range(rows)
+    ]
+
+
+def rescan(timestamps, bounds):
+    """The previous approach: parse every row again for every period"""
+    return [
+        sum(1 for ts in timestamps if start <= parse_timestamp(ts) < end)
+        for _, start, end in bounds
+    ]
+
+
+def epoch_series(timestamps, bounds):
+    """Parse once, then two binary searches per period"""
+    return EpochSeries(timestamps).bucket(bounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    now = datetime.now(timezone.utc)
+    timestamps = make_timestamps(args.rows, now)
+
+    print(f"{args.rows} timestamps, best of {args.repeat}")
+    for granularity, count in (("day", 7), ("week", 4), ("month", 6)):
+        bounds = period_bounds(granularity, count, now)
+        assert rescan(timestamps, bounds) == [int(n) for n in epoch_series(timestamps, bounds)]
+
+        slow = min(timeit.repeat(lambda: rescan(timestamps, bounds), number=1, repeat=args.repeat))
+        fast = min(timeit.repeat(lambda: epoch_series(timestamps, bounds), number=1, repeat=args.repeat))
+        print(f"  {granularity:<5} x{count}: rescan {slow * 1000:8.1f} ms   "
+              f"EpochSeries {fast * 1000:7.1f} ms   ({slow / fast:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Supabase stand-in
+In-memory PostgREST (and a stub Storage API) for benchmarks, with injected latency
+
+Implements the subset of the PostgREST protocol the repositories use:
+select with embedded relations, eq/neq/gt/gte/lt/lte/in/is/like/ilike
+filters (and not./or=), order, limit/offset, Range and count, upserts,
+PATCH and DELETE, plus the views the repositories read (see VIEWS). eq, in and or=(eq) filters on id and *_id columns are served from
+hash indexes, so the stand-in stays cheap at production data sizes and the
+measured latency is the API's, plus the injected round trip.
+
+Run on its own (seeded via benchmarks.seed):
+    python -m benchmarks.fake_supabase [--port 54321] [--latency-ms 5] [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote
+
+# Query parameters that are not row filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(raw: str) -> Any:
+    if raw == "true":
+        return True
+    if raw == "false":
+        return False
+    if raw == "null":
+        return None
+    return raw
+
+
+def _sort_key(value: Any):
+    if value is None:
+        return (0, "")
+    if isinstance(value, bool):
+        return (1, int(value))
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, str(value))
+
+
+def _split_top(text: str, sep: str = ",") -> List[str]:
+    """Split on sep outside parentheses and double quotes"""
+    parts, depth, buf, quoted, escaped = [], 0, "", False, False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quoted:
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif ch == "(" and not quoted:
+            depth += 1
+        elif ch == ")" and not quoted:
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(buf)
+            buf = ""
+        else:
+            buf += ch
+    if buf:
+        parts.append(buf)
+    return parts
+
+
+def _unquote(raw: str) -> str:
+    if len(raw) > 1 and raw[0] == raw[-1] == '"':
+        return raw[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return raw
+
+
+@lru_cache(maxsize=1024)
+def _in_options(raw: str) -> frozenset:
+    return frozenset(_unquote(o) for o in _split_top(raw[1:-1])) if raw[1:-1] else frozenset()
+
+
+def _match(row: Dict[str, Any], column: str, expr: str) -> bool:
+    negate = False
+    if expr.startswith("not."):
+        negate, expr = True, expr[4:]
+    op, _, raw = expr.partition(".")
+    raw = _unquote(raw)
+    value = row.get(column)
+    if op == "eq":
+        target = _coerce(raw)
+        result = value == target if isinstance(target, bool) or target is None else str(value) == raw
+    elif op == "neq":
+        result = str(value) != raw
+    elif op in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            return False
+        left, right = str(value), raw
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            left, right = value, float(raw)
+        result = {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[op]
+    elif op == "in":
+        result = str(value) in _in_options(raw)
+    elif op == "is":
+        result = value is _coerce(raw)
+    elif op in ("ilike", "like"):
+        pattern = re.escape(raw.replace("*", "%")).replace("%", ".*")
+        result = value is not None and re.fullmatch(pattern, str(value), re.I if op == "ilike" else 0) is not None
+    else:
+        result = True
+    return not result if negate else result
+
+
+def _match_or(row: Dict[str, Any], expr: str) -> bool:
+    for clause in _split_top(expr[1:-1] if expr.startswith("(") else expr):
+        if clause.startswith("and("):
+            if all(_match(row, *c.split(".", 1)) for c in _split_top(clause[4:-1])):
+                return True
+            continue
+        column, _, rest = clause.partition(".")
+        if _match(row, column, rest):
+            return True
+    return False
+
+
+def _indexable(column: str) -> bool:
+    return column == "id" or column.endswith("_id")
+
+
+def _analytics_counter_totals(tables: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """The analytics_counter_totals view of migration 009"""
+    counts: Dict[Tuple[str, str], int] = {}
+
+    def bump(metric: str, key: str, amount: int = 1) -> None:
+        counts[(metric, key)] = counts.get((metric, key), 0) + amount
+
+    for user in tables.get("users", []):
+        bump("users_total", user.get("role") or "unknown")
+    for submission in tables.get("aps_submissions", []):
+        bump("aps_status", submission.get("status") or "draft")
+    profiles = tables.get("profiles", [])
+    for profile in profiles:
+        bump("countries", profile.get("nationality") or "Unknown")
+    bump("funnel", "profiles_completed", sum(1 for p in profiles if p.get("first_name") and p.get("last_name")))
+    checked = {c["student_id"] for c in tables.get("eligibility_checks", []) if c.get("student_id")}
+    bump("funnel", "eligibility_checked", len(checked))
+    return [{"metric": metric, "key": key, "count": count} for (metric, key), count in counts.items()]
+
+
+# Views, recomputed from the tables on every read
+VIEWS = {"analytics_counter_totals": _analytics_counter_totals}
+
+
+class FakeSupabase:
+    """
+    ASGI app serving /rest/v1/<table> from in-memory tables
+
+    latency and jitter (seconds) are slept before every response to model
+    the network round trip to Supabase.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rng: Optional[random.Random] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = rng or random.Random(0)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        # (table, column) -> value -> rows
+        self.indexes: Dict[Tuple[str, str], Dict[str, List[Dict[str, Any]]]] = {}
+        self.requests = 0
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        self.tables.setdefault(table, []).extend(rows)
+        self._drop_indexes(table)
+
+    # Indexes
+
+    def _index(self, table: str, column: str) -> Dict[str, List[Dict[str, Any]]]:
+        index = self.indexes.get((table, column))
+        if index is None:
+            index = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(str(row.get(column)), []).append(row)
+            self.indexes[(table, column)] = index
+        return index
+
+    def _drop_indexes(self, table: str, columns: Optional[set] = None) -> None:
+        for key in [key for key in self.indexes if key[0] == table and (columns is None or key[1] in columns)]:
+            del self.indexes[key]
+
+    def _index_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        for (indexed_table, column), index in self.indexes.items():
+            if indexed_table == table:
+                for row in rows:
+                    index.setdefault(str(row.get(column)), []).append(row)
+
+    def _candidates(self, table: str, params: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Rows that can match, narrowed by an index if one applies, and the param it consumed"""
+        for position, (key, expr) in enumerate(params):
+            if _indexable(key) and expr.startswith("eq."):
+                return list(self._index(table, key).get(_unquote(expr[3:]), [])), position
+            if _indexable(key) and expr.startswith("in."):
+                index = self._index(table, key)
+                return [row for value in _in_options(expr[3:]) for row in index.get(value, [])], position
+            if key == "or":
+                clauses = _split_top(expr[1:-1] if expr.startswith("(") else expr)
+                parsed = [clause.split(".", 2) for clause in clauses]
+                if parsed and all(len(p) == 3 and p[1] == "eq" and _indexable(p[0]) for p in parsed):
+                    seen, rows = set(), []
+                    for column, _, value in parsed:
+                        for row in self._index(table, column).get(_unquote(value), []):
+                            if id(row) not in seen:
+                                seen.add(id(row))
+                                rows.append(row)
+                    return rows, position
+        return self.tables.get(table, []), None
+
+    # Queries
+
+    def _project(self, row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for column in (c.strip() for c in _split_top(select)):
+            if not column:
+                continue
+            if column == "*":
+                out.update(row)
+            elif "(" in column:
+                alias, _, rest = column.partition(":")
+                inner = rest[rest.index("(") + 1:-1] if rest else column[column.index("(") + 1:-1]
+                target = rest.split("!")[0].split("(")[0] if rest else column.split("(")[0]
+                fk = row.get(f"{alias}_id") if rest else None
+                related = self._index(target, "id").get(str(fk), [None])[0] if fk else None
+                out[alias if rest else target] = self._project(related, inner) if related else None
+            else:
+                name = column.split(":")[-1]
+                out[name] = row.get(column.split(":")[0])
+        return out
+
+    def _filtered(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows, used = self._candidates(table, params)
+        for position, (key, expr) in enumerate(params):
+            if position == used or key in RESERVED_PARAMS:
+                continue
+            if key == "or":
+                rows = [r for r in rows if _match_or(r, expr)]
+            else:
+                rows = [r for r in rows if _match(r, key, expr)]
+        return rows
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        self.requests += 1
+
+        headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        params = [(k, unquote(v)) for k, v in parse_qsl(scope["query_string"].decode(), keep_blank_values=True)]
+        status, payload, extra = self.handle(scope["method"], scope["path"], params, headers, body)
+
+        data = json.dumps(payload).encode()
+        response_headers = [(b"content-type", b"application/json")] + [
+            (k.encode(), v.encode()) for k, v in extra.items()
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": data})
+
+    def handle(self, method: str, path: str, params, headers: Dict[str, str], body: bytes):
+        if path.startswith("/storage/v1"):
+            return 200, {"Key": path}, {}
+        match = re.match(r"^/rest/v1/(\w+)$", path)
+        if not match:
+            return 404, {"message": "not found"}, {}
+        table = match.group(1)
+        rows = self.tables.setdefault(table, [])
+        prefer = headers.get("prefer", "")
+
+        if method in ("GET", "HEAD"):
+            if table in VIEWS:
+                self.tables[table] = VIEWS[table](self.tables)
+                self._drop_indexes(table)
+            result = self._filtered(table, params)
+            query = dict(params)
+            if "order" in query:
+                for part in reversed(query["order"].split(",")):
+                    column, *mods = part.split(".")
+                    result = sorted(result, key=lambda r: _sort_key(r.get(column)), reverse="desc" in mods)
+            total = len(result)
+            offset = int(query.get("offset", 0))
+            if "range" in headers:
+                start, _, end = headers["range"].partition("-")
+                offset, limit = int(start), int(end) - int(start) + 1
+            else:
+                limit = int(query["limit"]) if "limit" in query else None
+            page = result[offset:offset + limit if limit is not None else None]
+            select = query.get("select", "*")
+            payload = [self._project(r, select) for r in page]
+            size = f"{total}" if "count=" in prefer else "*"
+            extra = {"content-range": f"{offset}-{offset + len(page) - 1}/{size}"}
+            return 200, ([] if method == "HEAD" else payload), extra
+
+        if method == "POST":
+            incoming = json.loads(body or b"[]")
+            incoming = incoming if isinstance(incoming, list) else [incoming]
+            created, inserted = [], []
+            conflict = dict(params).get("on_conflict")
+            for item in incoming:
+                if conflict and ("merge-duplicates" in prefer or "ignore-duplicates" in prefer):
+                    keys = conflict.split(",")
+                    existing = next(
+                        (r for r in self._filtered(table, [(k, f"eq.{item.get(k)}") for k in keys])), None
+                    )
+                    if existing is not None and "ignore-duplicates" in prefer:
+                        continue
+                    if existing is not None:
+                        existing.update(item)
+                        self._drop_indexes(table, set(item))
+                        created.append(existing)
+                        continue
+                row = {"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **item}
+                rows.append(row)
+                inserted.append(row)
+                created.append(row)
+            self._index_rows(table, inserted)
+            return 201, created, {"content-range": f"*/{len(created)}"}
+
+        if method == "PATCH":
+            changes = json.loads(body or b"{}")
+            targets = self._filtered(table, params)
+            for row in targets:
+                row.update(changes)
+                row["updated_at"] = _now()
+            self._drop_indexes(table, set(changes))
+            return 200, targets, {}
+
+        if method == "DELETE":
+            targets = self._filtered(table, params)
+            ids = {id(r) for r in targets}
+            self.tables[table] = [r for r in rows if id(r) not in ids]
+            self._drop_indexes(table)
+            return 200, targets, {}
+
+        return 405, {"message": "method not allowed"}, {}
+
+
+def main():
+    import uvicorn
+    from benchmarks.seed import build_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="injected round trip per request")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of production data sizes to seed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeSupabase(args.latency_ms / 1000, args.jitter_ms / 1000, random.Random(args.seed))
+    for table, rows in build_dataset(args.scale, args.seed).items():
+        fake.seed(table, rows)
+    print(f"Seeded {sum(len(rows) for rows in fake.tables.values())} rows", flush=True)
+    uvicorn.run(fake, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
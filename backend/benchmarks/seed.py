@@ -0,0 +1,197 @@
+"""
+Benchmark dataset
+Deterministic rows for every table, sized like production
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Row counts at scale 1.0
+PRODUCTION_SIZES = {
+    "students": 10_000,
+    "counsellors": 50,
+    "admins": 5,
+    "messages": 100_000,
+    "notifications": 60_000,
+    "documents": 30_000,
+    "applications": 20_000,
+    "consultations": 15_000,
+    "aps_submissions": 6_000,
+    "eligibility_checks": 8_000,
+    "leads": 5_000,
+}
+
+DOCUMENT_TYPES = ["sop", "lor", "resume", "cover_letter", "passport", "transcript", "certificate"]
+DOCUMENT_STATUSES = ["draft", "submitted", "under_review", "approved", "rejected", "needs_revision"]
+APPLICATION_STATUSES = ["applied", "documents_sent", "under_review", "accepted", "rejected", "withdrawn"]
+CONSULTATION_STATUSES = ["scheduled", "completed", "cancelled"]
+APS_STATUSES = ["submitted", "under_review", "verified", "needs_correction"]
+LEAD_STATUSES = ["new", "contacted", "qualified", "converted", "lost"]
+UNIVERSITIES = ["TU Munich", "RWTH Aachen", "TU Berlin", "University of Stuttgart", "KIT", "TU Dresden"]
+PROGRAMS = ["MSc Computer Science", "MSc Data Science", "MSc Mechanical Engineering", "MBA", "MSc Physics"]
+
+
+class _Generator:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def past(self, days: int = 365) -> str:
+        return (self.now - timedelta(seconds=self.rng.randint(0, days * 86400))).isoformat()
+
+    def future(self, days: int = 60) -> str:
+        start = self.now + timedelta(days=self.rng.randint(1, days), hours=self.rng.randint(0, 8))
+        return start.replace(hour=9 + start.hour % 8, minute=self.rng.choice((0, 30)), second=0).isoformat()
+
+
+def build_dataset(scale: float = 1.0, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """Rows per table; scale multiplies every PRODUCTION_SIZES entry"""
+    g = _Generator(seed)
+    rng = g.rng
+    size = {name: max(1, int(count * scale)) for name, count in PRODUCTION_SIZES.items()}
+
+    def user(role: str, number: int) -> Dict[str, Any]:
+        created = g.past()
+        return {
+            "id": g.uuid(), "email": f"{role}{number}@example.com", "name": f"{role.title()} {number}",
+            "role": role, "auth_provider": "google", "google_id": None, "profile_picture_url": None,
+            "status": "active", "created_at": created, "last_login": created, "updated_at": created,
+        }
+
+    counsellors = [user("counsellor", n) for n in range(size["counsellors"])]
+    admins = [user("admin", n) for n in range(size["admins"])]
+    students = [user("student", n) for n in range(size["students"])]
+    counsellor_of = {s["id"]: rng.choice(counsellors)["id"] for s in students}
+    conversation_of = {s["id"]: g.uuid() for s in students}
+
+    profiles = [
+        {
+            "id": g.uuid(), "user_id": s["id"], "first_name": s["name"].split()[0], "middle_name": None,
+            "last_name": s["name"].split()[1], "date_of_birth": "2000-01-01", "gender": rng.choice(("male", "female")),
+            "nationality": rng.choice(("India", "Nepal", "Nigeria", "Vietnam")), "mobile_number": "+910000000000",
+            "address": None, "highest_qualification": "Bachelor's", "field_of_study": "Computer Science",
+            "institution_name": "Bench University", "graduation_year": rng.randint(2018, 2025),
+            "cgpa_percentage": round(rng.uniform(55, 95), 2), "cgpa_type": "percentage",
+            "english_test_type": "IELTS", "english_score": rng.choice((6.0, 6.5, 7.0, 7.5)),
+            "german_level": rng.choice((None, "A1", "A2", "B1")), "work_experience_years": str(rng.randint(0, 5)),
+            "preferred_intake": "Winter 2026", "interested_country": "Germany", "study_level": "Masters",
+            "preferred_program": rng.choice(PROGRAMS), "completion_percentage": rng.randint(20, 100),
+            "counsellor_id": counsellor_of[s["id"]], "created_at": s["created_at"], "updated_at": s["created_at"],
+        }
+        for s in students
+    ]
+
+    messages = []
+    for _ in range(size["messages"]):
+        student = rng.choice(students)["id"]
+        counsellor = counsellor_of[student]
+        sender, receiver = (student, counsellor) if rng.random() < 0.5 else (counsellor, student)
+        is_read = rng.random() < 0.8
+        messages.append({
+            "id": g.uuid(), "conversation_id": conversation_of[student], "sender_id": sender, "receiver_id": receiver,
+            "message": "Benchmark message " + "lorem ipsum " * rng.randint(1, 10), "attachments": None,
+            "is_read": is_read, "read_at": None, "created_at": g.past(),
+        })
+
+    notifications = [
+        {
+            "id": g.uuid(), "user_id": rng.choice(students)["id"], "type": rng.choice(("document", "message", "consultation")),
+            "title": "Benchmark notification", "message": "Something happened", "link": None, "metadata": None,
+            "is_read": rng.random() < 0.7, "read_at": None, "created_at": g.past(),
+        }
+        for _ in range(size["notifications"])
+    ]
+    unread: Dict[str, int] = {}
+    for n in notifications:
+        if not n["is_read"]:
+            unread[n["user_id"]] = unread.get(n["user_id"], 0) + 1
+    # What the 007 migration's triggers would have maintained
+    notification_counters = [
+        {"user_id": user_id, "unread_count": count, "updated_at": g.now.isoformat()}
+        for user_id, count in unread.items()
+    ]
+
+    documents = []
+    for _ in range(size["documents"]):
+        student = rng.choice(students)["id"]
+        created = g.past()
+        doc_type = rng.choice(DOCUMENT_TYPES)
+        documents.append({
+            "id": g.uuid(), "student_id": student, "type": doc_type, "title": f"{doc_type.upper()} draft",
+            "content": "Lorem ipsum dolor sit amet. " * 40 if doc_type in ("sop", "lor", "resume") else None,
+            "file_url": None, "file_name": None, "file_size": None, "mime_type": None,
+            "status": rng.choice(DOCUMENT_STATUSES), "version": 1, "counsellor_id": counsellor_of[student],
+            "review_comments": None, "created_at": created, "updated_at": created,
+            "submitted_at": created, "reviewed_at": None,
+        })
+
+    applications = [
+        {
+            "id": g.uuid(), "student_id": (student := rng.choice(students)["id"]),
+            "university_name": rng.choice(UNIVERSITIES), "program_name": rng.choice(PROGRAMS),
+            "intake": "Winter 2026", "status": rng.choice(APPLICATION_STATUSES),
+            "counsellor_id": counsellor_of[student], "applied_date": g.past()[:10], "decision_date": None,
+            "notes": None, "timeline": None, "created_at": (created := g.past()), "updated_at": created,
+        }
+        for _ in range(size["applications"])
+    ]
+
+    consultations = []
+    for _ in range(size["consultations"]):
+        student = rng.choice(students)["id"]
+        upcoming = rng.random() < 0.2
+        consultations.append({
+            "id": g.uuid(), "student_id": student, "counsellor_id": counsellor_of[student],
+            "consultation_type": rng.choice(("INITIAL", "FOLLOW_UP", "DOCUMENT_REVIEW")),
+            "scheduled_at": g.future() if upcoming else g.past(),
+            "duration_minutes": 30, "status": "scheduled" if upcoming else rng.choice(CONSULTATION_STATUSES),
+            "meeting_link": None, "notes": None, "created_at": (created := g.past()), "updated_at": created,
+        })
+
+    aps_submissions = [
+        {
+            "id": g.uuid(), "student_id": s["id"], "form_data": {"passport_number": "X0000000"},
+            "status": rng.choice(APS_STATUSES), "counsellor_id": counsellor_of[s["id"]],
+            "verification_comments": None, "submitted_at": (submitted := g.past()), "verified_at": None,
+            "updated_at": submitted,
+        }
+        for s in rng.sample(students, min(len(students), size["aps_submissions"]))
+    ]
+
+    eligibility_checks = [
+        {
+            "id": g.uuid(), "student_id": rng.choice(students)["id"], "request_data": {},
+            "eligible": rng.random() < 0.7, "score": rng.randint(30, 95), "recommendations": [], "warnings": [],
+            "eligible_programs": [], "improvement_areas": [], "created_at": g.past(),
+        }
+        for _ in range(size["eligibility_checks"])
+    ]
+
+    leads = [
+        {
+            "id": g.uuid(), "name": f"Lead {n}", "email": f"lead{n}@example.com", "phone": None,
+            "source": rng.choice(("website", "referral", "event")), "status": rng.choice(LEAD_STATUSES),
+            "assigned_to": rng.choice(counsellors)["id"], "notes": None,
+            "created_at": (created := g.past()), "updated_at": created,
+        }
+        for n in range(size["leads"])
+    ]
+
+    return {
+        "users": admins + counsellors + students,
+        "profiles": profiles,
+        "messages": messages,
+        "notifications": notifications,
+        "notification_counters": notification_counters,
+        "documents": documents,
+        "applications": applications,
+        "consultations": consultations,
+        "aps_submissions": aps_submissions,
+        "eligibility_checks": eligibility_checks,
+        "leads": leads,
+    }
@@ -0,0 +1,63 @@
+-- AJ NOVA Platform - Pre-aggregated analytics rollups
+-- Migration: 005_analytics_rollups
+-- Created: 2026-10-18
+-- Description: Daily rollups and counters read by /admin/analytics, refreshed incrementally by the backend
+
+-- ===================================
+-- DAILY ROLLUPS
+-- ===================================
+-- One row per (day, metric, key), e.g. ('2026-01-05', 'documents_status', 'approved').
+-- count is the number of source rows created that day; total carries a summed
+-- quantity where the metric has one (revisions, response hours).
+CREATE TABLE analytics_daily (
+    day DATE NOT NULL,
+    metric VARCHAR(50) NOT NULL,
+    key VARCHAR(100) NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (day, metric, key)
+);
+
+CREATE INDEX idx_analytics_daily_metric_day ON analytics_daily(metric, day);
+
+-- ===================================
+-- ALL-TIME COUNTERS
+-- ===================================
+-- Current-state counts that are not bucketed by day (funnel stages, APS status, countries)
+CREATE TABLE analytics_counters (
+    metric VARCHAR(50) NOT NULL,
+    key VARCHAR(100) NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (metric, key)
+);
+
+-- ===================================
+-- REFRESH STATE
+-- ===================================
+-- High-water mark per source table; rows changed since it are re-aggregated
+CREATE TABLE analytics_refresh_state (
+    source VARCHAR(50) PRIMARY KEY,
+    watermark TIMESTAMPTZ,
+    refreshed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Rollups are written and read with the service role key only
+ALTER TABLE analytics_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analytics_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analytics_refresh_state ENABLE ROW LEVEL SECURITY;
+
+-- Watermark lookups on the source tables
+CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents(updated_at);
+CREATE INDEX IF NOT EXISTS idx_applications_updated_at ON applications(updated_at);
+CREATE INDEX IF NOT EXISTS idx_consultations_updated_at ON consultations(updated_at);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
+
+COMMENT ON TABLE analytics_daily IS 'Per-day analytics rollups for the admin dashboard';
+COMMENT ON TABLE analytics_counters IS 'All-time analytics counters for the admin dashboard';
+COMMENT ON TABLE analytics_refresh_state IS 'Incremental refresh watermarks for analytics rollups';
+
+-- Migration complete
+-- Version: 005
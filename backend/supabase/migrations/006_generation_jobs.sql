@@ -0,0 +1,35 @@
+-- AJ NOVA Platform - AI generation jobs
+-- Migration: 006_generation_jobs
+-- Created: 2026-10-18
+-- Description: Tracks queued AI document generations so clients can poll instead of holding a request open
+
+-- ===================================
+-- GENERATION JOBS TABLE
+-- ===================================
+CREATE TABLE generation_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    student_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    request JSONB NOT NULL,
+    status VARCHAR(50) DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts INTEGER DEFAULT 0,
+    error TEXT,
+    document_id UUID REFERENCES documents(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX idx_generation_jobs_student_id ON generation_jobs(student_id);
+CREATE INDEX idx_generation_jobs_status ON generation_jobs(status);
+
+CREATE TRIGGER update_generation_jobs_updated_at BEFORE UPDATE ON generation_jobs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE generation_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Students can view own generation jobs" ON generation_jobs FOR SELECT USING (student_id = auth.uid());
+
+COMMENT ON TABLE generation_jobs IS 'Queued AI document generation jobs';
+
+-- Migration complete
+-- Version: 006
@@ -0,0 +1,106 @@
+-- AJ NOVA Platform - Notification counters
+-- Migration: 007_notification_counters
+-- Created: 2026-10-18
+-- Description: Per-user unread notification counts kept by triggers, so reads are a primary key lookup instead of an exact count
+
+-- ===================================
+-- NOTIFICATION COUNTERS TABLE
+-- ===================================
+CREATE TABLE notification_counters (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0 CHECK (unread_count >= 0),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE notification_counters ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own notification counter" ON notification_counters FOR SELECT USING (user_id = auth.uid());
+
+-- ===================================
+-- COUNTER MAINTENANCE
+-- ===================================
+-- Adds a per-user delta to each counter, creating missing rows
+CREATE OR REPLACE FUNCTION apply_notification_counter_deltas(p_user_ids UUID[], p_deltas INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO notification_counters (user_id)
+    SELECT user_id FROM unnest(p_user_ids) AS u(user_id)
+    WHERE user_id IS NOT NULL
+    ON CONFLICT (user_id) DO NOTHING;
+
+    UPDATE notification_counters c
+    SET unread_count = GREATEST(c.unread_count + d.delta, 0), updated_at = NOW()
+    FROM unnest(p_user_ids, p_deltas) AS d(user_id, delta)
+    WHERE c.user_id = d.user_id AND d.delta <> 0;
+END;
+$$ language 'plpgsql';
+
+-- Statement-level, so "mark all read" touches each counter once rather than once per row.
+-- SECURITY DEFINER lets writes made through the anon client (under RLS) update counters.
+CREATE OR REPLACE FUNCTION sync_notification_counters()
+RETURNS TRIGGER AS $$
+DECLARE
+    user_ids UUID[];
+    deltas INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(user_id), array_agg(delta) INTO user_ids, deltas
+        FROM (
+            SELECT user_id, COUNT(*)::INTEGER AS delta FROM new_rows
+            WHERE NOT is_read GROUP BY user_id
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(user_id), array_agg(delta) INTO user_ids, deltas
+        FROM (
+            SELECT user_id, -COUNT(*)::INTEGER AS delta FROM old_rows
+            WHERE NOT is_read GROUP BY user_id
+        ) d;
+    ELSE
+        SELECT array_agg(user_id), array_agg(delta) INTO user_ids, deltas
+        FROM (
+            SELECT user_id, SUM(delta)::INTEGER AS delta FROM (
+                SELECT user_id, -1 AS delta FROM old_rows WHERE NOT is_read
+                UNION ALL
+                SELECT user_id, 1 AS delta FROM new_rows WHERE NOT is_read
+            ) changes
+            GROUP BY user_id
+            HAVING SUM(delta) <> 0
+        ) d;
+    END IF;
+
+    IF user_ids IS NOT NULL THEN
+        PERFORM apply_notification_counter_deltas(user_ids, deltas);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Block notification writes while the counters are backfilled so none are missed
+LOCK TABLE notifications IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TRIGGER sync_notification_counters_insert AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_notification_counters();
+CREATE TRIGGER sync_notification_counters_update AFTER UPDATE ON notifications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_notification_counters();
+CREATE TRIGGER sync_notification_counters_delete AFTER DELETE ON notifications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_notification_counters();
+
+-- ===================================
+-- BACKFILL
+-- ===================================
+INSERT INTO notification_counters (user_id, unread_count)
+SELECT user_id, COUNT(*) FROM notifications
+WHERE NOT is_read AND user_id IS NOT NULL
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET unread_count = EXCLUDED.unread_count, updated_at = NOW();
+
+-- Unread lookups and filtered pages of a user's notifications
+CREATE INDEX idx_notifications_user_id_created_at ON notifications(user_id, created_at DESC);
+
+COMMENT ON TABLE notification_counters IS 'Per-user unread notification counts, maintained by triggers on notifications';
+
+-- Migration complete
+-- Version: 007
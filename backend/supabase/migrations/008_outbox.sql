@@ -0,0 +1,33 @@
+-- AJ NOVA Platform - Outbox
+-- Migration: 008_outbox
+-- Created: 2026-10-18
+-- Description: Notifications and emails queued by request handlers and delivered by a background dispatcher
+
+-- ===================================
+-- OUTBOX TABLE
+-- ===================================
+CREATE TABLE outbox (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kind VARCHAR(50) NOT NULL CHECK (kind IN ('notification', 'email')),
+    method VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    dedup_key TEXT NOT NULL UNIQUE,
+    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMPTZ DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    sent_at TIMESTAMPTZ
+);
+
+-- Due entries, in the order the dispatcher claims them
+CREATE INDEX idx_outbox_due ON outbox(available_at) WHERE status IN ('pending', 'sending');
+CREATE INDEX idx_outbox_sent_at ON outbox(sent_at) WHERE status = 'sent';
+
+-- Service role only
+ALTER TABLE outbox ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE outbox IS 'Queued notifications and emails, delivered by the outbox dispatcher';
+
+-- Migration complete
+-- Version: 008
@@ -0,0 +1,38 @@
+-- AJ NOVA Platform - Analytics counter totals
+-- Migration: 009_analytics_counter_totals
+-- Created: 2026-10-18
+-- Description: Grouped counts behind analytics_counters, so a refresh reads a few dozen rows instead of the source tables
+
+-- ===================================
+-- COUNTER TOTALS VIEW
+-- ===================================
+-- One row per (metric, key), matching analytics_counters. Each refresh copies
+-- it into analytics_counters; the dashboard never reads it directly.
+-- Empty strings are grouped with NULLs, as the backend did when it counted rows itself.
+CREATE OR REPLACE VIEW analytics_counter_totals AS
+SELECT 'users_total'::VARCHAR(50) AS metric, COALESCE(NULLIF(role, ''), 'unknown')::VARCHAR(100) AS key, COUNT(*)::INTEGER AS count
+FROM users
+GROUP BY 2
+UNION ALL
+SELECT 'aps_status', COALESCE(NULLIF(status, ''), 'draft'), COUNT(*)::INTEGER
+FROM aps_submissions
+GROUP BY 2
+UNION ALL
+SELECT 'countries', COALESCE(NULLIF(nationality, ''), 'Unknown'), COUNT(*)::INTEGER
+FROM profiles
+GROUP BY 2
+UNION ALL
+SELECT 'funnel', 'profiles_completed', COUNT(*)::INTEGER
+FROM profiles
+WHERE COALESCE(first_name, '') <> '' AND COALESCE(last_name, '') <> ''
+UNION ALL
+SELECT 'funnel', 'eligibility_checked', COUNT(DISTINCT student_id)::INTEGER
+FROM eligibility_checks;
+
+-- Views run with the owner's privileges, so keep this one away from the API roles
+REVOKE ALL ON analytics_counter_totals FROM anon, authenticated;
+
+COMMENT ON VIEW analytics_counter_totals IS 'All-time analytics counters, computed with grouped counts';
+
+-- Migration complete
+-- Version: 009
@@ -0,0 +1,17 @@
+-- AJ NOVA Platform - Idempotent notification delivery
+-- Migration: 010_notification_dedup
+-- Created: 2026-10-18
+-- Description: Outbox deliveries carry their entry's dedup_key, so a redelivered entry cannot notify twice
+
+-- ===================================
+-- NOTIFICATION DEDUP KEYS
+-- ===================================
+-- Set only for notifications created by the outbox dispatcher (see migration 008).
+-- A full unique index rather than a partial one, so inserts can target it with
+-- ON CONFLICT (dedup_key); NULLs never conflict.
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS dedup_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_dedup_key ON notifications(dedup_key);
+
+-- Migration complete
+-- Version: 010
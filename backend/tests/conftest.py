@@ -0,0 +1,91 @@
+"""
+Test setup
+Serves app.main:app against benchmarks.fake_supabase, an in-memory PostgREST stand-in
+"""
+
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterator
+
+import jwt
+import pytest
+
+JWT_SECRET = "test-jwt-secret-not-for-production"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+SUPABASE_PORT = _free_port()
+
+# Settings are read when app.config is first imported, so set them up front
+os.environ.update({
+    "ENVIRONMENT": "test",
+    "SUPABASE_URL": f"http://127.0.0.1:{SUPABASE_PORT}",
+    "SUPABASE_KEY": "test-anon-key",
+    "SUPABASE_SERVICE_KEY": "test-service-key",
+    "SUPABASE_JWT_SECRET": JWT_SECRET,
+    "RATE_LIMIT_ENABLED": "false",
+    "ACCESS_LOG_ENABLED": "false",
+    "REALTIME_BACKEND": "memory",
+    "ANALYTICS_REFRESH_INTERVAL": "0",
+    "OUTBOX_ENABLED": "false",
+    "EMAIL_BACKEND": "memory",
+    "GENERATION_CACHE_ENABLED": "false",
+})
+
+pytest_plugins = ["app.testing"]
+
+
+@pytest.fixture(scope="session")
+def fake_supabase():
+    """The PostgREST stand-in, seeded with 2% of the production-sized benchmark dataset"""
+    import uvicorn
+    from benchmarks.fake_supabase import FakeSupabase
+    from benchmarks.seed import build_dataset
+
+    fake = FakeSupabase()
+    for table, rows in build_dataset(scale=0.02).items():
+        fake.seed(table, rows)
+
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=SUPABASE_PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield fake
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture(scope="session")
+def client(fake_supabase) -> Iterator:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _headers(user_id: str) -> Dict[str, str]:
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600}
+    return {"Authorization": f"Bearer {jwt.encode(claims, JWT_SECRET, algorithm='HS256')}"}
+
+
+def _first(fake_supabase, role: str) -> str:
+    return next(user["id"] for user in fake_supabase.tables["users"] if user["role"] == role)
+
+
+@pytest.fixture
+def student_headers(fake_supabase) -> Dict[str, str]:
+    return _headers(_first(fake_supabase, "student"))
+
+
+@pytest.fixture
+def admin_headers(fake_supabase) -> Dict[str, str]:
+    return _headers(_first(fake_supabase, "admin"))
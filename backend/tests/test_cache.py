@@ -0,0 +1,120 @@
+"""TTL/LRU cache behaviour and user cache invalidation on user updates"""
+
+import pytest
+
+from app import cache as cache_module
+from app.cache import TTLCache
+from app.dependencies import user_cache
+
+
+class FakeClock:
+    """Stands in for the time module inside app.cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(maxsize=8, ttl=10)
+    cache.set("a", 1)
+    clock.advance(9.9)
+    assert cache.get("a") == 1
+
+    clock.advance(0.1)
+    assert cache.get("a") is None
+    # The expired entry is dropped, not just hidden
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_the_default(clock):
+    cache = TTLCache(maxsize=8, ttl=60)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2)
+    clock.advance(5)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    # Overwriting an existing key does not evict anything
+    cache.set("a", 4)
+    assert len(cache) == 2
+    assert cache.get("a") == 4
+
+
+def test_stats_count_hits_and_misses(clock):
+    cache = TTLCache(maxsize=4, ttl=10)
+    assert cache.stats()["hit_rate"] == 0.0
+
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    clock.advance(10)
+    cache.get("a")
+
+    assert cache.stats() == {
+        "hits": 2, "misses": 2, "hit_rate": 0.5, "size": 0, "maxsize": 4, "ttl": 10
+    }
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def _user(fake_supabase, role: str) -> dict:
+    return next(user for user in fake_supabase.tables["users"] if user["role"] == role)
+
+
+def test_profile_update_drops_the_cached_user(client, fake_supabase, student_headers):
+    student = _user(fake_supabase, "student")
+    assert client.get("/api/v1/users/me", headers=student_headers).status_code == 200
+    assert user_cache.get(student["id"]) is not None
+
+    response = client.put("/api/v1/users/me", headers=student_headers, json={"name": student["name"]})
+    assert response.status_code == 200
+    assert user_cache.get(student["id"]) is None
+
+
+@pytest.mark.parametrize("field", ["role", "status"])
+def test_admin_user_changes_drop_the_cached_user(client, fake_supabase, admin_headers, field):
+    student = _user(fake_supabase, "student")
+    user_cache.set(student["id"], object())
+
+    response = client.patch(
+        f"/api/v1/admin/users/{student['id']}/{field}", headers=admin_headers, params={field: student[field]}
+    )
+    assert response.status_code == 200
+    assert user_cache.get(student["id"]) is None
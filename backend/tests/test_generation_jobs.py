@@ -0,0 +1,76 @@
+"""Generation queue shutdown and crash recovery"""
+
+import asyncio
+
+from app.models.document import DocumentGenerateRequest
+from app.services import generation_jobs
+from app.services.generation_jobs import GenerationJobQueue, SQLiteJobStore
+
+REQUEST = DocumentGenerateRequest(type="sop", university="TUM", program="CS")
+
+
+class HangingAIService:
+    """Stands in for Gemini; every generation blocks until cancelled"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def generate_document(self, **kwargs) -> str:
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+def _queue(tmp_path) -> GenerationJobQueue:
+    queue = GenerationJobQueue()
+    queue._store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    return queue
+
+
+def test_stop_fails_running_and_queued_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(generation_jobs.settings, "GENERATION_WORKERS", 1)
+
+    async def scenario():
+        ai_service = HangingAIService()
+        monkeypatch.setattr(generation_jobs, "get_ai_service", lambda: ai_service)
+        queue = _queue(tmp_path)
+        queue.start()
+        running = await queue.submit(None, "student", None, REQUEST)
+        queued = await queue.submit(None, "student", None, REQUEST)
+        await asyncio.wait_for(ai_service.started.wait(), 5)
+        assert (await queue.get(running["id"]))["status"] == "running"
+
+        await queue.stop()
+        return [await queue.get(job["id"]) for job in (running, queued)]
+
+    for job in asyncio.run(scenario()):
+        assert job["status"] == "failed"
+        assert job["error"] == "Server restarted before the job finished"
+        assert job["finished_at"]
+
+
+def test_start_fails_jobs_abandoned_by_a_crashed_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(generation_jobs.settings, "GENERATION_JOB_STALE_AFTER", 3600)
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        jobs = {
+            "stale-running": ("running", generation_jobs._now(-7200)),
+            "stale-queued": ("queued", generation_jobs._now(-7200)),
+            "recent-running": ("running", generation_jobs._now(-60)),
+            "stale-succeeded": ("succeeded", generation_jobs._now(-7200)),
+        }
+        for job_id, (status, created_at) in jobs.items():
+            await queue.store.create({"id": job_id, "request": {}, "status": status, "created_at": created_at})
+
+        queue.start()
+        await queue._sweep
+        statuses = {job_id: (await queue.get(job_id))["status"] for job_id in jobs}
+        await queue.stop()
+        return statuses
+
+    assert asyncio.run(scenario()) == {
+        "stale-running": "failed",
+        "stale-queued": "failed",
+        "recent-running": "running",
+        "stale-succeeded": "succeeded",
+    }
@@ -0,0 +1,155 @@
+"""Outbox claiming, retries and idempotent redelivery, against the Supabase stand-in"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from postgrest import AsyncPostgrestClient
+
+from app.config import settings
+from app.repositories.database import Database
+from app.services import outbox as outbox_module
+from app.services.notification_service import NotificationService
+from app.services.outbox import OutboxDispatcher, notification_entry
+
+PAST = "2000-01-01T00:00:00+00:00"
+
+
+def run(scenario):
+    """Run scenario(db) on a fresh event loop with its own PostgREST client"""
+    async def main():
+        key = settings.SUPABASE_SERVICE_KEY
+        client = AsyncPostgrestClient(
+            f"{settings.SUPABASE_URL}/rest/v1", headers={"apikey": key, "Authorization": f"Bearer {key}"}
+        )
+        try:
+            return await scenario(Database(client))
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def dispatcher(db: Database) -> OutboxDispatcher:
+    instance = OutboxDispatcher()
+    instance._db = db
+    return instance
+
+
+@pytest.fixture
+def outbox(fake_supabase):
+    """The stand-in's outbox table, emptied, plus a helper seeding due entries"""
+    fake_supabase.tables["outbox"] = []
+    fake_supabase._drop_indexes("outbox")
+
+    def seed(*entries, attempts: int = 0):
+        rows = [
+            {**entry, "id": str(uuid.uuid4()), "status": "pending", "attempts": attempts, "available_at": PAST}
+            for entry in entries
+        ]
+        fake_supabase.seed("outbox", rows)
+        return rows
+
+    seed.rows = lambda: {row["dedup_key"]: row for row in fake_supabase.tables["outbox"]}
+    return seed
+
+
+def message_entry(user_id: str) -> dict:
+    return notification_entry(
+        "notify_new_message", f"message:{uuid.uuid4()}",
+        user_id=user_id, sender_name="Counsellor", message_id=str(uuid.uuid4())
+    )
+
+
+def test_racing_dispatchers_claim_each_entry_once(outbox):
+    outbox(*(message_entry(str(uuid.uuid4())) for _ in range(20)))
+
+    async def scenario(db):
+        # Rounds of four workers claiming at once, until nothing is left
+        claimed = []
+        while True:
+            now, lease = outbox_module._timestamp(), outbox_module._timestamp(60)
+            rounds = await asyncio.gather(*(db.outbox.claim(8, now, lease) for _ in range(4)))
+            if not any(rounds):
+                return claimed
+            claimed.extend(entry["id"] for entries in rounds for entry in entries)
+
+    claimed = run(scenario)
+    assert len(claimed) == len(set(claimed)) == 20
+    assert all(row["status"] == "sending" for row in outbox.rows().values())
+
+
+def test_transient_failures_back_off_and_are_written_in_one_request(outbox, fake_supabase, monkeypatch):
+    monkeypatch.setattr(outbox_module.settings, "OUTBOX_RETRY_BASE_DELAY", 10.0)
+    monkeypatch.setattr(outbox_module.settings, "OUTBOX_MAX_ATTEMPTS", 5)
+
+    async def unavailable(self, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(NotificationService, "notify_new_message", unavailable)
+    first = outbox(*(message_entry(str(uuid.uuid4())) for _ in range(3)))
+    second = outbox(message_entry(str(uuid.uuid4())), attempts=2)
+
+    async def scenario(db):
+        requests = fake_supabase.requests
+        claimed = await dispatcher(db).dispatch()
+        return claimed, fake_supabase.requests - requests
+
+    started = datetime.now(timezone.utc)
+    claimed, requests = run(scenario)
+    assert claimed == 4
+    # Select and lease, then a single write for all four failures
+    assert requests == 3
+
+    rows = outbox.rows()
+    for entry, attempts, delay in [(row, 1, 10) for row in first] + [(second[0], 3, 40)]:
+        row = rows[entry["dedup_key"]]
+        assert row["status"] == "pending"
+        assert row["attempts"] == attempts
+        assert row["last_error"] == "database unavailable"
+        # Exponential backoff with up to 50% jitter
+        due = datetime.fromisoformat(row["available_at"]) - started
+        assert timedelta(seconds=delay) <= due <= timedelta(seconds=delay * 1.5 + 5)
+
+    # Nothing is due again until the backoff has passed
+    assert run(lambda db: dispatcher(db).dispatch()) == 0
+
+
+def test_permanent_and_exhausted_failures_are_not_retried(outbox, monkeypatch):
+    monkeypatch.setattr(outbox_module.settings, "OUTBOX_MAX_ATTEMPTS", 3)
+
+    async def unavailable(self, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(NotificationService, "notify_new_message", unavailable)
+    unknown = notification_entry("notify_unknown", "unknown", user_id=str(uuid.uuid4()))
+    bad_payload = notification_entry("notify_application_update", "bad-payload", user_id=str(uuid.uuid4()))
+    outbox(unknown, bad_payload)
+    (exhausted,) = outbox(message_entry(str(uuid.uuid4())), attempts=2)
+
+    assert run(lambda db: dispatcher(db).dispatch()) == 3
+
+    rows = outbox.rows()
+    assert rows["unknown"]["status"] == "failed"
+    assert rows["unknown"]["last_error"] == "Unknown notification method notify_unknown"
+    assert rows["bad-payload"]["status"] == "failed"
+    assert rows["bad-payload"]["attempts"] == 1
+    assert rows[exhausted["dedup_key"]]["status"] == "failed"
+    assert rows[exhausted["dedup_key"]]["attempts"] == 3
+
+
+def test_redelivered_entry_creates_one_notification(outbox, fake_supabase):
+    user_id = str(uuid.uuid4())
+    (entry,) = outbox(message_entry(user_id))
+
+    async def deliver_twice(db):
+        # A lease that expired mid-delivery, or mark_sent failing after the
+        # insert, hands the same entry to a second delivery
+        await dispatcher(db)._deliver(dict(entry))
+        await dispatcher(db)._deliver(dict(entry))
+
+    run(deliver_twice)
+    notifications = [n for n in fake_supabase.tables["notifications"] if n["user_id"] == user_id]
+    assert len(notifications) == 1
+    assert notifications[0]["dedup_key"] == entry["dedup_key"]
@@ -0,0 +1,31 @@
+"""Database round trips per request on the endpoints that used to grow with table size"""
+
+
+def test_student_list(client, admin_headers, query_recorder):
+    response = client.get("/api/v1/admin/students", headers=admin_headers)
+    assert response.status_code == 200
+    query_recorder.assert_max_queries("GET", "/api/v1/admin/students", 3)
+    query_recorder.assert_no_n_plus_one()
+
+
+def test_student_search(client, admin_headers, query_recorder):
+    response = client.get("/api/v1/admin/students", params={"search": "student"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["students"]
+    query_recorder.assert_max_queries("GET", "/api/v1/admin/students", 4)
+    query_recorder.assert_no_n_plus_one()
+
+
+def test_available_slots(client, student_headers, query_recorder):
+    response = client.get("/api/v1/consultations/slots", params={"days": 30}, headers=student_headers)
+    assert response.status_code == 200
+    query_recorder.assert_max_queries("GET", "/api/v1/consultations/slots", 4)
+    query_recorder.assert_no_n_plus_one()
+
+
+def test_counsellor_performance(client, admin_headers, query_recorder):
+    response = client.get("/api/v1/admin/counsellor-performance", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["counsellors"]
+    query_recorder.assert_max_queries("GET", "/api/v1/admin/counsellor-performance", 7)
+    query_recorder.assert_no_n_plus_one()
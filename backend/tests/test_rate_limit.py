@@ -0,0 +1,141 @@
+"""Token-bucket math, bucket eviction and the limiter's response headers"""
+
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware import rate_limit
+from app.middleware.rate_limit import MemoryBucketStore, RateLimitMiddleware, SQLiteBucketStore
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_limit"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore(ttl=60)
+    return SQLiteBucketStore(str(tmp_path / "rate_limit.db"), ttl=60)
+
+
+def take(store, *buckets):
+    return asyncio.run(store.take(list(buckets)))
+
+
+def test_bucket_refills_at_the_budget_rate(store, clock):
+    bucket = ("user:1", 2, 1.0)
+    assert take(store, bucket) == [(True, 1, 0.0)]
+    assert take(store, bucket) == [(True, 0, 0.0)]
+    assert take(store, bucket) == [(False, 0, 1.0)]
+
+    clock.advance(0.5)
+    assert take(store, bucket) == [(False, 0.5, 0.5)]
+
+    clock.advance(0.5)
+    assert take(store, bucket) == [(True, 0, 0.0)]
+
+    # Never refills past capacity
+    clock.advance(3600)
+    assert take(store, bucket) == [(True, 1, 0.0)]
+
+
+def test_rejection_by_one_bucket_takes_nothing_from_the_others(store, clock):
+    route, role = ("user:1|POST /generate", 5, 1.0), ("user:1", 1, 1.0)
+    assert take(store, route, role) == [(True, 4, 0.0), (True, 0, 0.0)]
+
+    allowed = [allowed for allowed, _, _ in take(store, route, role)]
+    assert allowed == [True, False]
+
+    # The route bucket still has the 4 tokens left after the first request
+    assert take(store, route) == [(True, 3, 0.0)]
+
+
+def test_memory_store_drops_idle_buckets(clock):
+    store = MemoryBucketStore(ttl=10)
+    take(store, ("a", 1, 0.1))
+    clock.advance(11)
+    take(store, ("b", 1, 0.1))
+    assert list(store._buckets) == ["b"]
+
+
+def test_memory_store_keeps_at_most_max_keys_buckets(clock):
+    store = MemoryBucketStore(ttl=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        take(store, (key, 1, 0.1))
+        clock.advance(1)
+    assert list(store._buckets) == ["b", "c"]
+
+    # Using a bucket moves it to the back, so the idlest one goes first
+    take(store, ("b", 1, 0.1))
+    take(store, ("d", 1, 0.1))
+    assert list(store._buckets) == ["b", "d"]
+
+
+@pytest.fixture
+def limited_client(monkeypatch, clock) -> TestClient:
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_PERIOD", 60)
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ROLE_BUDGETS", {"anonymous": 3})
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ROUTE_BUDGETS", {"POST /generate": 2})
+
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/generate", ok, methods=["POST"]), Route("/items", ok)])
+    return TestClient(RateLimitMiddleware(app, store=MemoryBucketStore(ttl=60)))
+
+
+def test_responses_carry_the_tightest_remaining_budget(limited_client):
+    response = limited_client.get("/items")
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == "3"
+    assert response.headers["X-RateLimit-Remaining"] == "2"
+
+    response = limited_client.post("/generate")
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == "2"
+    assert response.headers["X-RateLimit-Remaining"] == "1"
+
+
+def test_role_budget_rejection_returns_429_and_keeps_route_tokens(limited_client, clock):
+    for _ in range(3):
+        assert limited_client.get("/items").status_code == 200
+
+    response = limited_client.post("/generate")
+    assert response.status_code == 429
+    # 3 requests per 60 seconds refill a token every 20 seconds
+    assert response.headers["Retry-After"] == "20"
+    assert response.headers["X-RateLimit-Limit"] == "3"
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+
+    # The rejected request did not cost a route token: both are still there
+    clock.advance(60)
+    assert limited_client.post("/generate").status_code == 200
+    assert limited_client.post("/generate").status_code == 200
+    response = limited_client.post("/generate")
+    assert response.status_code == 429
+    assert response.headers["X-RateLimit-Limit"] == "2"
+    assert response.headers["Retry-After"] == "30"
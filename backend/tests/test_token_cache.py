@@ -0,0 +1,119 @@
+"""Verified-claims caching in decode_token"""
+
+import hashlib
+import time
+
+import jwt
+import pytest
+
+from app import cache as cache_module
+from app import dependencies
+from app.config import settings
+from app.dependencies import decode_token, token_cache
+
+
+class FakeClock:
+    """Stands in for the time module inside app.cache and app.dependencies"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    monkeypatch.setattr(dependencies, "time", clock)
+    monkeypatch.setattr(dependencies.settings, "TOKEN_CACHE_TTL", 300)
+    token_cache.clear()
+    yield clock
+    token_cache.clear()
+
+
+@pytest.fixture
+def decodes(monkeypatch) -> list:
+    """Tokens that went through signature verification"""
+    calls = []
+    decode = jwt.decode
+
+    def counting(token, *args, **kwargs):
+        calls.append(token)
+        return decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(dependencies.pyjwt, "decode", counting)
+    return calls
+
+
+def token(expires_in=3600, audience="authenticated") -> str:
+    claims = {"sub": "user-1", "aud": audience}
+    if expires_in is not None:
+        claims["exp"] = int(time.time() + expires_in)
+    return jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+def digest(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def test_repeated_token_is_verified_once(clock, decodes):
+    raw = token()
+    assert decode_token(raw)["sub"] == "user-1"
+    assert decode_token(raw)["sub"] == "user-1"
+    assert decodes == [raw]
+    assert token_cache.get(digest(raw))["sub"] == "user-1"
+
+
+def test_cache_entry_never_outlives_the_token(clock, decodes):
+    raw = token(expires_in=30)
+    decode_token(raw)
+    clock.advance(29)
+    assert token_cache.get(digest(raw)) is not None
+    clock.advance(1)
+    assert token_cache.get(digest(raw)) is None
+
+
+def test_token_without_exp_is_cached_for_the_cache_ttl(clock, decodes):
+    raw = token(expires_in=None)
+    decode_token(raw)
+    clock.advance(299)
+    assert token_cache.get(digest(raw)) is not None
+    clock.advance(1)
+    assert token_cache.get(digest(raw)) is None
+
+
+def test_expired_claims_served_from_the_cache_are_rejected(clock, decodes):
+    raw = token(expires_in=30)
+    decode_token(raw)
+    # The cache's own expiry runs on the monotonic clock; a wall clock step
+    # can leave the entry in place after the token's exp has passed
+    clock.time = lambda: clock.now + 60
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(raw)
+    assert decodes == [raw]
+    assert len(token_cache) == 0
+
+
+def test_expired_token_is_rejected_and_not_cached(clock, decodes):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(token(expires_in=-10))
+    assert len(token_cache) == 0
+
+
+def test_wrong_audience_is_rejected_and_not_cached(clock, decodes):
+    raw = token(audience=dependencies.STREAM_TOKEN_AUDIENCE)
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidAudienceError):
+            decode_token(raw)
+    # Failed verifications are never cached, so each attempt is checked again
+    assert decodes == [raw, raw]
+    assert len(token_cache) == 0